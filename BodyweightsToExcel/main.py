@@ -1,22 +1,48 @@
 # retrieves bodyweights, then writes them to the correct row in the target file (specified in params.py).
+import os
 from collections import UserDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import utilities.local_file_handler as lr
-import openpyxl
 
-import utilities.params as p
+import utilities.date_cache as dc
+import utilities.note_preprocessing as npp
+import utilities.row_locator as rl
+import utilities.run_metrics as rm
+import utilities.sheet_reader as sr
 import utilities.utility_functions as uf
+from utilities.bodyweight_series import BodyweightSeries
+from utilities.config import Config
 from utilities.shared_types import Entry
+from utilities.target_router import Partition, TargetWorkbooks
+
+
+@dataclass
+class BodyweightToken:
+    # a single bodyweight, as found in the bodyweights note
+    # the bodyweight as written in the note, e.g. "70.5" or "?"
+    text: str
+    # the bodyweight as a float, or None if the bodyweight is missing or partially unknown (i.e. written as "?" or "7?")
+    value: float | None
+    # the index of the token's first character within the note text
+    position: int
+    # whether the token is within the context window (i.e. within parentheses), meaning it's already written to file
+    committed: bool
 
 
 class RowBodyweightPairings(UserDict):
-    def __setitem__(self, row: int, bodyweight: str | float | int):
+    def __setitem__(self, row: int, bodyweight: BodyweightToken | str | float | int):
         # disallow duplicate rows, or the updating of values
         assert isinstance(row, int), "Row must be an integer"
         assert row not in self.data.keys(), "This key has already been used"
 
+        if isinstance(bodyweight, BodyweightToken):
+            # tokens are validated when the note is tokenized
+            self.data[int(row)] = bodyweight.text
+            return
+
         self.validate_bodyweight_text(bodyweight)
         self.data[int(row)] = str(bodyweight)
 
@@ -30,11 +56,12 @@ class RowBodyweightPairings(UserDict):
         assert not invalid_chars, \
             f"Provided bodyweight `{bodyweight}` is invalid. The following characters are not accepted`{invalid_chars}`"
 
-        if "?" not in bodyweight:
-            try:
-                float(bodyweight)
-            except ValueError:
-                raise ValueError("Provided bodyweight is invalid and cannot be converted to float.")
+        # with only legal characters, the text is a single token, which the tokenizer checks is a number if it has no
+        # question marks
+        try:
+            tokenize_bodyweights_text(bodyweight)
+        except ValueError as e:
+            raise ValueError(f"Provided bodyweight `{bodyweight}` is invalid and cannot be converted to float") from e
 
 
 def return_most_recent_bodyweights(bodyweights: List[str], desired_count: int) -> List[str] | None:
@@ -75,66 +102,83 @@ def format_bodyweight_history(history: List[str]) -> str:
     return f"(" + ", ".join(history) + "), "
 
 
-def return_depunctuated_bodyweights_text(text: str,
-                                         keep_decimal_separator=False,
-                                         keep_spaces=False,
-                                         keep_question_marks=False) -> str:
+def tokenize_bodyweights_text(text: str) -> List[BodyweightToken]:
     """
-    Given an input string, return a copy with punctuation partially removed.
-    :param text: the input string
-    :param keep_decimal_separator: if False, then remove "." chars from string
-    :param keep_spaces: if False, then remove spaces from string
-    :param keep_question_marks: if False, then remove question marks from string
-    :return: a string with less punctuation
+    Split the bodyweights note text into bodyweight tokens, validating it in the same pass. The expected format is a
+    comma or space separated list of bodyweights, each being either a number or "?", or a number with unknown digits
+    such as "7?", optionally preceded by a context window of bodyweights in parentheses, e.g. "(70.5, 71.2), ?, 70.6".
+    Raise a ValueError which gives the position of the first formatting error found, if any.
+    :param text: the text found within the bodyweights note, minus any Obsidian properties
+    :return: the bodyweights, in the order they appear in the text
     """
-    txt = text.replace(",", "").replace("(", "").replace(")", "")
-    if not keep_decimal_separator:
-        txt = txt.replace(".", "")
-    if not keep_spaces:
-        txt = txt.replace(" ", "")
-    if not keep_question_marks:
-        txt = txt.replace("?", "")
-    return txt
+    tokens: List[BodyweightToken] = []
+    in_context_window = False
+    token_start = -1
+
+    def raise_at(position: int, msg: str):
+        line = text.count('\n', 0, position) + 1
+        column = position - (text.rfind('\n', 0, position) + 1) + 1
+        raise ValueError(f"Incorrectly formatted bodyweights note at line {line}, column {column} "
+                         f"(character {position}): {msg}")
+
+    def end_token(end: int):
+        token_text = text[token_start:end]
+        if '?' in token_text:
+            # unknown, e.g. "?", or partially unknown, e.g. "7?"
+            value = None
+        else:
+            try:
+                value = float(token_text)
+            except ValueError:
+                raise_at(token_start, f"`{token_text}` is not a valid bodyweight")
+        tokens.append(BodyweightToken(text=token_text, value=value, position=token_start,
+                                      committed=in_context_window))
+
+    for idx, char in enumerate(text):
+        if char in '0123456789.?':
+            if token_start == -1:
+                token_start = idx
+            continue
+
+        if token_start != -1:
+            end_token(idx)
+            token_start = -1
+
+        if char in ', \n':
+            continue
+        elif char == '(':
+            if idx != 0:
+                raise_at(idx, "if an opening parenthesis is in the bodyweights note, it must be at the beginning")
+            in_context_window = True
+        elif char == ')':
+            if not in_context_window:
+                raise_at(idx, "mismatched or too many parentheses. Expected no more than 1 pair")
+            if not tokens:
+                raise_at(idx, "empty parentheses. If parentheses are provided in the note, then they must surround at "
+                              "least 1 bodyweight")
+            in_context_window = False
+        else:
+            raise_at(idx, f"unexpected character `{char}`")
+
+    if token_start != -1:
+        end_token(len(text))
+    if in_context_window:
+        raise_at(0, "mismatched parentheses")
+    return tokens
 
 
 def extract_bodyweights_from_string(string, split_on_parenthesis: bool) -> List[str] | Tuple[List[str], List[str]]:
     """
-    Given a validated string, return the list of bodyweights found in that string. If split_on_parentheses,
-    then return two lists - one containing values found inside parentheses, and one containing those outside
+    Given a string, return the list of bodyweights found in that string. If split_on_parentheses, then return two
+    lists - one containing values found inside parentheses, and one containing those outside
     :param string: a string containing comma-separated floats, ints, "?", or parentheses etc.
     :param split_on_parenthesis: whether to split on parentheses (typically used for the context window)
     :return: one or two lists, containing bodyweights found in each group
     """
-
-    validate_bodyweight_note_text(string)
-    depunc_str = return_depunctuated_bodyweights_text(string,
-                                                      keep_decimal_separator=False,
-                                                      keep_spaces=False,
-                                                      keep_question_marks=True)
-    if len(depunc_str.replace(' ', '')) == 0:
-        # No bodyweights to return
-        if split_on_parenthesis:
-            return [], []
-        return []
-
-    bodyweights = [val.strip().replace("(", "").replace(")", "")
-                   for val in string.split(',')
-                   if val.strip()]
-
+    tokens = tokenize_bodyweights_text(string)
     if not split_on_parenthesis:
-        # Return all bodyweights in string
-        return bodyweights
-
-    # Return 2 lists, split on closing parenthesis
-    if ")" in string:
-        assert string.count(")") == 1, "Too many ')' found in string"
-        string = string.strip("(").replace(",", " ")
-        split_1, split_2 = string.split(")")
-        context_window_weights = [val for val in split_1.split() if val.strip()]
-        uncommitted_weights = [val for val in split_2.split() if val.strip()]
-        return context_window_weights, uncommitted_weights
-    else:
-        return [], bodyweights
+        return [token.text for token in tokens]
+    return [token.text for token in tokens if token.committed], [token.text for token in tokens if not token.committed]
 
 
 def validate_bodyweight_note_text(bw_note_text: str) -> None:
@@ -142,167 +186,379 @@ def validate_bodyweight_note_text(bw_note_text: str) -> None:
     If the bodyweight note text is not formatted as expected, then raise an exception
     :param bw_note_text: the string text found within the bodyweight note
     """
+    tokenize_bodyweights_text(bw_note_text)
+
 
-    text = bw_note_text
-    if "(" in text and text.index("(") != 0:
-        raise ValueError("If an opening parenthesis is in the bodyweights note, it must be at the beginning")
-    if text.count("(") != text.count(")"):
-        raise ValueError("Mismatched parentheses in bodyweights note")
-    if text.count("(") > 1 or text.count(")") > 1:
-        raise ValueError("Too many parentheses found in bodyweights note. Expected no more than 1 pair of "
-                         "opening or closing parentheses")
-    if "()" in text:
-        raise ValueError("Empty parentheses in bodyweights note. If parentheses are provided in the note, then "
-                         "they must surround at least 1 bodyweight")
-
-    de_punctuated_text = return_depunctuated_bodyweights_text(text).replace('\n', '')
-    if len(de_punctuated_text) > 0 and not de_punctuated_text.isdigit():
-        raise ValueError("Incorrectly formatted list of bodyweight provided in the bodyweights note")
-
-
-def pair_new_bodyweights_with_rows(sheet, bodyweights: List[float | str], start_row: int, max_rows_without_date=10) \
-        -> RowBodyweightPairings:
+def validate_bodyweight_count(expected: int, provided: int) -> None:
+    # raise unless the bodyweights note provides exactly one bodyweight per day for which one is expected
+    if expected != provided:
+        raise ValueError(
+            f"Number of bodyweights provided in the bodyweights note ({provided}) does not match the "
+            f"number of days for which a bodyweight is expected ({expected}).\nPlease correct the "
+            "note. If you've forgotten a value, then a question mark is a valid substitute for that bodyweight."
+        )
+
+
+@dataclass
+class BackfillPlan:
+    # the rows which bodyweights are expected for: every dated row from the first row missing a bodyweight (start_row),
+    # up to and including today's row. Rows without a date are skipped.
+    start_row: int
+    todays_row: int
+    target_rows: List[int]
+    todays_bodyweight_written: bool
+    # whether no bodyweight was written in the sheet before the target rows, so that the rows still missing a bodyweight
+    # at the end of the previous sheet (e.g. last year's) come first
+    continues_previous_sheet: bool = False
+
+    def pair(self, bodyweights: List[BodyweightToken | float | str]) -> RowBodyweightPairings:
+        """
+        Pair each bodyweight with its target row, in order. Raise if the counts differ.
+        """
+        validate_bodyweight_count(expected=len(self.target_rows), provided=len(bodyweights))
+
+        pairings = RowBodyweightPairings()
+        for row, bw in zip(self.target_rows, bodyweights):
+            pairings[row] = bw
+        return pairings
+
+
+def plan_bodyweight_backfill(sheet, today: datetime, max_rows_without_date=10,
+                             has_previous_sheet=False, config: Config | None = None) -> BackfillPlan:
+    """
+    Find today's row with the row locator, then walk back up the date and bodyweight columns to the last row which has
+    a bodyweight, collecting every dated row in between. Only the rows since that bodyweight are read, however long
+    the sheet is.
+    :param sheet: sheet in xlsx file containing bodyweights and dates, or a reader of it
+    :param today: the date for which the most recent bodyweight is expected
+    :param max_rows_without_date: the number of rows without a valid date between the start row and today's row,
+    after which an error is raised.
+    :param has_previous_sheet: whether the sheet continues from a previous sheet, as when the target is partitioned by
+    year. If so, then a sheet without any bodyweight written before today's row is planned from its first dated row.
+    :param config: the settings specifying the sheet's columns. Defaults to those in params.py
+    :return: a BackfillPlan
     """
-    :param sheet: sheet in xlsx file containing bodyweights and dates
+    assert isinstance(max_rows_without_date, int)
+    config = config or Config.from_params()
+    reader = sr.reader_for(sheet)
+    date_cache = reader.date_cache
+
+    todays_row = rl.DateRowLocator(reader, config.date_column).row_of(today)
+    if todays_row == -1:
+        raise RuntimeError("Failed to find the date cell corresponding to today's date in the xlsx file")
+    todays_bodyweight_written = reader.value(todays_row, config.bodyweight_column) is not None
+
+    pending_rows: List[int] = [] if todays_bodyweight_written else [todays_row]
+    last_written_row = None
+    # rows without a date are only counted once a pending row is found above them
+    count_empty, uncounted_empty = 0, 0
+    for row in range(todays_row - 1, 0, -1):
+        if date_cache.floored_date(row, reader.value(row, config.date_column)) is None:
+            # skip empty cells in date column (e.g. at end of year), up to max length "max_rows_without_date"
+            uncounted_empty += 1
+            continue
+        if reader.value(row, config.bodyweight_column) is not None:
+            # every row before this one is already written to
+            last_written_row = row
+            break
+        pending_rows.append(row)
+        count_empty += uncounted_empty
+        uncounted_empty = 0
+    pending_rows.reverse()
+
+    if last_written_row is None and not has_previous_sheet:
+        raise ValueError("Failed to find empty bodyweight cell. No previously written bodyweight was found before "
+                         "today's row")
+    if count_empty >= max_rows_without_date:
+        raise RuntimeError(
+            "Failed to pair bodyweights with rows matching those bodyweights' entry dates. Too many date "
+            f"cells in the Excel sheet are missing datetime values (the cutoff is "
+            f"{max_rows_without_date}). Please verify that the date cell column in your Excel sheet "
+            "contains enough dates"
+        )
+    return BackfillPlan(start_row=pending_rows[0] if pending_rows else todays_row,
+                        todays_row=todays_row,
+                        target_rows=pending_rows,
+                        todays_bodyweight_written=todays_bodyweight_written,
+                        continues_previous_sheet=last_written_row is None)
+
+
+def return_trailing_unwritten_rows(sheet, config: Config | None = None) -> List[int]:
+    """
+    Return every dated row after the last row with a bodyweight, e.g. the end of last year's sheet when the target is
+    partitioned by year. The sheet is read from the bottom up, as far as that bodyweight.
+    :param sheet: sheet in xlsx file containing bodyweights and dates, or a reader of it
+    :param config: the settings specifying the sheet's columns. Defaults to those in params.py
+    :return: a list of rows
+    """
+    config = config or Config.from_params()
+    reader = sr.reader_for(sheet)
+    date_cache = reader.date_cache
+    trailing_rows: List[int] = []
+    for row in range(reader.max_row, 0, -1):
+        if reader.value(row, config.bodyweight_column) is not None:
+            break
+        if date_cache.floored_date(row, reader.value(row, config.date_column)) is not None:
+            trailing_rows.append(row)
+    trailing_rows.reverse()
+    return trailing_rows
+
+
+def pair_new_bodyweights_with_rows(sheet, bodyweights: List[BodyweightToken | float | str], start_row: int,
+                                   max_rows_without_date=10, config: Config | None = None) -> RowBodyweightPairings:
+    """
+    Pair each bodyweight with the next dated row from start_row down, as a BackfillPlan of those rows.
+    :param sheet: sheet in xlsx file containing bodyweights and dates, or a reader of it
     :param bodyweights: list of bodyweights not yet committed to file
     :param start_row: the row at which the search starts
     :param max_rows_without_date: the number of rows without a valid date, after which an error is raised, if a
     suitable row cannot be found.
-    :return: a list of tuples, where tuple[0] is the int row to write to, and tuple[1] the str bodyweight. Empty cells
-    are accounted for.
+    :param config: the settings specifying the sheet's columns. Defaults to those in params.py
+    :return: a dict of the int row to write to, and the str bodyweight. Empty cells are accounted for.
     """
 
     assert isinstance(start_row, int)
     assert isinstance(max_rows_without_date, int)
 
-    current_row = start_row
-    count_empty = 0
-    pairings = RowBodyweightPairings()
-
-    # TODO: refactor
-    for bw in bodyweights:
-        success = False
-        while not success:
-            try:
-                success = uf.convert_string_to_datetime(sheet.cell(row=current_row, column=p.DATE_COLUMN).value)
-            except ValueError:
-                # skip empty cells in date column (e.g. at end of year), up to max length "max_empty_rows"
-                current_row += 1
-                count_empty += 1
+    if not bodyweights:
+        return RowBodyweightPairings()
 
+    config = config or Config.from_params()
+    reader = sr.reader_for(sheet)
+    date_cache = reader.date_cache
+    target_rows: List[int] = []
+    count_empty = 0
+    for row, (date_cell_value, bw_cell_value) in reader.iter_columns([config.date_column, config.bodyweight_column],
+                                                                     min_row=start_row):
+        if date_cache.floored_date(row, date_cell_value) is None:
+            # skip empty cells in date column (e.g. at end of year), up to max length "max_rows_without_date"
+            count_empty += 1
             if count_empty >= max_rows_without_date:
-                raise RuntimeError(
-                    "Failed to pair bodyweights with rows matching those bodyweights' entry dates. Too many date "
-                    f"cells in the Excel sheet are missing datetime values (the cutoff is "
-                    f"{max_rows_without_date}). Please verify that the date cell column in your Excel sheet "
-                    "contains enough dates"
-                )
+                break
+            continue
 
         # check if bodyweight cell is already written to
-        if sheet.cell(row=current_row, column=p.BODYWEIGHT_COLUMN).value is None:
-            pairings[current_row] = bw
-            current_row += 1
-        else:
-            raise RuntimeError(f"Bodyweight cannot be written to target row {current_row} - cell already written to!"
+        if bw_cell_value is not None:
+            raise RuntimeError(f"Bodyweight cannot be written to target row {row} - cell already written to!"
                                f"No changes have been made")
+        target_rows.append(row)
+        if len(target_rows) == len(bodyweights):
+            plan = BackfillPlan(start_row=target_rows[0], todays_row=row, target_rows=target_rows,
+                                todays_bodyweight_written=False)
+            return plan.pair(bodyweights)
 
-    return pairings
+    raise RuntimeError(
+        "Failed to pair bodyweights with rows matching those bodyweights' entry dates. Too many date "
+        f"cells in the Excel sheet are missing datetime values (the cutoff is "
+        f"{max_rows_without_date}). Please verify that the date cell column in your Excel sheet "
+        "contains enough dates"
+    )
 
 
-def write_to_file(wb, sheet, row_bodyweight_pairings: RowBodyweightPairings) -> None:
-    """
-    Write bodyweights to file. Expect validation to be done prior.
-    :param wb: the workbook to write to
-    :param sheet: the target sheet within the workbook
-    :param row_bodyweight_pairings: the row and bodyweight pairings. A UserDict with validated entries
-    """
-
-    for row, bodyweight in row_bodyweight_pairings.items():
-        try:
-            # We write as float because otherwise Calc (and perhaps Excel) prepend each value with a "'", to mark it as
-            # a string, causing it to be left-aligned. The float conversion avoids that
-            sheet.cell(row=row, column=p.BODYWEIGHT_COLUMN).value = float(bodyweight)
-        except ValueError:
-            # The given bodyweight is probably "?"
-            sheet.cell(row=row, column=p.BODYWEIGHT_COLUMN).value = bodyweight
-
-    wb.save(p.TARGET_PATH)
-
-
-def main():
-    uf.validate_target_sheet_params()
+def bodyweight_cell_value(bodyweight: str) -> float | str:
+    try:
+        # We write as float because otherwise Calc (and perhaps Excel) prepend each value with a "'", to mark it as
+        # a string, causing it to be left-aligned. The float conversion avoids that
+        return float(bodyweight)
+    except ValueError:
+        # The given bodyweight is probably "?"
+        return bodyweight
 
-    handler = lr.LocalFileHandler()
 
-    wb = openpyxl.load_workbook(p.TARGET_PATH)
-    sheet = wb[p.TARGET_SHEET]
-    bw_note: Entry = handler.return_bodyweights_note()
+def write_bodyweights_to_partitions(workbooks: TargetWorkbooks,
+                                    pairings_by_partition: Dict[Partition, RowBodyweightPairings]) -> None:
+    """
+    Write bodyweights to the sheets of their target partitions, without saving. Expect validation to be done prior.
+    :param workbooks: the target workbooks
+    :param pairings_by_partition: the row and bodyweight pairings within each partition
+    """
+    for partition, pairings in pairings_by_partition.items():
+        for row, bodyweight in pairings.items():
+            workbooks.write_cell(partition, row, workbooks.config.bodyweight_column, bodyweight_cell_value(bodyweight))
 
-    # if this program is run after 5 AM, then expect the note to have been edited today. Else, yesterday.
-    today = datetime.now()
-    if datetime.now().hour < 5:
-        today -= timedelta(days=1)
 
+def update_bodyweight_series(workbooks: TargetWorkbooks,
+                             pairings_by_partition: Dict[Partition, RowBodyweightPairings]) -> None:
+    """
+    Record newly written bodyweights in the bodyweight series file. If that file doesn't exist yet, then create it from
+    every bodyweight in the target. Expect the bodyweights to have been written to the target already. The series is
+    only a copy of the target's bodyweights, so a failure is printed rather than raised, and the file is removed so
+    that it's created afresh next time.
+    :param workbooks: the target workbooks
+    :param pairings_by_partition: the rows and bodyweights just written, within each partition
+    """
+    config = workbooks.config
+    try:
+        if not os.path.exists(config.bodyweight_series_path):
+            print("Creating bodyweight series file from the target file")
+            sheets = [workbooks.sheet(partition) for partition in workbooks.existing_partitions()]
+            series = BodyweightSeries.from_sheets(sheets, date_column=config.date_column,
+                                                  bodyweight_column=config.bodyweight_column)
+        else:
+            series = BodyweightSeries.load(config.bodyweight_series_path)
+            for partition, pairings in pairings_by_partition.items():
+                sheet = workbooks.sheet(partition)
+                date_cache = dc.for_sheet(sheet)
+                for row, bodyweight in pairings.items():
+                    date_cell = sheet.cell(row=row, column=config.date_column)
+                    try:
+                        series.set(date_cache.floored_date(row, date_cell.value), bodyweight)
+                    except ValueError:
+                        # e.g. a partially unknown bodyweight such as "7?", which the series records as missing
+                        continue
+        series.save(config.bodyweight_series_path)
+    except Exception as e:
+        print(f"Failed to update the bodyweight series file. Error: {e}. It will be created afresh next time")
+        if os.path.exists(config.bodyweight_series_path):
+            os.remove(config.bodyweight_series_path)
+
+
+@dataclass
+class BodyweightsUpdate:
+    # everything needed to commit the bodyweights note's uncommitted bodyweights to file
+    # the row and bodyweight pairings within each target partition
+    pairings_by_partition: Dict[Partition, RowBodyweightPairings]
+    # the new text of the bodyweights note, i.e. the context window of most recently committed bodyweights
+    history: str
+
+
+def prepare_bodyweights_update(workbooks: TargetWorkbooks, bw_note: Entry, today: datetime) -> BodyweightsUpdate | None:
+    """
+    Pair the bodyweights note's uncommitted bodyweights with their target rows, and prepare the note's new text. Nothing
+    is written. If there's nothing to write, explain why and return None. Raise if anything is amiss.
+    :param workbooks: the target workbooks. Only today's partition is read, and the previous partition if today's
+    doesn't have any bodyweights written before today yet
+    :param bw_note: the bodyweights note
+    :param today: the date for which the most recent bodyweight is expected
+    :return: a BodyweightsUpdate, or None
+    """
     if bw_note.edit_timestamp < today.replace(hour=0, minute=0, second=0, microsecond=0):
         print("- You have not edited your bodyweights note today.")
         print("- Please add today's bodyweight to the note. Then run the program again.")
         print("- If you don't remember it, a question mark will be fine.")
         print(f"Note edit timestamp={bw_note.edit_timestamp}, note text=\"{bw_note.text}\"")
-        exit()
+        return None
 
-    start_row = uf.return_first_absent_bodyweight_row(sheet,
-                                                      date_column=p.DATE_COLUMN,
-                                                      bodyweight_column=p.BODYWEIGHT_COLUMN)
-    todays_row = uf.find_row_of_cell_matching_datetime(sheet, today, date_column=p.DATE_COLUMN)
+    # find every row which a bodyweight is expected for, reading only the rows since the last bodyweight written. The
+    # partitions are streamed rather than loaded, unless they're loaded already
+    todays_partition = workbooks.partition_of(today)
+    previous_partition = workbooks.previous_partition(todays_partition)
+    backfill_plan = plan_bodyweight_backfill(workbooks.reader(todays_partition), today,
+                                             has_previous_sheet=previous_partition is not None,
+                                             config=workbooks.config)
+    if backfill_plan.todays_bodyweight_written:
+        print("Today's bodyweight is already written to file.")
+        return None
 
-    if start_row == -1:
-        raise RuntimeError("Start row not found")
-    if todays_row == -1:
-        raise RuntimeError("Failed to find the date cell corresponding to today's date in the xlsx file")
-    if sheet.cell(todays_row, p.BODYWEIGHT_COLUMN).value:
-        print("Today's bodyweight is already written to file. Exiting program")
-        exit()
+    # rows of the previous partition (e.g. the end of last year) which are still missing bodyweights come first
+    target_rows_by_partition = {todays_partition: backfill_plan.target_rows}
+    if backfill_plan.continues_previous_sheet:
+        target_rows_by_partition = {previous_partition: return_trailing_unwritten_rows(
+            workbooks.reader(previous_partition), workbooks.config)} | target_rows_by_partition
 
     # Separate the bodyweights that have been committed to file (which are saved in the context window) from those
     # that have not
-    bodyweights_string = uf.strip_obsidian_properties(bw_note.text)
-    _, uncommitted_bodyweights = extract_bodyweights_from_string(string=bodyweights_string,
-                                                                 split_on_parenthesis=True)
+    bodyweights_string = npp.preprocess_note(bw_note.text).body
+    bodyweight_tokens = tokenize_bodyweights_text(bodyweights_string)
+    uncommitted_bodyweights = [token for token in bodyweight_tokens if not token.committed]
 
     if len(uncommitted_bodyweights) == 0:
-        print("INFO: no bodyweights found in note. There is nothing new to write\nExiting")
-        exit()
-
-    # We expect the bodyweights note to contain one bodyweight per missing entry in the Excel file
-    num_expected_bodyweights = (todays_row - start_row + 1)
-    if num_expected_bodyweights != len(uncommitted_bodyweights):
-        raise ValueError(
-            f"Number of bodyweights provided in the bodyweights note ({len(uncommitted_bodyweights)}) does not match "
-            f"the number of days for which a bodyweight is expected ({num_expected_bodyweights}).\nPlease correct the "
-            "note. If you've forgotten a value, then a question mark is a valid substitute for that bodyweight."
-        )
+        print("INFO: no bodyweights found in note. There is nothing new to write")
+        return None
 
-    # pair bodyweights with their target rows. Account for empty rows, and raise if anything is amiss.
-    row_bodyweight_mapping: RowBodyweightPairings = pair_new_bodyweights_with_rows(sheet=sheet,
-                                                                                   bodyweights=uncommitted_bodyweights,
-                                                                                   start_row=start_row)
+    # We expect the bodyweights note to contain one bodyweight per missing entry in the Excel file. Pair each with its
+    # target row, and raise if anything is amiss.
+    pairings_by_partition = pair_bodyweights_across_partitions(target_rows_by_partition, uncommitted_bodyweights)
 
     # prepare history (or "context window") of the most recently committed-to-file bodyweights, to be written to the
     # bodyweight note
-    all_bodyweights = extract_bodyweights_from_string(bodyweights_string, split_on_parenthesis=False)
+    all_bodyweights = [token.text for token in bodyweight_tokens]
     most_recent_bodyweights: List[str] = return_most_recent_bodyweights(bodyweights=all_bodyweights,
-                                                                        desired_count=p.HISTORY_LENGTH)
+                                                                        desired_count=workbooks.config.history_length)
     history: str = format_bodyweight_history(most_recent_bodyweights)
+    return BodyweightsUpdate(pairings_by_partition=pairings_by_partition, history=history)
 
-    uf.backup_file_to_dir(source_file_path=p.TARGET_PATH, backup_directory=p.LOCAL_EXCEL_BACKUP_DIR)
-    print("Writing bodyweights to file")
-    write_to_file(wb, sheet, row_bodyweight_mapping)
 
-    uf.backup_file_to_dir(source_file_path=bw_note.path, backup_directory=p.LOCAL_NOTES_ARCHIVE_DIR)
+def pair_bodyweights_across_partitions(target_rows_by_partition: Dict[Partition, List[int]],
+                                       bodyweights: List[BodyweightToken]) -> Dict[Partition, RowBodyweightPairings]:
+    """
+    Pair each bodyweight with its target row, in order, where the target rows span one or more partitions, in date
+    order. Raise if the counts differ.
+    :param target_rows_by_partition: the rows expecting a bodyweight within each partition
+    :param bodyweights: the bodyweights to pair
+    :return: the pairings within each partition
+    """
+    all_target_rows = [(partition, row) for partition, rows in target_rows_by_partition.items() for row in rows]
+    validate_bodyweight_count(expected=len(all_target_rows), provided=len(bodyweights))
+
+    pairings_by_partition: Dict[Partition, RowBodyweightPairings] = {}
+    for (partition, row), bodyweight in zip(all_target_rows, bodyweights):
+        pairings_by_partition.setdefault(partition, RowBodyweightPairings())[row] = bodyweight
+    return pairings_by_partition
+
 
-    # all done. We can replace the bodyweights note
+def update_bodyweights_note(handler, bw_note: Entry, history: str, config: Config | None = None) -> None:
+    # back up the bodyweights note, then replace its text with the given history. Call this once the bodyweights are
+    # saved to file. The backup is kept in the notes archive directory of the given settings, or params.py
+    config = config or Config.from_params()
+    uf.backup_file_to_dir(source_file_path=bw_note.path, backup_directory=config.local_notes_archive_dir)
     print("Updating bodyweights note")
     handler.replace_bodyweights_note(new_text=history)
+
+
+def return_effective_today() -> datetime:
+    # if this program is run after 5 AM, then expect the note to have been edited today. Else, yesterday.
+    today = datetime.now()
+    if today.hour < 5:
+        today -= timedelta(days=1)
+    return today
+
+
+@dataclass
+class BodyweightsResult:
+    # what a run wrote
+    # the number of bodyweights written. 0 if there was nothing to write, in which case the reason was printed
+    written: int = 0
+
+
+def run(config: Config | None = None) -> BodyweightsResult:
+    """
+    Write the bodyweights in the bodyweights note to the target file, according to the given settings, then update the
+    note. A single process can run this repeatedly, with any settings.
+    :param config: the settings to use. Defaults to those in params.py
+    :return: what was written
+    """
+    config = config or Config.from_params()
+    workbooks = TargetWorkbooks(config)
+    uf.validate_target_sheet_params(workbooks)
+
+    with rm.stage("retrieve_notes"):
+        handler = lr.create_handler(config)
+        bw_note: Entry = handler.return_bodyweights_note()
+
+    with rm.stage("pair_rows"):
+        update = prepare_bodyweights_update(workbooks, bw_note, return_effective_today())
+    # remember the dates parsed while preparing the update, even if there's nothing to write
+    workbooks.save_date_caches()
+    if update is None:
+        return BodyweightsResult()
+
+    print("Writing bodyweights to file")
+    with rm.stage("write"):
+        write_bodyweights_to_partitions(workbooks, update.pairings_by_partition)
+        workbooks.save(backup=True)
+
+        # all done. We can replace the bodyweights note
+        update_bodyweights_note(handler, bw_note, update.history, config)
+        update_bodyweight_series(workbooks, update.pairings_by_partition)
+    return BodyweightsResult(written=sum(len(pairings) for pairings in update.pairings_by_partition.values()))
+
+
+@rm.record_run("BodyweightsToExcel")
+def main():
+    if not run().written:
+        print("Exiting program")
+        return
     print("Finished!")
 
 
@@ -0,0 +1,46 @@
+# prints bodyweight trends from the bodyweight series file (see BODYWEIGHT_SERIES_PATH in params.py), without opening
+# the target file.
+import math
+import os
+
+from tabulate import tabulate
+
+from utilities.bodyweight_series import BodyweightSeries
+from utilities.config import Config
+
+# how many of the most recent weeks to show
+WEEKS_SHOWN = 8
+# the number of days over which the rolling average is taken
+ROLLING_WINDOW = 7
+
+
+def format_weight(value: float) -> str:
+    return "?" if math.isnan(value) else f"{value:.1f}"
+
+
+def main(config: Config | None = None):
+    # print the trends of the bodyweight series in params.py, or in the given settings
+    config = config or Config.from_params()
+    if not os.path.exists(config.bodyweight_series_path):
+        print(f"No bodyweight series file found at `{config.bodyweight_series_path}`. It's created the next time "
+              f"BodyweightsToExcel writes to the target file.")
+        return
+
+    series = BodyweightSeries.load(config.bodyweight_series_path)
+    if not len(series):
+        print("The bodyweight series is empty")
+        return
+
+    rolling = series.rolling_mean(ROLLING_WINDOW)
+    last_date = series.dates()[-1]
+    print(f"{ROLLING_WINDOW} day average as of {last_date.strftime('%Y-%m-%d')}: {format_weight(rolling[-1])}\n")
+
+    tabulate_matrix = [[s.week_start.strftime('%Y-%m-%d'), s.count, format_weight(s.mean),
+                        format_weight(s.minimum), format_weight(s.maximum)]
+                       for s in series.weekly_summaries()[-WEEKS_SHOWN:]]
+    headers = ["Week of", "Days recorded", "Mean", "Min", "Max"]
+    print(tabulate(tabulate_matrix, headers=headers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# does what NightlyRun does for every athlete listed in the athlete profiles file (see ATHLETE_PROFILES_PATH in
+# params.py), several athletes at once. Each athlete is processed in a fresh process of its own, so that their settings
+# and cached data are never mixed up, and a failure for one athlete doesn't stop the others.
+import io
+import multiprocessing
+import os
+import time
+import traceback
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+import NightlyRun.main as nightly
+import utilities.params as p
+import utilities.run_metrics as rm
+from utilities.athlete_profiles import AthleteProfile, load_profiles
+
+
+@dataclass
+class AthleteResult:
+    name: str
+    succeeded: bool
+    duration_seconds: float
+    counters: Dict[str, int] = field(default_factory=dict)
+    # what was printed while processing the athlete
+    output: str = ""
+    # the exception which stopped processing the athlete, with its traceback, or the stages which were skipped, if any
+    error: str = ""
+
+
+def process_athlete(profile: AthleteProfile) -> AthleteResult:
+    # do what NightlyRun does, with the athlete's settings. Runs in a worker process of its own, as the settings which
+    # aren't passed to NightlyRun explicitly, e.g. where run metrics are recorded, are applied to params.py
+    profile.apply_to_params()
+    output = io.StringIO()
+    error = ""
+    # stays None if the run couldn't be started, e.g. if its metrics couldn't be set up
+    record = None
+    with redirect_stdout(output):
+        try:
+            with rm.record_run(f"NightlyRun {profile.name}") as record:
+                result = nightly.run(profile.config())
+                if result.errors:
+                    # the run carried on past these, but didn't do everything it should have
+                    record.succeeded = False
+                    error = "\n".join(result.errors)
+        except Exception:
+            error = traceback.format_exc()
+    if record is None:
+        return AthleteResult(name=profile.name, succeeded=False, duration_seconds=0.0, output=output.getvalue(),
+                             error=error)
+    return AthleteResult(name=profile.name, succeeded=record.succeeded, duration_seconds=record.duration_seconds,
+                         counters=record.counters, output=output.getvalue(), error=error)
+
+
+def process_athletes(profiles: List[AthleteProfile], max_parallel: int = 0) -> Iterator[AthleteResult]:
+    """
+    Process the given athletes in parallel, each in a fresh worker process.
+    :param profiles: the athletes' profiles
+    :param max_parallel: how many athletes to process at once. 0 means one per CPU
+    :return: each athlete's result, as soon as it's processed, in no particular order
+    """
+    processes = min(max_parallel or os.cpu_count() or 1, len(profiles))
+    if not processes:
+        return
+    # each worker process handles a single athlete, so nothing an athlete's run leaves behind in memory is reused
+    with multiprocessing.Pool(processes=processes, maxtasksperchild=1) as pool:
+        yield from pool.imap_unordered(process_athlete, profiles)
+
+
+def summarise(results: List[AthleteResult], wall_seconds: float) -> List[str]:
+    # return a summary of the results across all athletes, including the overall throughput
+    succeeded = [result for result in results if result.succeeded]
+    totals = {counter: sum(result.counters.get(counter, 0) for result in results)
+              for counter in (rm.NOTES_SCANNED, rm.WORKOUTS_PARSED, rm.ROWS_WRITTEN)}
+    work_seconds = sum(result.duration_seconds for result in results)
+    wall_seconds = max(wall_seconds, 1e-9)
+    lines = [f"{len(succeeded)} of {len(results)} athletes processed successfully in {wall_seconds:.1f}s "
+             f"({work_seconds:.1f}s of processing, {work_seconds / wall_seconds:.1f}x in parallel)",
+             f"In total: {totals[rm.NOTES_SCANNED]} notes scanned ({totals[rm.NOTES_SCANNED] / wall_seconds:.0f} per "
+             f"second), {totals[rm.WORKOUTS_PARSED]} workouts parsed, {totals[rm.ROWS_WRITTEN]} rows written"]
+    if failed := sorted(result.name for result in results if not result.succeeded):
+        lines.append(f"Failed: {failed}")
+    return lines
+
+
+def main():
+    profiles = load_profiles(p.ATHLETE_PROFILES_PATH)
+    if not profiles:
+        print(f"No athletes are listed in `{p.ATHLETE_PROFILES_PATH}`")
+        exit()
+
+    print(f"Processing {len(profiles)} athletes")
+    start = time.perf_counter()
+    results = []
+    for result in process_athletes(profiles, p.MAX_PARALLEL_ATHLETES):
+        results.append(result)
+        # each athlete's output is printed in one piece, so that athletes processed at the same time don't interleave
+        status = "done" if result.succeeded else "FAILED"
+        counters = result.counters
+        print(f"\n{result.name}: {status} in {result.duration_seconds:.1f}s. {counters.get(rm.NOTES_SCANNED, 0)} "
+              f"notes scanned, {counters.get(rm.WORKOUTS_PARSED, 0)} workouts parsed, "
+              f"{counters.get(rm.ROWS_WRITTEN, 0)} rows written")
+        for line in (result.output + result.error).splitlines():
+            print(f"  [{result.name}] {line}")
+
+    print()
+    print("\n".join(summarise(results, time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    main()
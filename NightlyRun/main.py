@@ -0,0 +1,129 @@
+# runs what BodyweightsToExcel, WorkoutsToExcel and, optionally, NotePruner do, in one unattended pass. The notes are
+# scanned once, each target workbook is loaded once, and the target is backed up and saved once, at the end.
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import BodyweightsToExcel.main as bw
+import NotePruner.main as pruner
+import WorkoutsToExcel.workout_parsing as wp
+import utilities.local_file_handler as lr
+import utilities.run_metrics as rm
+import utilities.utility_functions as uf
+from utilities.config import Config
+from utilities.shared_types import Entry
+from utilities.target_router import TargetWorkbooks
+
+
+def select_notes_to_prune(workbooks: TargetWorkbooks, workout_notes: List[Entry], today: datetime) -> List[Entry]:
+    """
+    Return the workout notes which can be discarded without asking the user: those older than NIGHTLY_PRUNE_AFTER_DAYS
+    whose workout is in the target file exactly as it would be written now. NotePruner asks the user to compare
+    similar-looking workouts instead.
+    :param workbooks: the target workbooks, holding any workouts written in this run
+    :param workout_notes: valid workout notes, each with a unique date
+    :param today: the date to count the days from
+    :return: the notes to discard
+    """
+    prune_after_days = workbooks.config.nightly_prune_after_days
+    if prune_after_days <= 0 or not workout_notes:
+        return []
+
+    end_date = today - timedelta(days=prune_after_days)
+    candidates = pruner.get_discard_candidates(workbooks, workout_notes, end_date)
+    data_by_date: Dict[datetime, str] = {workout.title_datetime: workout.data
+                                         for workout in wp.parse_workout_notes([c.note for c in candidates])}
+    return [candidate.note for candidate in candidates
+            if data_by_date.get(candidate.floored_date) == candidate.in_sheet_as]
+
+
+@dataclass
+class NightlyResult:
+    # what a run did
+    bodyweights_written: int = 0
+    workouts_written: int = 0
+    notes_discarded: int = 0
+    # why any stage was skipped. The run carries on past such problems, but hasn't succeeded
+    errors: List[str] = field(default_factory=list)
+
+
+def run(config: Config | None = None) -> NightlyResult:
+    """
+    Write the bodyweights and workouts in the notes to the target file, then prune notes if enabled, according to the
+    given settings. Problems with the bodyweights or workouts are printed and returned rather than raised, so that one
+    doesn't stop the other. A single process can run this repeatedly, with any settings.
+    :param config: the settings to use. Defaults to those in params.py
+    :return: what was done
+    """
+    config = config or Config.from_params()
+    # the same workbooks are used to validate, read and write the target, so that each is loaded only once
+    workbooks = TargetWorkbooks(config)
+    uf.validate_target_sheet_params(workbooks)
+
+    with rm.stage("retrieve_notes"):
+        handler = lr.create_handler(config)
+        notes: List[Entry] = handler.retrieve_notes() or []
+    workout_notes = [note for note in notes if note.is_valid_workout_note()]
+
+    # prepare everything before writing anything. A problem with the bodyweights doesn't stop the workouts, nor vice
+    # versa
+    bw_note, bw_update = None, None
+    errors: List[str] = []
+    with rm.stage("pair_rows"):
+        try:
+            bw_note = handler.return_bodyweights_note()
+            bw_update = bw.prepare_bodyweights_update(workbooks, bw_note, bw.return_effective_today())
+        except Exception as e:
+            errors.append(f"Skipping bodyweights. Error: {e}")
+            print(errors[-1])
+        workouts_to_write = {}
+        try:
+            workouts_to_write = wp.prepare_unattended_workouts(workbooks, workout_notes)
+        except Exception as e:
+            errors.append(f"Skipping workouts. Error: {e}")
+            print(errors[-1])
+
+    with rm.stage("write"):
+        if bw_update is not None:
+            print("Writing bodyweights to target file")
+            bw.write_bodyweights_to_partitions(workbooks, bw_update.pairings_by_partition)
+        if workouts_to_write:
+            wp.write_workouts_to_partitions(workbooks, workouts_to_write)
+
+        # each modified workbook is backed up and saved once. Unmodified ones are neither
+        workbooks.save(backup=True)
+        if bw_update is not None:
+            # only once the bodyweights are saved to the target file can they be removed from the note
+            bw.update_bodyweights_note(handler, bw_note, bw_update.history, config)
+            bw.update_bodyweight_series(workbooks, bw_update.pairings_by_partition)
+        wp.export_written_workouts(workouts_to_write, config)
+
+    # prune against the saved workbooks, so that workouts written above can be pruned in the same run
+    with rm.stage("prune"):
+        if notes_to_prune := select_notes_to_prune(workbooks, workout_notes, datetime.now()):
+            handler.discard_notes(notes_to_prune)
+            print(f"Discarded {len(notes_to_prune)} notes which are already written to the target file")
+
+    # remember the dates parsed from sheets which weren't saved
+    workbooks.save_date_caches()
+    return NightlyResult(
+        bodyweights_written=0 if bw_update is None else sum(map(len, bw_update.pairings_by_partition.values())),
+        workouts_written=sum(map(len, workouts_to_write.values())),
+        notes_discarded=len(notes_to_prune),
+        errors=errors)
+
+
+@rm.record_run("NightlyRun")
+def main():
+    # MultiAthleteRun calls run for each athlete instead, recording each run under the athlete's name
+    result = run()
+    print(f"All done! {result.bodyweights_written} bodyweights and {result.workouts_written} workouts written, "
+          f"{result.notes_discarded} notes discarded")
+    if result.errors:
+        # so that the scheduler, and the run's metrics, report the run as failed
+        print("Not everything could be written. See the errors above")
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
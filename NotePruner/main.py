@@ -1,15 +1,27 @@
+import os
+import sys
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List
 from collections import Counter
 
-import openpyxl
 import utilities.local_file_handler as lr
-from tabulate import tabulate
 
+import utilities.note_archive as na
+import utilities.note_preprocessing as npp
 import utilities.params as p
+import utilities.run_metrics as rm
+import utilities.sheet_reader as sr
 import utilities.utility_functions as uf
+from utilities.config import Config
+from utilities.date_index import SheetDateIndex
 from utilities.shared_types import Entry
+from utilities.target_router import TargetWorkbooks
+
+TABLE_HEADERS = ["Date", "Note snippet", "Exists in xlsx as...", "Similarity"]
+# the table is printed in batches of this many rows, so that the first rows appear while the rest are being computed
+TABLE_ROWS_PER_BATCH = 200
 
 
 @dataclass
@@ -25,84 +37,84 @@ class DiscardCandidate:
         self.floored_date = self.floored_date.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def retrieve_note_snippets_from_xlsx(sheet,
-                                     workout_notes: List[Entry]) -> Dict[datetime, str]:
-    # Retrieve workout column values (including the empty string) from the target xlsx file, up to a given row.
-    # Return them as a dictionary, where each key is a datetime object representing the date of the workout (without
-    # time component), and each value is the workout's string
-
-    start_date = min([note.floored_datetime for note in workout_notes])
-    end_date = max([note.floored_datetime for note in workout_notes])
+def retrieve_note_snippets_from_xlsx(sheet, dates: List[datetime],
+                                     config: Config | None = None) -> Dict[datetime, str]:
+    """
+    Retrieve workout column values for the given dates from the target xlsx file. Only the date column is scanned, and
+    only from the earliest requested date's row. The workout column is read only for rows matching a requested date.
+    :param sheet: the target sheet, or a reader of it
+    :param dates: the floored dates of the workouts to look up, in ascending order
+    :param config: the settings specifying the sheet's columns. Defaults to those in params.py
+    :return: a dictionary, where each key is a date without time component, and each value is the workout's string.
+    Dates absent from the sheet, or whose workout cell is empty, are omitted.
+    """
+    if not dates:
+        return dict()
 
-    start_row = uf.find_row_of_cell_matching_datetime(sheet, datetime_target=start_date, date_column=p.DATE_COLUMN)
-    end_row = uf.find_row_of_cell_matching_datetime(sheet, datetime_target=end_date, date_column=p.DATE_COLUMN)
+    config = config or Config.from_params()
+    reader = sr.reader_for(sheet)
+    date_index = SheetDateIndex(reader, date_column=config.date_column, min_date=dates[0], max_date=dates[-1])
 
     xlsx_snippets = dict()
-    for row in sheet.iter_rows(min_row=start_row,
-                               min_col=0,  # we don't exclude columns because that throws our indexing off
-                               max_col=max(p.WORKOUT_COLUMN, p.DATE_COLUMN),
-                               max_row=end_row,
-                               values_only=False):
-        # a "row" in this context is a tuple of cells. We subtract 1 because openpyxl columns are 1-indexed, but
-        # iter_rows is returning a tuple, which is 0-indexed.
-        date_value = row[p.DATE_COLUMN - 1].value
-
-        if not date_value:
-            # if there's no date, there's no snippet to store
+    for floored_date in dates:
+        row = date_index.row_of(floored_date)
+        if row == -1:
             continue
-
-        date_value = uf.convert_string_to_datetime(date_value, regress_future_dates=False)
-        floored_date = date_value.replace(hour=0, minute=0, second=0)
-        assert not xlsx_snippets.get(floored_date), (f"Multiple workouts found for date {floored_date} in the target "
-                                                     f"file. This is not a supported use case.")
-        xlsx_snippets[floored_date] = row[p.WORKOUT_COLUMN - 1].value
+        assert not date_index.is_duplicated(floored_date), (f"Multiple rows found for date {floored_date} in the "
+                                                            f"target file. This is not a supported use case.")
+        if in_sheet_as := reader.value(row, config.workout_column):
+            xlsx_snippets[floored_date] = in_sheet_as
 
     return xlsx_snippets
 
 
-def get_discard_candidates(sheet,
-                           workout_notes: List[Entry],
-                           end_date: datetime) -> List[DiscardCandidate]:
-    xlsx_snippets: Dict[datetime, str] = retrieve_note_snippets_from_xlsx(sheet=sheet,
-                                                                          workout_notes=workout_notes)
-
-    discard_candidates = []
-    for note in workout_notes:
-        floored_date = note.floored_datetime
-        if (in_sheet_as := xlsx_snippets.get(floored_date)) and is_discard_candidate(note=note,
-                                                                                     xlsx_snippets=xlsx_snippets,
-                                                                                     end_date=end_date):
-            discard_candidates.append(DiscardCandidate(floored_date=floored_date, note=note, in_sheet_as=in_sheet_as))
+def retrieve_note_snippets_from_partitions(workbooks: TargetWorkbooks, dates: List[datetime]) -> Dict[datetime, str]:
+    """
+    Retrieve workout column values for the given dates from the target partitions holding them. Partitions outside the
+    range of the given dates are never loaded.
+    :param workbooks: the target workbooks
+    :param dates: the floored dates of the workouts to look up, in ascending order
+    :return: as retrieve_note_snippets_from_xlsx
+    """
+    if not dates:
+        return dict()
 
-    return discard_candidates
+    existing_partitions = workbooks.partitions_between(dates[0], dates[-1])
+    xlsx_snippets = dict()
+    for partition, partition_dates in workbooks.group_by_partition(dates, lambda date: date).items():
+        if partition in existing_partitions:
+            xlsx_snippets |= retrieve_note_snippets_from_xlsx(workbooks.reader(partition), partition_dates,
+                                                              workbooks.config)
+    return xlsx_snippets
 
 
-def is_discard_candidate(note: Entry, xlsx_snippets: Dict[datetime, str], end_date: datetime) -> bool:
-    # todo: test this properly
+def get_discard_candidates(workbooks: TargetWorkbooks,
+                           workout_notes: List[Entry],
+                           end_date: datetime) -> List[DiscardCandidate]:
     """
-    Return True if a note qualifies as being ready for discarding, else False.
-    For a given note to return True, the following criteria must be met:
+    Return the notes which qualify as being ready for discarding, in date order. For a note to qualify:
      1) the note is already written to the target file...
      2) ...for the correct date
-     3) that date is earlier than the requested end date.
-
-    :param xlsx_snippets: a dictionary where each key is the date a workout took place, and each value its string
-    representation in the target Excel file. This date should be without a time component.
-    :param note: the note we're considering as a discard candidate.
-    :param end_date: the cutoff point, after which we always return False
+     3) that date is no later than the requested end date.
+    :param workbooks: the target workbooks
+    :param workout_notes: valid workout notes, each with a unique date
+    :param end_date: the inclusive cutoff date, after which notes are never discard candidates
     """
+    # sort the notes by date, so that the cutoff can be applied by binary search before any sheet rows are read
+    sorted_notes = sorted(workout_notes, key=lambda n: n.floored_datetime)
+    sorted_dates = [note.floored_datetime for note in sorted_notes]
+    cutoff = bisect_right(sorted_dates, end_date.replace(hour=0, minute=0, second=0, microsecond=0))
 
-    # It only makes sense to discard workout notes
-    if not note.is_valid_workout_note():
-        return False
+    xlsx_snippets = retrieve_note_snippets_from_partitions(workbooks=workbooks, dates=sorted_dates[:cutoff])
 
-    # do not flag as discard candidate beyond cutoff
-    assert isinstance(end_date, datetime)
-    if note.floored_datetime and note.floored_datetime > end_date.replace(hour=0, minute=0, second=0, microsecond=0):
-        return False
+    discard_candidates = []
+    for note in sorted_notes[:cutoff]:
+        if in_sheet_as := xlsx_snippets.get(note.floored_datetime):
+            discard_candidates.append(DiscardCandidate(floored_date=note.floored_datetime,
+                                                       note=note,
+                                                       in_sheet_as=in_sheet_as))
 
-    # is note already written to the target file?
-    return bool(xlsx_snippets.get(note.floored_datetime))
+    return discard_candidates
 
 
 def present_discard_candidates(discard_candidates: List[DiscardCandidate]) -> None:
@@ -124,29 +136,46 @@ def present_discard_candidates(discard_candidates: List[DiscardCandidate]) -> No
           "are older than your specified date range")
     print("\n**DISCARD CANDIDATES**")
 
-    # populate the matrix for tabulate
-    tabulate_matrix = []
     sorted_discard_candidates = sorted(discard_candidates, key=lambda x: x.floored_date)
-    for candidate in sorted_discard_candidates:
-        # remove comment lines and Obsidian properties, because they don't appear in the xlsx file,
-        # and are therefore unhelpful for a side-by-side comparison
-        text_no_properties = uf.strip_obsidian_properties(candidate.note.text)
-        note_snippet = return_note_text_minus_comments(text_no_properties, remove_plus_signs=True).replace('\n', ' ')
-        note_snippet = note_snippet[:p.SNIPPET_LENGTH]
-
-        floored_date = candidate.floored_date
-        printable_date = floored_date.strftime("%Y-%m-%d")
-        xlsx_snippet = candidate.in_sheet_as.rstrip()[:p.SNIPPET_LENGTH]
-        similarity = uf.get_string_pct_similarity(note_snippet, xlsx_snippet)
-
-        # append the table row
-        tabulate_matrix.append([printable_date, note_snippet, xlsx_snippet, str(similarity) + "%"])
-
-    headers = ["Date", "Note snippet", "Exists in xlsx as...", "Similarity"]
-    print(tabulate(tabulate_matrix, headers=headers))
+    print_table_progressively(map(return_table_row, sorted_discard_candidates))
     print()
 
 
+def return_table_row(candidate: DiscardCandidate) -> List[str]:
+    # return the cells of the candidate's row in the table of discard candidates
+    # comment lines and Obsidian properties are left out, because they don't appear in the xlsx file, and are therefore
+    # unhelpful for a side-by-side comparison
+    note_snippet = return_note_snippet(candidate.note.text, p.SNIPPET_LENGTH)
+    xlsx_snippet = candidate.in_sheet_as.rstrip()[:p.SNIPPET_LENGTH]
+    similarity = uf.get_string_pct_similarity(note_snippet, xlsx_snippet)
+    return [candidate.floored_date.strftime("%Y-%m-%d"), note_snippet, xlsx_snippet, str(similarity) + "%"]
+
+
+def print_table_progressively(rows: Iterable[List[str]]) -> None:
+    """
+    Print the table of discard candidates, one batch of rows at a time. Every cell's width is bounded in advance (dates,
+    snippets of at most SNIPPET_LENGTH characters, and percentages), so unlike tabulate, the column widths needn't be
+    computed from every row before the first is printed.
+    :param rows: the cells of each row, as returned by return_table_row
+    """
+    widths = [max(len(TABLE_HEADERS[0]), len("YYYY-MM-DD")),
+              max(len(TABLE_HEADERS[1]), p.SNIPPET_LENGTH),
+              max(len(TABLE_HEADERS[2]), p.SNIPPET_LENGTH),
+              max(len(TABLE_HEADERS[3]), len("100%"))]
+
+    def format_row(cells: List[str]) -> str:
+        return '  '.join(cell.ljust(width) for cell, width in zip(cells, widths)).rstrip()
+
+    batch = [format_row(TABLE_HEADERS), format_row(['-' * width for width in widths])]
+    for row in rows:
+        batch.append(format_row(row))
+        if len(batch) >= TABLE_ROWS_PER_BATCH:
+            print('\n'.join(batch), flush=True)
+            batch = []
+    if batch:
+        print('\n'.join(batch), flush=True)
+
+
 def is_discard_requested() -> bool:
     # returns True if permission is given to discard ALL notes presented by present_discard_candidates()
     discard_requested = input("Discard all of the above? (y/N): ").strip().lower()
@@ -193,26 +222,45 @@ def request_end_date() -> datetime:
             return target_date
 
 
-def return_note_text_minus_comments(note_text: str, remove_plus_signs=False) -> str:
-    # given a note, return its text as a string, with comment lines omitted
-    retstr = ''
-    for line in note_text.split('\n'):
-        line = line.lstrip().replace('\n', '')
-        if line.startswith(('/', '(')):
-            continue
+def iterate_lines_minus_comments(note_text: str, remove_plus_signs=False) -> Iterator[str]:
+    # yield each line of the note, followed by a space, with Obsidian properties and comment lines omitted
+    for line in npp.preprocess_note(note_text).non_comment_lines:
         if remove_plus_signs and len(line) > 2:
             # remove "+" because it's not relevant for comparisons in present_discard_candidates(...)
-            retstr += line.replace('+ ', '').replace('+', '') + ' '
+            yield line.replace('+ ', '').replace('+', '') + ' '
+
 
-    return retstr
+def return_note_text_minus_comments(note_text: str, remove_plus_signs=False) -> str:
+    # given a note, return its text as a string, with Obsidian properties and comment lines omitted
+    return ''.join(iterate_lines_minus_comments(note_text, remove_plus_signs))
 
 
-def main():
+def return_note_snippet(note_text: str, length: int) -> str:
+    """
+    Return the start of the note's text as it appears in the table of discard candidates: without Obsidian properties,
+    comment lines or "+" signs, with lines joined by spaces, and cut to the given length. The note's lines come from
+    the shared preprocessing cache, and are only joined until the snippet is long enough.
+    :param note_text: the full text of the note
+    :param length: the maximum length of the snippet
+    :return: the snippet
+    """
+    parts, snippet_length = [], 0
+    for part in iterate_lines_minus_comments(note_text, remove_plus_signs=True):
+        parts.append(part)
+        snippet_length += len(part)
+        if snippet_length >= length:
+            break
+    return ''.join(parts)[:length]
+
+
+@rm.record_run("NotePruner")
+def prune():
     uf.validate_target_sheet_params()
 
     # fail early: try this before greeting the user, in case that it fails (e.g. because of user config problem)
-    handler = lr.LocalFileHandler()
-    notes = handler.retrieve_notes()
+    with rm.stage("retrieve_notes"):
+        handler = lr.create_handler()
+        notes = handler.retrieve_notes()
     workout_notes = [note for note in notes if note.is_valid_workout_note()]
     if not workout_notes:
         print("No workout notes found. Nothing to prune. Program exiting")
@@ -228,10 +276,11 @@ def main():
     greet()
     end_date = request_end_date()
 
-    wb = openpyxl.load_workbook(p.TARGET_PATH)
-    sheet = wb[p.TARGET_SHEET]
-
-    discard_candidates: List[DiscardCandidate] = get_discard_candidates(sheet, workout_notes, end_date)
+    # only the target partitions up to the end date are loaded
+    workbooks = TargetWorkbooks()
+    with rm.stage("compare"):
+        discard_candidates: List[DiscardCandidate] = get_discard_candidates(workbooks, workout_notes, end_date)
+        workbooks.save_date_caches()
     present_discard_candidates(discard_candidates=discard_candidates)
 
     if not discard_candidates:
@@ -247,9 +296,53 @@ def main():
         print("No changes made")
         exit()
     else:
-        handler.discard_notes([candidate.note for candidate in discard_candidates])
+        with rm.stage("discard"):
+            handler.discard_notes([candidate.note for candidate in discard_candidates])
         print("Specified notes discarded. Program execution complete.")
 
 
+def list_archive(text: str = "") -> None:
+    # print the archived notes whose title contains the given text, oldest first
+    archived = na.find_archived_notes(p.LOCAL_NOTES_ARCHIVE_DIR, text)
+    for note in archived:
+        print(f"{note.title}\t{note.bundle}\t{note.size} bytes\tarchived {note.archived.strftime('%Y-%m-%d')}")
+    print(f"{len(archived)} archived notes found in `{p.LOCAL_NOTES_ARCHIVE_DIR}`")
+
+
+def extract_from_archive(title: str, destination_dir: str) -> None:
+    # extract the archived note with the given title into the given directory. If it was archived more than once, the
+    # latest copy is extracted
+    matches = [note for note in na.list_archived_notes(p.LOCAL_NOTES_ARCHIVE_DIR)
+               if note.title.casefold() == title.casefold()]
+    if not matches:
+        print(f"No archived note is titled `{title}`. Run `main.py list` to find it")
+        exit()
+    path = na.extract_note(p.LOCAL_NOTES_ARCHIVE_DIR, matches[-1], destination_dir)
+    print(f"Extracted `{path}`")
+
+
+def pack_archive() -> None:
+    # bundle the notes which were archived as individual files
+    count = na.pack_loose_notes(p.LOCAL_NOTES_ARCHIVE_DIR, ('.txt', '.md'))
+    print(f"Packed {count} notes into bundles in `{p.LOCAL_NOTES_ARCHIVE_DIR}`")
+
+
+def main():
+    match sys.argv[1:]:
+        case []:
+            prune()
+        case ["list", *text]:
+            list_archive(" ".join(text))
+        case ["extract", title]:
+            extract_from_archive(title, os.getcwd())
+        case ["extract", title, destination_dir]:
+            extract_from_archive(title, destination_dir)
+        case ["pack"]:
+            pack_archive()
+        case _:
+            print("Usage: main.py [list [TEXT] | extract TITLE [DIRECTORY] | pack]")
+            exit()
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,176 @@
+# splits what BodyweightsToExcel and WorkoutsToExcel do into two commands. "plan" scans the notes, pairs workouts and
+# bodyweights with target rows, and saves every intended write to a change plan, without writing anything. "apply" then
+# writes exactly what was planned, without scanning notes or pairing rows again, unless the target file or bodyweights
+# note changed in between. Usage: main.py plan|apply
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+import BodyweightsToExcel.main as bw
+import WorkoutsToExcel.workout_parsing as wp
+import utilities.local_file_handler as lr
+import utilities.params as p
+import utilities.run_metrics as rm
+import utilities.utility_functions as uf
+from utilities.change_plan import ChangePlan, PlannedBodyweight, PlannedNoteUpdate, PlannedWorkout, fingerprint_file
+from utilities.shared_types import Entry
+from utilities.target_router import Partition, TargetWorkbooks
+
+
+class FingerprintedWorkbooks(TargetWorkbooks):
+    # target workbooks which fingerprint each file the first time it's touched, i.e. before anything is planned from
+    # it, whether it's loaded or streamed
+    def __init__(self):
+        super().__init__()
+        # path -> fingerprint, for every existing target file touched so far
+        self.fingerprints: Dict[str, str] = {}
+
+    def _fingerprint(self, path: str) -> None:
+        if path not in self.fingerprints and os.path.exists(path):
+            self.fingerprints[path] = fingerprint_file(path)
+
+    def _workbook(self, path: str):
+        self._fingerprint(path)
+        return super()._workbook(path)
+
+    def reader(self, partition: Partition):
+        self._fingerprint(partition.path)
+        return super().reader(partition)
+
+    def exists(self, partition: Partition) -> bool:
+        self._fingerprint(partition.path)
+        return super().exists(partition)
+
+
+def plan_workouts(workbooks: TargetWorkbooks, workout_notes: List[Entry]) -> List[PlannedWorkout]:
+    """
+    Pair the workouts from the given notes with their target rows. Workouts whose target cells hold something else are
+    planned too, as overwrites, which the user is asked to confirm when the plan is applied. Workouts whose dates aren't
+    in the target file are reported and skipped.
+    :param workbooks: the target workbooks
+    :param workout_notes: valid workout notes
+    :return: the planned workouts
+    """
+    duplicate_dates = [dt for dt, count in Counter([note.floored_datetime for note in workout_notes]).items()
+                       if count > 1]
+    if duplicate_dates:
+        raise RuntimeError(f"Multiple workout notes were found for these dates: {duplicate_dates}")
+
+    planned = []
+    matches_by_partition = wp.match_workouts_with_partitions(workbooks, wp.parse_workout_notes(workout_notes))
+    for partition, matches in matches_by_partition.items():
+        if matches.missing_date:
+            print(f"Skipping {len(matches.missing_date)} workouts whose dates aren't in the target file: "
+                  f"{matches.missing_date}")
+        for row, workout in matches.new.items():
+            planned.append(PlannedWorkout(partition=partition, row=row, date=workout.title_datetime, data=workout.data))
+        for row, (workout, target_cell_data) in matches.clashes.items():
+            planned.append(PlannedWorkout(partition=partition, row=row, date=workout.title_datetime, data=workout.data,
+                                          existing=str(target_cell_data)))
+    return planned
+
+
+@rm.record_run("PlanApply plan")
+def plan() -> ChangePlan:
+    # scan the notes and save every write they call for to the change plan file. Nothing else is written
+    workbooks = FingerprintedWorkbooks()
+    uf.validate_target_sheet_params(workbooks)
+
+    with rm.stage("retrieve_notes"):
+        handler = lr.create_handler()
+        notes: List[Entry] = handler.retrieve_notes() or []
+    workout_notes = [note for note in notes if note.is_valid_workout_note()]
+
+    change_plan = ChangePlan(created=datetime.now())
+    # as in NightlyRun, a problem with the bodyweights doesn't stop the workouts from being planned, nor vice versa
+    with rm.stage("pair_rows"):
+        try:
+            change_plan.workouts = plan_workouts(workbooks, workout_notes)
+        except Exception as e:
+            print(f"Skipping workouts. Error: {e}")
+        try:
+            bw_note = handler.return_bodyweights_note()
+            # fingerprint the note before preparing the update, so that edits made meanwhile invalidate the plan
+            bw_note_fingerprint = fingerprint_file(bw_note.path)
+            if (update := bw.prepare_bodyweights_update(workbooks, bw_note, bw.return_effective_today())) is not None:
+                change_plan.bodyweights = [PlannedBodyweight(partition=partition, row=row, text=text)
+                                           for partition, pairings in update.pairings_by_partition.items()
+                                           for row, text in pairings.items()]
+                change_plan.bodyweights_note = PlannedNoteUpdate(path=bw_note.path, fingerprint=bw_note_fingerprint,
+                                                                 new_text=update.history)
+        except Exception as e:
+            print(f"Skipping bodyweights. Error: {e}")
+
+    change_plan.workbook_fingerprints = workbooks.fingerprints
+    workbooks.save_date_caches()
+    change_plan.save(p.CHANGE_PLAN_PATH)
+    print(f"Planned {len(change_plan.workouts)} workouts ({len(change_plan.overwrites)} of which overwrite existing "
+          f"values) and {len(change_plan.bodyweights)} bodyweights. Saved the plan to `{p.CHANGE_PLAN_PATH}`")
+    return change_plan
+
+
+@rm.record_run("PlanApply apply")
+def apply() -> None:
+    # write what the change plan file says, then discard the plan
+    if not os.path.exists(p.CHANGE_PLAN_PATH):
+        print(f"No change plan found at `{p.CHANGE_PLAN_PATH}`. Run this program with `plan` first")
+        exit()
+
+    change_plan = ChangePlan.load(p.CHANGE_PLAN_PATH)
+    if changed_files := change_plan.changed_files():
+        raise RuntimeError(f"These files have changed since the change plan was made, at {change_plan.created}. "
+                           f"Nothing has been written. Please make a new plan.\n{changed_files}")
+    if change_plan.is_empty():
+        print("The change plan holds nothing to write")
+        os.remove(p.CHANGE_PLAN_PATH)
+        return
+
+    clashes = [(wp.ParsedWorkout(title_datetime=w.date, data=w.data), w.existing) for w in change_plan.overwrites]
+    if not wp.confirm_overwrites(clashes):
+        print("\nUser chose not to continue")
+        exit()
+
+    workouts_to_write: Dict[Partition, Dict[int, wp.ParsedWorkout]] = {}
+    for w in change_plan.workouts:
+        workouts_to_write.setdefault(w.partition, {})[w.row] = wp.ParsedWorkout(title_datetime=w.date, data=w.data)
+    pairings_by_partition: Dict[Partition, bw.RowBodyweightPairings] = {}
+    for b in change_plan.bodyweights:
+        pairings_by_partition.setdefault(b.partition, bw.RowBodyweightPairings())[b.row] = b.text
+
+    workbooks = TargetWorkbooks()
+    with rm.stage("write"):
+        if workouts_to_write:
+            wp.write_workouts_to_partitions(workbooks, workouts_to_write)
+        if pairings_by_partition:
+            print("Writing bodyweights to target file")
+            bw.write_bodyweights_to_partitions(workbooks, pairings_by_partition)
+        workbooks.save(backup=True)
+
+        if change_plan.bodyweights_note is not None:
+            # only once the bodyweights are saved to the target file can they be removed from the note
+            print("Updating bodyweights note")
+            lr.write_bodyweights_note(change_plan.bodyweights_note.path, change_plan.bodyweights_note.new_text)
+        if pairings_by_partition:
+            bw.update_bodyweight_series(workbooks, pairings_by_partition)
+        wp.export_written_workouts(workouts_to_write)
+
+    # the target file has changed, so the plan couldn't be applied again anyway
+    os.remove(p.CHANGE_PLAN_PATH)
+    print("All done!")
+
+
+def main():
+    match sys.argv[1:]:
+        case ["plan"]:
+            plan()
+        case ["apply"]:
+            apply()
+        case _:
+            print("Usage: main.py plan|apply")
+            exit()
+
+
+if __name__ == '__main__':
+    main()
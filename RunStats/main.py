@@ -0,0 +1,103 @@
+# summarises the run metrics history which the other tools add to (see RUN_METRICS_HISTORY_PATH in params.py). Flags
+# runs which took much longer, or read much more, than the same tool's runs before them, and tools whose runs have been
+# steadily getting slower or reading more, e.g. as the notes directory grows. Usage: main.py [tool name]
+import statistics
+import sys
+from datetime import timedelta
+from typing import Dict, List
+
+import utilities.params as p
+from utilities.run_metrics import BYTES_READ, RunRecord, load_history
+
+# the metrics checked for outliers and growth, and their units
+CHECKED_METRICS = {"duration_seconds": "s", BYTES_READ: "bytes"}
+# the fewest earlier runs a run is compared with, and the fewest runs a trend is calculated from
+MIN_BASELINE_RUNS = 5
+# how many of each tool's latest runs are listed
+LISTED_RUNS = 10
+
+
+def find_outliers(runs: List[RunRecord]) -> Dict[int, List[str]]:
+    """
+    Compare each run of a tool with the median of the tool's previous RUN_STATS_BASELINE_RUNS runs.
+    :param runs: one tool's runs, oldest first
+    :return: the indices of the runs which took over RUN_STATS_OUTLIER_FACTOR times as long, or read over that many
+    times as many bytes, as the median, each with the reasons why
+    """
+    outliers = {}
+    for idx, run in enumerate(runs):
+        baseline = runs[max(0, idx - p.RUN_STATS_BASELINE_RUNS):idx]
+        if len(baseline) < MIN_BASELINE_RUNS:
+            continue
+        for metric, unit in CHECKED_METRICS.items():
+            median = statistics.median(earlier.metric(metric) for earlier in baseline)
+            if median > 0 and run.metric(metric) > p.RUN_STATS_OUTLIER_FACTOR * median:
+                outliers.setdefault(idx, []).append(
+                    f"{metric} was {run.metric(metric):g} {unit}, {run.metric(metric) / median:.1f}x the median of "
+                    f"the {len(baseline)} runs before it")
+    return outliers
+
+
+def monthly_growth_pct(runs: List[RunRecord], metric: str) -> float | None:
+    """
+    Return how much the given metric grew every 30 days over a tool's last RUN_STATS_BASELINE_RUNS runs, as a percentage
+    of its mean, according to a least-squares fit. Return None if there are too few runs to tell.
+    :param runs: one tool's runs, oldest first
+    :param metric: "duration_seconds", or one of the counters
+    """
+    runs = runs[-p.RUN_STATS_BASELINE_RUNS:]
+    if len(runs) < MIN_BASELINE_RUNS:
+        return None
+    days = [(run.started - runs[0].started) / timedelta(days=1) for run in runs]
+    values = [run.metric(metric) for run in runs]
+    mean = statistics.fmean(values)
+    if days[-1] <= 0 or mean <= 0:
+        return None
+    slope, _ = statistics.linear_regression(days, values)
+    return 100 * slope * 30 / mean
+
+
+def summarise_tool(tool: str, runs: List[RunRecord]) -> List[str]:
+    # return a report of one tool's runs, listing the latest, then any warnings
+    lines = [f"{tool}: {len(runs)} runs, the latest at {runs[-1].started:%Y-%m-%d %H:%M}"]
+    outliers = find_outliers(runs)
+    for idx in range(max(0, len(runs) - LISTED_RUNS), len(runs)):
+        run = runs[idx]
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in run.stage_seconds.items())
+        flags = ("" if run.succeeded else " FAILED") + (" SLOW" if idx in outliers else "")
+        lines.append(f"  {run.started:%Y-%m-%d %H:%M}  {run.duration_seconds:8.1f}s  "
+                     f"{run.counters.get(BYTES_READ, 0):>12} bytes  {stages}{flags}")
+
+    warnings = [f"  ! the run at {runs[idx].started:%Y-%m-%d %H:%M}: {reason}"
+                for idx, reasons in outliers.items() if idx >= len(runs) - LISTED_RUNS for reason in reasons]
+    for metric in CHECKED_METRICS:
+        growth = monthly_growth_pct(runs, metric)
+        if growth is not None and growth > p.RUN_STATS_MAX_MONTHLY_GROWTH_PCT:
+            warnings.append(f"  ! {metric} has been growing by {growth:.0f}% a month over the last "
+                            f"{min(len(runs), p.RUN_STATS_BASELINE_RUNS)} runs")
+    return lines + warnings
+
+
+def main():
+    if not p.RUN_METRICS_HISTORY_PATH:
+        print("No run metrics are being recorded. Set RUN_METRICS_HISTORY_PATH in params.py to record them")
+        exit()
+
+    runs_by_tool: Dict[str, List[RunRecord]] = {}
+    for run in load_history(p.RUN_METRICS_HISTORY_PATH):
+        runs_by_tool.setdefault(run.tool, []).append(run)
+    if len(sys.argv) > 1:
+        runs_by_tool = {tool: runs for tool, runs in runs_by_tool.items() if tool == sys.argv[1]}
+    if not runs_by_tool:
+        print(f"No runs found in `{p.RUN_METRICS_HISTORY_PATH}`")
+        exit()
+
+    for tool, runs in sorted(runs_by_tool.items()):
+        # runs are appended as they finish, so overlapping runs may be out of order
+        runs.sort(key=lambda run: run.started)
+        print("\n".join(summarise_tool(tool, runs)))
+        print()
+
+
+if __name__ == '__main__':
+    main()
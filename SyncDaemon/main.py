@@ -0,0 +1,121 @@
+# keeps running, and writes workouts and bodyweights to the target file whenever the notes they come from change.
+import time
+from typing import Dict, List, Set, Tuple
+
+import BodyweightsToExcel.main as bw
+import WorkoutsToExcel.workout_parsing as wp
+import utilities.basic_functions as bf
+import utilities.local_file_handler as lr
+import utilities.utility_functions as uf
+from utilities.config import Config
+from utilities.note_watcher import create_combined_watcher
+from utilities.shared_types import Entry
+from utilities.target_router import TargetWorkbooks
+
+# how often to check for changed notes, in seconds
+POLL_INTERVAL_SECONDS = 5
+# how long notes must go unchanged before changes are written, in seconds. A burst of edits within this time leads to
+# a single save of the target file
+DEBOUNCE_SECONDS = 30
+
+
+class SyncDaemon:
+    def __init__(self, config: Config | None = None):
+        # the settings to sync with. Default to those in params.py
+        self._config = config or Config.from_params()
+        uf.validate_target_sheet_params(TargetWorkbooks(self._config))
+
+        # the note index is built once, then kept up to date with the notes that change, in every notes directory
+        self._handler = lr.create_handler(self._config)
+
+        # the versions (modification time in nanoseconds, and size) of notes this daemon wrote itself, so that it can
+        # tell its own writes apart from the user's
+        self._known_versions: Dict[str, Tuple[int, int]] = {}
+        # target workbooks are kept loaded between syncs, and only reloaded if something other than us changed them
+        self._workbooks = TargetWorkbooks(self._config)
+
+    def _is_own_write(self, path: str) -> bool:
+        try:
+            return self._known_versions.get(path) == bf.file_version(path)
+        except FileNotFoundError:
+            return False
+
+    def sync(self, changed_paths: Set[str]) -> None:
+        """
+        Write the workouts and bodyweights from the given changed notes to the target file, in a single save.
+        Workouts whose target cells already hold something else are reported, but never overwritten.
+        :param changed_paths: the paths of notes which were created, modified or deleted
+        """
+        changed_paths = {path for path in changed_paths if not self._is_own_write(path)}
+        refreshed: List[Entry] = self._handler.refresh_notes(list(changed_paths))
+        workout_notes = [note for note in refreshed if note.is_valid_workout_note()]
+        bodyweights_changed = any(note.is_bodyweights_note(self._config.bodyweights_note_title) for note in refreshed)
+        if not workout_notes and not bodyweights_changed:
+            return
+
+        print(f"{len(changed_paths)} notes changed")
+        workouts_to_write = wp.prepare_unattended_workouts(self._workbooks, workout_notes)
+        bw_note, bw_update = None, None
+        if bodyweights_changed:
+            bw_note = self._handler.return_bodyweights_note()
+            bw_update = bw.prepare_bodyweights_update(self._workbooks, bw_note, bw.return_effective_today())
+
+        if not workouts_to_write and bw_update is None:
+            self._workbooks.save_date_caches()
+            print("Nothing new to write")
+            return
+
+        # each affected partition of the target is backed up and saved once
+        if workouts_to_write:
+            wp.write_workouts_to_partitions(self._workbooks, workouts_to_write)
+        if bw_update is not None:
+            print("Writing bodyweights to target file")
+            bw.write_bodyweights_to_partitions(self._workbooks, bw_update.pairings_by_partition)
+        self._workbooks.save(backup=True)
+
+        if bw_update is not None:
+            bw.update_bodyweights_note(self._handler, bw_note, bw_update.history, self._config)
+            self._known_versions[bw_note.path] = bf.file_version(bw_note.path)
+            self._handler.refresh_notes([bw_note.path])
+            bw.update_bodyweight_series(self._workbooks, bw_update.pairings_by_partition)
+        wp.export_written_workouts(workouts_to_write, self._config)
+
+    def run(self) -> None:
+        # watch for changes until interrupted, writing each burst of changes once it has settled
+        config = self._config
+        source_dirs = [config.local_notes_source_dir, *config.additional_notes_source_dirs]
+        watcher = create_combined_watcher(source_dirs,
+                                          extensions=self._handler.source_file_extensions,
+                                          ignore_dirs=[config.local_excel_backup_dir, config.local_notes_archive_dir],
+                                          interval=POLL_INTERVAL_SECONDS,
+                                          config=config)
+        print(f"Watching {', '.join(f'`{source_dir}`' for source_dir in source_dirs)} for changes using "
+              f"{type(watcher).__name__}. Press Ctrl+C to stop")
+
+        pending: Set[str] = set()
+        last_change = 0.0
+        while True:
+            if changed := watcher.wait_for_changes():
+                pending |= changed
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= DEBOUNCE_SECONDS:
+                try:
+                    self.sync(pending)
+                except Exception as e:
+                    # keep running. The user can fix the notes, which triggers another sync
+                    print(f"Failed to sync changed notes. Error: {e}")
+                    # the workbooks in memory may be partially written to. Discard them
+                    self._workbooks = TargetWorkbooks(self._config)
+                pending = set()
+
+
+def main():
+    daemon = SyncDaemon()
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == '__main__':
+    main()
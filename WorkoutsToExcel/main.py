@@ -1,24 +1,48 @@
 from collections import Counter
-from typing import List
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
 
-import openpyxl
 import workout_parsing as wp
 import utilities.local_file_handler as lr
 
-import utilities.params as p
+import utilities.run_metrics as rm
 import utilities.utility_functions as uf
+from utilities.config import Config
 from utilities.shared_types import Entry
+from utilities.target_router import TargetWorkbooks
 
 
-def main():
-    uf.validate_target_sheet_params()
+@dataclass
+class WorkoutsResult:
+    # what a run wrote
+    # the number of workouts written
+    written: int = 0
+    # why nothing was written, if so
+    reason: str = ""
+
+
+def run(config: Config | None = None,
+        confirm_overwrites: Callable[[List[Tuple[wp.ParsedWorkout, str]]], bool] | None = None) -> WorkoutsResult:
+    """
+    Write the workouts in the notes to the target file, according to the given settings. Nothing is kept between runs
+    except the workbooks' caches, so a single process can run this repeatedly, with any settings.
+    :param config: the settings to use. Defaults to those in params.py
+    :param confirm_overwrites: decides whether to overwrite target cells which hold different workouts, as in
+    workout_parsing.pair_workouts_with_partitions. By default they're reported and never overwritten, so that nothing
+    waits for input when unattended
+    :return: what was written, or why nothing was
+    """
+    config = config or Config.from_params()
+    workbooks = TargetWorkbooks(config)
+    uf.validate_target_sheet_params(workbooks)
 
-    handler = lr.LocalFileHandler()
-    notes: List[Entry] = handler.retrieve_notes()
+    with rm.stage("retrieve_notes"):
+        handler = lr.create_handler(config)
+        notes: List[Entry] = handler.retrieve_notes()
     workout_notes = [note for note in notes if note.is_valid_workout_note(raise_on_invalid_format=True)]
 
     if not workout_notes:
-        print("No workout notes found! Exiting.")
+        return WorkoutsResult(reason="No workout notes found")
 
     duplicate_workout_dates = [dt for dt, count in Counter([note.floored_datetime for note in workout_notes]).items()
                                if count > 1]
@@ -28,15 +52,30 @@ def main():
                            f"{duplicate_workout_dates}")
 
     # Get each workout into a writeable format
-    parsed_workouts = wp.parse_workout_notes(workout_notes)
+    with rm.stage("parse_workouts"):
+        parsed_workouts = wp.parse_workout_notes(workout_notes)
 
-    # Pair the parsed workouts with target rows in the Excel file
-    sheet = openpyxl.load_workbook(p.TARGET_PATH)[p.TARGET_SHEET]
-    data_to_write = wp.pair_workouts_with_rows(target_sheet=sheet,
-                                               parsed_workouts=parsed_workouts)
+    # Pair the parsed workouts with target rows in the Excel file, loading only the partitions which hold their dates
+    with rm.stage("pair_rows"):
+        pairing = wp.pair_workouts_with_partitions(workbooks=workbooks,
+                                                   parsed_workouts=parsed_workouts,
+                                                   confirm=confirm_overwrites)
+    if pairing.reason:
+        return WorkoutsResult(reason=pairing.reason)
 
     # Write it to target file
-    wp.write_data_to_xlsx(data_to_write, backup=True)
+    with rm.stage("write"):
+        wp.write_data_to_xlsx(workbooks, pairing.to_write, backup=True)
+    return WorkoutsResult(written=sum(len(rows) for rows in pairing.to_write.values()))
+
+
+@rm.record_run("WorkoutsToExcel")
+def main():
+    # run from the command line, so the user can be asked about overwriting
+    result = run(confirm_overwrites=wp.confirm_overwrites)
+    if result.reason:
+        print(f"{result.reason}. Exiting.")
+        return
 
     print("All done! Consider double-checking the now-updated target file, then running the NotePruner script if "
           "you'd like to discard old workouts")
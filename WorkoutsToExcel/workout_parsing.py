@@ -1,12 +1,18 @@
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 
-import openpyxl
-
-import utilities.params as p
+import utilities.note_preprocessing as npp
+import utilities.row_locator as rl
+import utilities.run_metrics as rm
+import utilities.sheet_reader as sr
 import utilities.utility_functions as uf
+import utilities.workout_export as we
+from utilities.config import Config
 from utilities.shared_types import Entry
+from utilities.target_router import Partition, TargetWorkbooks
+from utilities.workout_grammar import StructuredWorkout, parse_workout_lines
 
 
 @dataclass
@@ -17,6 +23,9 @@ class ParsedWorkout:
     # the formatted workout data
     data: str
 
+    # the exercises, loads and sets which data was rendered from, if the workout was parsed from a note
+    structure: StructuredWorkout | None = field(default=None, compare=False, repr=False)
+
     def __post_init__(self):
         assert isinstance(self.title_datetime, datetime)
         assert isinstance(self.data, str)
@@ -41,149 +50,279 @@ def parse_workout_notes(workout_notes: List[Entry]) -> List[ParsedWorkout]:
     parsed_data_lst = []
     for note in workout_notes:
         # strip lines, remove Obsidian properties, drop empty lines and comment lines.
-        raw_text_no_properties: str = uf.strip_obsidian_properties(note.text)
-        workout_text = [line.strip() for line in raw_text_no_properties.split('\n')
-                        if line
-                        and not (line_is_comment(line) or line.startswith('\n'))]
-
-        # clean up and format one workout
-        single_workout_lines = []
-        for line in workout_text:
-            parsed_line = capitalize_selectively(line)
+        workout_text = npp.preprocess_note(note.text).non_comment_lines
 
-            # clean-up note text
-            for char in [';', '..', ' .']:
-                parsed_line = parsed_line.replace(char, '.')
-            parsed_line = parsed_line.replace('\n', '')
-            parsed_line = parsed_line.replace('  ', ' ')
+        # clean up each line, then parse the exercises' names, loads and sets. The last line is the estimated duration
+        structure = parse_workout_lines([clean_workout_line(line) for line in workout_text])
 
-            # the "+" symbol can be used at the beginning of the line in a note, to indicate an "extra" exercise (i.e.
-            # one not part of the standard workout). We include the line, but not the "+" symbol.
-            parsed_line = parsed_line.lstrip('+ ')
-            parsed_line = parsed_line.lstrip('+')
+        # save the formatted workout, e.g. "Squat 90kg: 8,8; Dead hang. Est 50 mins"
+        parsed_data_lst.append(ParsedWorkout(title_datetime=note.floored_datetime,
+                                             data=structure.render(),
+                                             structure=structure))
 
-            # trailing semi-colons can happen due to data entry errors
-            if parsed_line.endswith(":"):
-                parsed_line = parsed_line[:-1]
+    rm.count(rm.WORKOUTS_PARSED, len(parsed_data_lst))
+    return parsed_data_lst
 
-            parsed_line = parsed_line.rstrip()
 
-            # add that cleaned line to the workout's lines
-            single_workout_lines.append(parsed_line)
+def clean_workout_line(line: str) -> str:
+    """
+    Clean up and format one line of a workout note.
+    :param line: the stripped line
+    :return: the cleaned line
+    """
+    parsed_line = capitalize_selectively(line)
 
-        # semicolon-separate each exercise
-        exercises_str = '; '.join(single_workout_lines)
+    # clean-up note text. Semicolons are replaced, as they separate exercises in the formatted workout
+    for char in [';', '..', ' .']:
+        parsed_line = parsed_line.replace(char, '.')
+    parsed_line = parsed_line.replace('\n', '')
+    parsed_line = parsed_line.replace('  ', ' ')
 
-        # replace the final semicolon with a full stop.
-        exercises_str, est_xx_mins_line = exercises_str.rsplit('; ', 1)
-        complete_workout_text = exercises_str + ". " + est_xx_mins_line
+    # the "+" symbol can be used at the beginning of the line in a note, to indicate an "extra" exercise (i.e.
+    # one not part of the standard workout). We include the line, but not the "+" symbol.
+    parsed_line = parsed_line.lstrip('+ ')
+    parsed_line = parsed_line.lstrip('+')
 
-        # save the formatted workout
-        parsed_data_lst.append(ParsedWorkout(title_datetime=note.floored_datetime, data=complete_workout_text))
+    # trailing semi-colons can happen due to data entry errors
+    if parsed_line.endswith(":"):
+        parsed_line = parsed_line[:-1]
 
-    return parsed_data_lst
+    return parsed_line.rstrip()
 
 
-def pair_workouts_with_rows(target_sheet, parsed_workouts: List[ParsedWorkout]) -> Dict[int, ParsedWorkout]:
+@dataclass
+class WorkoutRowMatches:
+    # the result of matching parsed workouts with rows in the target sheet
+    # workouts whose target cell is empty, keyed by target row
+    new: Dict[int, ParsedWorkout] = field(default_factory=dict)
+    # workouts whose target cell already holds exactly that workout
+    already_written: List[ParsedWorkout] = field(default_factory=list)
+    # workouts whose target cell holds something else, keyed by target row. Each value is the workout and the existing
+    # cell contents
+    clashes: Dict[int, Tuple[ParsedWorkout, str]] = field(default_factory=dict)
+    # workouts whose date could not be found in the target sheet
+    missing_date: List[ParsedWorkout] = field(default_factory=list)
+
+
+def match_workouts_with_rows(target_sheet, parsed_workouts: List[ParsedWorkout],
+                             config: Config | None = None) -> WorkoutRowMatches:
     """
-    Given a list of parsed workouts, pair each workout with a unique row in the target file, such that the cell value
-    in the date column of that row equals the value of the workout's interpreted datetime.
-    :param target_sheet: the target sheet to inspect
+    Given a list of parsed workouts, match each workout with the row in the target file whose date column value equals
+    the workout's interpreted datetime, and sort them according to what that row's workout cell holds. Nothing is
+    printed, and no input is requested.
+    :param target_sheet: the target sheet to inspect, or a reader of it
     :param parsed_workouts: a list of fully formatted workouts
-    :return: a list of parsed workouts, each paired with suitable row number.
+    :param config: the settings specifying the target's columns. Defaults to those in params.py
+    :return: a WorkoutRowMatches object
     """
-    if not len(parsed_workouts):
-        print("No workouts to write")
-        exit()
+    config = config or Config.from_params()
+    matches = WorkoutRowMatches()
 
-    # the object to be returned
-    workouts_to_write: Dict[int, ParsedWorkout] = {}
-
-    # collect errors
-    failed_to_find_date_cell: [ParsedWorkout] = []
-    workout_already_written: [ParsedWorkout] = []
-    workout_info_clashes: Dict[int, Tuple[ParsedWorkout, str]] = {}
-
-    sheet = target_sheet
+    reader = sr.reader_for(target_sheet)
+    locator = rl.DateRowLocator(reader, config.date_column)
     for workout in parsed_workouts:
-        row_match = uf.find_row_of_cell_matching_datetime(sheet=sheet,
-                                                          datetime_target=workout.title_datetime,
-                                                          date_column=p.DATE_COLUMN,
-                                                          raise_on_failure=False)
+        row_match = locator.row_of(workout.title_datetime)
         if row_match == -1:
-            failed_to_find_date_cell.append(workout)
+            matches.missing_date.append(workout)
             continue
 
-        target_cell_data = sheet.cell(row=row_match, column=p.WORKOUT_COLUMN).value
+        target_cell_data = reader.value(row_match, config.workout_column)
         if not target_cell_data:
             # success. Match found and cell is empty
-            assert row_match not in workouts_to_write.keys(), ("Error: multiple workouts are scheduled to be written "
-                                                               f"to the same cell, in row {row_match}")
+            assert row_match not in matches.new.keys(), ("Error: multiple workouts are scheduled to be written "
+                                                         f"to the same cell, in row {row_match}")
             assert row_match > 0
-            workouts_to_write[row_match] = workout
+            matches.new[row_match] = workout
 
         elif target_cell_data == workout.data:
-            workout_already_written.append(workout)
+            matches.already_written.append(workout)
 
         else:
             # save the workout object, and existing cell contents, for later comparison / context
-            workout_info_clashes[row_match] = (workout, target_cell_data)
+            matches.clashes[row_match] = (workout, target_cell_data)
+
+    return matches
+
+
+def match_workouts_with_partitions(workbooks: TargetWorkbooks,
+                                   parsed_workouts: List[ParsedWorkout]) -> Dict[Partition, WorkoutRowMatches]:
+    """
+    Route each parsed workout to the target partition holding its date, then match the workouts with rows in each
+    partition's sheet. Only the partitions holding these workouts' dates are loaded. Workouts whose partition doesn't
+    exist are reported as missing their date.
+    :param workbooks: the target workbooks
+    :param parsed_workouts: a list of fully formatted workouts
+    :return: the matches within each partition
+    """
+    matches_by_partition = {}
+    for partition, workouts in workbooks.group_by_partition(parsed_workouts, lambda w: w.title_datetime).items():
+        if workbooks.exists(partition):
+            matches_by_partition[partition] = match_workouts_with_rows(workbooks.reader(partition), workouts,
+                                                                       workbooks.config)
+        else:
+            matches_by_partition[partition] = WorkoutRowMatches(missing_date=workouts)
+    return matches_by_partition
+
+
+@dataclass
+class WorkoutPairing:
+    # the result of pairing parsed workouts with target rows
+    # for each partition, the workouts to write, keyed by target row
+    to_write: Dict[Partition, Dict[int, ParsedWorkout]] = field(default_factory=dict)
+    # why nothing is to be written, if so
+    reason: str = ""
+
+
+def pair_workouts_with_partitions(workbooks: TargetWorkbooks, parsed_workouts: List[ParsedWorkout],
+                                  confirm: Callable[[List[Tuple[ParsedWorkout, str]]], bool] | None = None
+                                  ) -> WorkoutPairing:
+    """
+    Given a list of parsed workouts, pair each workout with a unique row in the target partition holding its date, such
+    that the cell value in the date column of that row equals the value of the workout's interpreted datetime. If any
+    target cells already hold different values, ask whether to overwrite them.
+    :param workbooks: the target workbooks
+    :param parsed_workouts: a list of fully formatted workouts
+    :param confirm: given the workouts whose target cells hold different values, and those values, return whether to
+    overwrite them. Defaults to refuse_overwrites, as nobody may be there to ask. Pass confirm_overwrites to
+    ask the user
+    :return: for each partition, the parsed workouts to write, each paired with suitable row number. If there's nothing
+    to write, or overwriting wasn't confirmed, the reason is given instead
+    """
+    confirm = confirm or refuse_overwrites
+    if not len(parsed_workouts):
+        return WorkoutPairing(reason="No workouts to write")
+
+    matches_by_partition = match_workouts_with_partitions(workbooks, parsed_workouts)
+    # remember the dates parsed while matching, even if nothing is written below
+    workbooks.save_date_caches()
 
     # processing done
-    if len(failed_to_find_date_cell) != 0:
-        raise RuntimeError(f"Failed to find row matches for the following {len(failed_to_find_date_cell)} "
+    missing_date = [workout for matches in matches_by_partition.values() for workout in matches.missing_date]
+    if len(missing_date) != 0:
+        raise RuntimeError(f"Failed to find row matches for the following {len(missing_date)} "
                            f"workouts. Please verify that each of the matching date value exist in the target Excel "
-                           f"file, in the correct place.\n{failed_to_find_date_cell}")
+                           f"file, in the correct place.\n{missing_date}")
+
+    new_count = sum(len(matches.new) for matches in matches_by_partition.values())
+    already_written_count = sum(len(matches.already_written) for matches in matches_by_partition.values())
+    print(f"{new_count} new workouts can be written to target cells. "
+          f"{already_written_count} workouts are already written to target cells")
 
-    print(f"{len(workouts_to_write)} new workouts can be written to target cells. "
-          f"{len(workout_already_written)} workouts are already written to target cells")
+    if already_written_count == len(parsed_workouts):
+        return WorkoutPairing(reason="No new workouts to write")
 
-    if len(workout_already_written) == len(parsed_workouts):
-        print("No new workouts to write. Program exiting")
-        exit()
+    workout_info_clashes = [clash for matches in matches_by_partition.values() for clash in matches.clashes.values()]
+    if not confirm(workout_info_clashes):
+        return WorkoutPairing(reason="Overwriting the existing values was not confirmed")
 
-    if len(workout_info_clashes) != 0:
-        print(f"The following {len(workout_info_clashes)} workouts already have *different* values "
-              f"written to their target cells in the Excel.")
+    workouts_to_write = {}
+    for partition, matches in matches_by_partition.items():
+        conflicting_workouts = {row: v[0] for row, v in matches.clashes.items()}
+        # sanity checks
+        assert all(isinstance(workout, ParsedWorkout) for workout in conflicting_workouts.values())
+        assert set(matches.new.keys()).isdisjoint(set(conflicting_workouts.keys()))
+        if rows := matches.new | conflicting_workouts:
+            workouts_to_write[partition] = rows
+    return WorkoutPairing(to_write=workouts_to_write)
+
+
+def confirm_overwrites(clashes: List[Tuple[ParsedWorkout, str]]) -> bool:
+    """
+    Show each workout next to the different value already in its target cell, and ask the user whether to overwrite
+    those values. Return True if there's nothing to overwrite, or the user agrees.
+    :param clashes: each workout, and its target cell's existing contents
+    :return: True or False
+    """
+    if len(clashes) == 0:
+        return True
 
-        for workout, target_cell_data in workout_info_clashes.values():
-            neat_datetime = workout.title_datetime.strftime('%Y-%m-%d')
-            similarity = uf.get_string_pct_similarity(workout.data, target_cell_data)
-            print(f"{neat_datetime} INTENDED WRITE {similarity=}%:\t{workout.data}")
-            print(f"{neat_datetime} EXISTING VALUE {similarity=}%:\t{target_cell_data}")
+    print(f"The following {len(clashes)} workouts already have *different* values "
+          f"written to their target cells in the Excel.")
+    for workout, target_cell_data in clashes:
+        neat_datetime = workout.title_datetime.strftime('%Y-%m-%d')
+        similarity = uf.get_string_pct_similarity(workout.data, target_cell_data)
+        print(f"{neat_datetime} INTENDED WRITE {similarity=}%:\t{workout.data}")
+        print(f"{neat_datetime} EXISTING VALUE {similarity=}%:\t{target_cell_data}")
 
-        inp = input("Do you wish to proceed, and OVERWRITE the existing values? (y/N) ")
-        if inp.lower().strip() not in ["y", "yes"]:
-            print("\nUser chose not to continue")
-            exit()
+    inp = input("Do you wish to proceed, and OVERWRITE the existing values? (y/N) ")
+    return inp.lower().strip() in ["y", "yes"]
 
-    conflicting_workouts = {row: v[0] for row, v in workout_info_clashes.items()}
-    # sanity checks
-    assert all(isinstance(workout, ParsedWorkout) for workout in conflicting_workouts.values())
-    assert set(workouts_to_write.keys()).isdisjoint(set(conflicting_workouts.keys()))
-    return workouts_to_write | conflicting_workouts
 
+def refuse_overwrites(clashes: List[Tuple[ParsedWorkout, str]]) -> bool:
+    # the unattended alternative to confirm_overwrites: report the workouts whose target cells hold different values,
+    # and never overwrite them. Return True only if there's nothing to overwrite
+    for workout, target_cell_data in clashes:
+        print(f"Won't overwrite the workout for {workout.title_datetime.strftime('%Y-%m-%d')}. Its target cell already "
+              f"holds a different value: {target_cell_data}")
+    return len(clashes) == 0
 
-def write_data_to_xlsx(data_to_write: Dict[int, ParsedWorkout], backup=True) -> None:
+
+def prepare_unattended_workouts(workbooks: TargetWorkbooks,
+                                workout_notes: List[Entry]) -> Dict[Partition, Dict[int, ParsedWorkout]]:
+    """
+    Return the workouts from the given notes which can be written without asking the user anything, keyed by target
+    partition and row. Unlike pair_workouts_with_partitions, nothing is ever overwritten: workouts whose target cells
+    already hold something else, or whose dates are missing or duplicated, are reported and skipped.
+    :param workbooks: the target workbooks
+    :param workout_notes: valid workout notes
+    :return: for each partition, the workouts to write, each paired with its row
+    """
+    if not workout_notes:
+        return {}
+
+    duplicate_dates = [dt for dt, count in Counter([note.floored_datetime for note in workout_notes]).items()
+                       if count > 1]
+    if duplicate_dates:
+        print(f"Skipping workouts. Multiple workout notes were found for these dates: {duplicate_dates}")
+        return {}
+
+    matches_by_partition = match_workouts_with_partitions(workbooks, parse_workout_notes(workout_notes))
+    workouts_to_write = {}
+    for partition, matches in matches_by_partition.items():
+        if matches.missing_date:
+            print(f"Skipping {len(matches.missing_date)} workouts whose dates aren't in the target file: "
+                  f"{matches.missing_date}")
+        for workout, target_cell_data in matches.clashes.values():
+            # unattended, we never overwrite. Run WorkoutsToExcel to resolve these interactively
+            print(f"Skipping workout for {workout.title_datetime.strftime('%Y-%m-%d')}. Its target cell already "
+                  f"holds a different value: {target_cell_data}")
+        if matches.new:
+            workouts_to_write[partition] = matches.new
+    return workouts_to_write
+
+
+def write_data_to_xlsx(workbooks: TargetWorkbooks, data_to_write: Dict[Partition, Dict[int, ParsedWorkout]],
+                       backup=True) -> None:
     """
-    Write data to the Excel file. Back it up first if requested. Validation should be done prior to calling this
-    function.
-    :param data_to_write: a dict of objects, where the key is the target row, and the value the string to write
-    :param backup: whether to back up the file before writing
+    Write data to the target partitions, then save the workbooks holding them. Back each up first if requested.
+    Validation should be done prior to calling this function.
+    :param workbooks: the target workbooks
+    :param data_to_write: for each partition, a dict of objects, where the key is the target row, and the value the
+    workout to write
+    :param backup: whether to back up each workbook before writing
     """
+    write_workouts_to_partitions(workbooks, data_to_write)
+    workbooks.save(backup=backup)
+    export_written_workouts(data_to_write, workbooks.config)
 
-    if backup:
-        uf.backup_file_to_dir(source_file_path=p.TARGET_PATH, backup_directory=p.LOCAL_EXCEL_BACKUP_DIR)
 
-    wb = openpyxl.load_workbook(p.TARGET_PATH)
-    sheet = wb[p.TARGET_SHEET]
+def write_workouts_to_partitions(workbooks: TargetWorkbooks,
+                                 data_to_write: Dict[Partition, Dict[int, ParsedWorkout]]) -> None:
+    # write workouts to their target partitions, without saving. This lets callers save once, after writing other data
+    # too
+    print(f"Writing {sum(len(rows) for rows in data_to_write.values())} workouts to target file.")
+    for partition, rows in data_to_write.items():
+        for row, workout in rows.items():
+            workbooks.write_cell(partition, row, workbooks.config.workout_column, workout.data)
 
-    print(f"Writing {len(data_to_write)} workouts to target file.")
-    for row, workout in data_to_write.items():
-        target_cell = sheet.cell(row=row, column=p.WORKOUT_COLUMN)
-        target_cell.value = workout.data
 
-    wb.save(p.TARGET_PATH)
+def export_written_workouts(data_to_write: Dict[Partition, Dict[int, ParsedWorkout]],
+                            config: Config | None = None) -> None:
+    # export the workouts once they're saved to the target file, if enabled in the given settings, or params.py
+    if not data_to_write:
+        return
+    we.export_written_workouts({workout.title_datetime: workout.data
+                                for rows in data_to_write.values() for workout in rows.values()}, config)
 
 
 def capitalize_selectively(line: str) -> str:
@@ -204,16 +343,3 @@ def capitalize_selectively(line: str) -> str:
             # capitalize the first letter
             return line[:ind] + line[ind].upper() + line[ind + 1:]
     return line
-
-
-def line_is_comment(line: str) -> bool:
-    """
-    Return True if the input string matches the format used by comment lines, i.e. it starts with either "/" or "(".
-    :param line: the string to process
-    :return: True or False
-    """
-    if line.startswith('/'):
-        return True
-    if line.startswith('('):
-        return True
-    return False
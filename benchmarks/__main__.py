@@ -0,0 +1,9 @@
+# Runs every benchmark in turn.
+# Run from the repository root:  python -m benchmarks
+from benchmarks import (bench_entry_memory, bench_note_classification, bench_note_scan, bench_row_locator,
+                        bench_sheet_reader)
+
+for benchmark in (bench_entry_memory, bench_note_scan, bench_note_classification, bench_sheet_reader,
+                  bench_row_locator):
+    benchmark.main()
+    print()
@@ -0,0 +1,120 @@
+# Measures the per-instance memory cost of Entry, compared with the plain dataclass it used to be.
+# Run from the repository root:  python -m benchmarks.bench_entry_memory [note_count]
+import os
+import re
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import utilities.utility_functions as uf
+from utilities.shared_types import Entry
+
+
+@dataclass()
+class DataclassEntry:
+    # the previous representation of Entry, copied verbatim and kept here for comparison only
+    text: str
+    title: str
+    edit_timestamp: datetime | None = None
+
+    path: str | None = None  # this is the full path to the file
+    unique_identifier: str | None = None
+
+    def __post_init__(self):
+        # if the note is a workout note, parse the title to get the date, else set it to None.
+        self.floored_datetime: datetime | None = None
+        if self.is_valid_workout_note(raise_on_invalid_format=False):
+            # given a title like "2023-07-20 Deadlift day cycle 13 week 1.md", convert it to a datetime
+            date_str = self.title.split()[0]
+            self.floored_datetime = (
+                uf.convert_string_to_datetime(date_str, regress_future_dates=False)
+                .replace(hour=0, minute=0, second=0, microsecond=0))
+
+    def is_valid_workout_note(self, raise_on_invalid_format=False, skip_todo_titles=True) -> bool:
+        """
+        Return whether a note is valid or not, as bool. A valid workout note must
+        1) end with a time estimate line,
+        2) have a date in the title YYYY-MM-DD format.
+        If the note title contains "todo" and skip_todo_titles is True, return False.
+
+        :param raise_on_invalid_format: A bool indicating whether to raise an exception if the note format is invalid.
+        :param skip_todo_titles: A bool indicating whether to skip notes with "todo" in the title.
+
+        :return: A boolean indicating whether the note is a valid workout note.
+        """
+
+        # "est ", followed by 1-3 digits or "?" characters, followed by " min" (case-insensitive). For example:
+        # "Est 52 min", "est 5 mins", "Est ? mins", "est ?? mins"
+        est_xx_mins_reg = re.compile(r'est (\d{1,3})|(\?{1,3}) min', re.IGNORECASE)
+        if not bool(re.search(est_xx_mins_reg, self.text)):
+            return False
+
+        if "todo" in self.title.lower() and skip_todo_titles:
+            print(f"Skipping note with 'todo' in the title: `{self.title}`")
+            return False
+
+        expected_date = self.title.split()[0]
+        try:
+            uf.convert_string_to_datetime(expected_date)
+            return True
+        except ValueError:
+            pass
+
+        # strictly speaking, other date formats would probably be OK, but officially we only support YYYY-MM-DD
+        # (see README), so we encourage users to stick to that format.
+        print(f"The note with this title '{self.title}' contains a recognized time estimate line, but no date could be "
+              f"extracted from the note's title. This is an invalid combination. This program expects a date in the "
+              f"format YYYY-MM-DD at the beginning of the note title.")
+        if raise_on_invalid_format:
+            raise ValueError("Invalid workout note format")
+        return False
+
+    def __repr__(self):
+        return (f"Entry(title='{self.title}', text='{self.text[:20]}...', edit_timestamp={self.edit_timestamp}, "
+                f"unique_identifier={self.unique_identifier})")
+
+
+def list_files(count: int):
+    # notes typical of a vault: daily workout notes spread across a directory per year
+    start = datetime(2015, 1, 1)
+    for i in range(count):
+        date = start + timedelta(days=i)
+        yield f"/home/user/vault/workouts/{date.year}", f"{date.strftime('%Y-%m-%d')} workout.md", date
+
+
+def measure(cls, count: int) -> float:
+    # return the average number of bytes allocated per instance, excluding the note text, which both share
+    text = "Squat 100kg: 5,5,5\nBench press 80kg: 8,8,8\nEst 60 mins"
+    files = list(list_files(count))
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    # build the path and title strings the same way LocalFileHandler does, since they're part of each note's cost
+    instances = [cls(text=text,
+                     title=os.path.splitext(filename)[0],
+                     edit_timestamp=date + timedelta(hours=20),
+                     path=os.path.join(directory, filename))
+                 for directory, filename, date in files]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(instances) == count
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # Entry prints a message for some notes during validation. Silence it, as it's irrelevant here
+    stdout, sys.stdout = sys.stdout, None
+    try:
+        results = [(cls.__name__, measure(cls, count)) for cls in (DataclassEntry, Entry)]
+    finally:
+        sys.stdout = stdout
+
+    print(f"Per-instance memory over {count} notes (excluding shared text):")
+    for name, per_instance in results:
+        print(f"  {name:<16} {per_instance:8.1f} bytes")
+    print(f"  saving           {100 * (1 - results[1][1] / results[0][1]):8.1f} %")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Measures how long retrieving notes takes with and without classifying them first, in a vault where most notes are
+# long journal entries rather than workout notes.
+# Run from the repository root:  python -m benchmarks.bench_note_classification [note_count]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+import utilities.params as p
+from utilities.local_file_handler import LocalFileHandler
+
+# one workout note per this many journal entries
+JOURNALS_PER_WORKOUT = 9
+JOURNAL_TEXT = "Today I wrote about what happened at length.\n" * 2000
+
+
+def build_vault(root: str, count: int) -> None:
+    start = datetime(2015, 1, 1)
+    for i in range(count):
+        date = start + timedelta(days=i)
+        if i % (JOURNALS_PER_WORKOUT + 1) == 0:
+            filename, text = f"{date.strftime('%Y-%m-%d')} workout.md", "Squat 100kg: 5,5,5\nEst 60 mins"
+        else:
+            filename, text = f"{date.strftime('%Y-%m-%d')} journal.md", JOURNAL_TEXT
+        with open(os.path.join(root, filename), 'w') as f:
+            f.write(text)
+
+
+def measure(classify: bool, root: str) -> float:
+    # return the best of a few runs, in seconds
+    best = float('inf')
+    with mock.patch.object(p, "CLASSIFY_NOTES_BEFORE_READING", classify):
+        for _ in range(3):
+            start = time.perf_counter()
+            LocalFileHandler()._retrieve_recursively(root)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    with tempfile.TemporaryDirectory() as root:
+        build_vault(root, count)
+        with mock.patch.multiple(p, LOCAL_NOTES_SOURCE_DIR=root, LOCAL_EXCEL_BACKUP_DIR=os.path.join(root, "backups")):
+            # Entry prints a message for some notes during validation. Silence it, as it's irrelevant here
+            stdout, sys.stdout = sys.stdout, None
+            try:
+                results = {"read every note": measure(False, root), "classify first": measure(True, root)}
+            finally:
+                sys.stdout = stdout
+
+    print(f"Seconds to retrieve {count} notes, {JOURNAL_TEXT.count(chr(10))}-line journals among them (best of 3):")
+    for name, seconds in results.items():
+        print(f"  {name:<16} {seconds:8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
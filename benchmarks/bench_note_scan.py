@@ -0,0 +1,87 @@
+# Measures how many note files per second each way of scanning the notes directory finds and reads.
+# Run from the repository root:  python -m benchmarks.bench_note_scan [note_count]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+from unittest import mock
+
+import utilities.params as p
+from utilities.local_file_handler import AsyncLocalFileHandler, BlockingHandler, LocalFileHandler
+from utilities.note_walker import NoteWalker
+
+EXTENSIONS = ('.txt', '.md')
+
+
+def legacy_walk(directory: str, ignore_dirs: List[str], max_depth: int = 5) -> List[str]:
+    # the listdir based walk LocalFileHandler used previously, kept here for comparison only
+    paths = []
+    for filename in os.listdir(directory):
+        path = os.path.join(directory, filename)
+        if os.path.isdir(path):
+            if max_depth > 0 and path not in ignore_dirs and "backup" not in filename.lower():
+                paths.extend(legacy_walk(path, ignore_dirs, max_depth - 1))
+        elif filename.endswith(EXTENSIONS):
+            # the legacy walk looked up each note's modification time separately
+            os.path.getmtime(path)
+            paths.append(path)
+    return paths
+
+
+def build_vault(root: str, count: int) -> None:
+    # daily workout notes in a directory per year and month, plus the non-note files and backups a vault accumulates
+    start = datetime(2015, 1, 1)
+    for i in range(count):
+        date = start + timedelta(days=i)
+        directory = os.path.join(root, "workouts", str(date.year), date.strftime('%m'))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{date.strftime('%Y-%m-%d')} workout.md"), 'w') as f:
+            f.write("Squat 100kg: 5,5,5\nEst 60 mins")
+        if i % 10 == 0:
+            open(os.path.join(directory, f"{date.strftime('%Y-%m-%d')} photo.png"), 'w').close()
+    os.makedirs(os.path.join(root, "Backups"))
+    for i in range(count // 10):
+        open(os.path.join(root, "Backups", f"backup_{i}_workout.md"), 'w').close()
+
+
+def measure(scan: Callable[[], int]) -> float:
+    # return files found per second, on the best of a few runs so that a cold cache doesn't dominate
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        found = scan()
+        best = min(best, time.perf_counter() - start)
+    return found / best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as root:
+        build_vault(root, count)
+        archive_dir = os.path.join(root, "archive")
+        backup_dir = os.path.join(root, "excel_backups")
+        with mock.patch.multiple(p, LOCAL_NOTES_SOURCE_DIR=root, LOCAL_NOTES_ARCHIVE_DIR=archive_dir,
+                                 LOCAL_EXCEL_BACKUP_DIR=backup_dir):
+            walker = NoteWalker.from_params(root, EXTENSIONS)
+            scans = {
+                "legacy listdir walk": lambda: len(legacy_walk(root, [backup_dir])),
+                "NoteWalker.walk": lambda: sum(1 for entry in walker.walk() if entry.stat()),
+                "LocalFileHandler": lambda: len(LocalFileHandler()._retrieve_recursively(root)),
+                "AsyncLocalFileHandler": lambda: len(BlockingHandler(AsyncLocalFileHandler()).retrieve_notes()),
+            }
+            # Entry prints a message for some notes during validation. Silence it, as it's irrelevant here
+            stdout, sys.stdout = sys.stdout, None
+            try:
+                results = [(name, measure(scan)) for name, scan in scans.items()]
+            finally:
+                sys.stdout = stdout
+
+    print(f"Notes scanned per second over {count} notes (best of 3):")
+    for name, files_per_second in results:
+        print(f"  {name:<24} {files_per_second:12,.0f} files/s")
+
+
+if __name__ == '__main__':
+    main()
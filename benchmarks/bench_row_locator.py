@@ -0,0 +1,67 @@
+# Measures how long it takes to find the rows of a year's worth of dates in target sheets of growing length, by scanning
+# the date column for each as before, and with a DateRowLocator. The sheets are built in memory, with a blank row at
+# each year boundary.
+# Run from the repository root:  python -m benchmarks.bench_row_locator
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from openpyxl import Workbook
+
+from utilities.row_locator import DateRowLocator
+from utilities.sheet_reader import OpenpyxlSheetReader
+
+SHEET_LENGTHS_IN_DAYS = (1_000, 5_000, 20_000)
+# how many of the latest dates are looked up
+LOOKUP_COUNT = 365
+
+
+def build_sheet(day_count: int):
+    sheet = Workbook().active
+    sheet.cell(row=1, column=2).value = "Date"
+    row = 2
+    date = datetime(1970, 1, 1)
+    for _ in range(day_count):
+        if date.month == 1 and date.day == 1:
+            row += 1
+        sheet.cell(row=row, column=2).value = date
+        date += timedelta(days=1)
+        row += 1
+    return sheet
+
+
+def scan(reader: OpenpyxlSheetReader, dates: List[datetime]) -> None:
+    # a scan of the date column for each date, as every lookup did before the locator
+    date_cache = reader.date_cache
+    for date in dates:
+        for row, (value,) in reader.iter_columns([2]):
+            if date_cache.floored_date(row, value) == date:
+                break
+
+
+def locate(reader: OpenpyxlSheetReader, dates: List[datetime]) -> None:
+    locator = DateRowLocator(reader, 2)
+    for date in dates:
+        locator.row_of(date)
+
+
+def measure(run: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"Seconds to find the rows of the last {LOOKUP_COUNT} dates in a sheet:")
+    print(f"  {'days':>8} {'scan':>8} {'locator':>8} {'speedup':>8}")
+    for day_count in SHEET_LENGTHS_IN_DAYS:
+        reader = OpenpyxlSheetReader(build_sheet(day_count))
+        last_date = datetime(1970, 1, 1) + timedelta(days=day_count - 1)
+        dates = [last_date - timedelta(days=i) for i in range(LOOKUP_COUNT)]
+        scan_seconds = measure(lambda: scan(reader, dates))
+        locator_seconds = measure(lambda: locate(reader, dates))
+        print(f"  {day_count:>8} {scan_seconds:8.3f} {locator_seconds:8.4f} {scan_seconds / locator_seconds:7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Measures how long NotePruner, WorkoutsToExcel and BodyweightsToExcel take to look up dates, workouts and bodyweights
+# in a large target workbook, with each sheet reader. The time includes opening the workbook, since that's what the
+# streaming reader avoids.
+# Run from the repository root:  python -m benchmarks.bench_sheet_reader [row_count]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from unittest import mock
+
+from openpyxl import Workbook
+
+import BodyweightsToExcel.main as bw
+import NotePruner.main as pruner
+import WorkoutsToExcel.workout_parsing as wp
+import utilities.params as p
+from utilities.target_router import TargetWorkbooks
+
+# how many of the latest dates are looked up
+LOOKUP_COUNT = 100
+
+
+def build_workbook(path: str, count: int) -> datetime:
+    # one row per day, each with a bodyweight and a workout, and a few other columns as a real log would have. Return
+    # the last date
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "Log"
+    start = datetime(2001, 1, 1)
+    for row in range(2, count + 2):
+        date = start + timedelta(days=row)
+        sheet.cell(row=row, column=1).value = date.strftime('%A')
+        sheet.cell(row=row, column=2).value = date
+        sheet.cell(row=row, column=3).value = 70 + (row % 50) / 10
+        sheet.cell(row=row, column=4).value = "=C%d-C%d" % (row, row - 1)
+        sheet.cell(row=row, column=5).value = f"Squat {row % 100}kg: 8,8,8; Bench 80kg: 5,5. Est 50 mins"
+        sheet.cell(row=row, column=6).value = "Felt good" if row % 3 else None
+    wb.save(path)
+    return start + timedelta(days=count + 1)
+
+
+def measure(run: Callable[[], object]) -> float:
+    # return the best of a few runs, in seconds
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "Workouts.xlsx")
+        last_date = build_workbook(path, count)
+        dates = [last_date - timedelta(days=i) for i in range(LOOKUP_COUNT, 0, -1)]
+        workouts = [wp.ParsedWorkout(title_datetime=date, data="Squat 90kg: 8. Est 50 mins") for date in dates]
+
+        tasks = {
+            "NotePruner snippets": lambda: pruner.retrieve_note_snippets_from_partitions(TargetWorkbooks(), dates),
+            "workout row matching": lambda: wp.match_workouts_with_partitions(TargetWorkbooks(), workouts),
+            "bodyweight backfill": lambda: bw.plan_bodyweight_backfill(
+                (workbooks := TargetWorkbooks()).reader(workbooks.partition_of(last_date)), last_date,
+                config=workbooks.config),
+        }
+        results = []
+        with mock.patch.multiple(p, TARGET_PATH=path, TARGET_SHEET="Log", CACHE_PARSED_DATES=False):
+            # openpyxl prints each workbook it loads. Silence it, as it's irrelevant here
+            stdout, sys.stdout = sys.stdout, None
+            try:
+                for name, task in tasks.items():
+                    timings = []
+                    for reader in ("openpyxl", "streaming"):
+                        with mock.patch.object(p, "SHEET_READER", reader):
+                            timings.append(measure(task))
+                    results.append((name, *timings))
+            finally:
+                sys.stdout = stdout
+
+    print(f"Seconds to look up the last {LOOKUP_COUNT} of {count} rows, including opening the workbook (best of 3):")
+    print(f"  {'':<22} {'openpyxl':>9} {'streaming':>10} {'speedup':>8}")
+    for name, openpyxl_seconds, streaming_seconds in results:
+        speedup = openpyxl_seconds / streaming_seconds
+        print(f"  {name:<22} {openpyxl_seconds:9.3f} {streaming_seconds:10.3f} {speedup:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
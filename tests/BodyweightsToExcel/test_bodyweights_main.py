@@ -1,6 +1,13 @@
+import io
+import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 from openpyxl import Workbook
+import utilities.params as p
 from utilities.params import DATE_COLUMN, BODYWEIGHT_COLUMN
+from utilities.sheet_reader import OpenpyxlSheetReader
 from BodyweightsToExcel.main import *
 
 
@@ -43,6 +50,109 @@ class TestPairNewBodyweightsWithRows(unittest.TestCase):
         self.assertEqual(len(result), 0)
 
 
+class TestPlanBodyweightBackfill(unittest.TestCase):
+    def setUp(self):
+        self.sheet = Workbook().active
+        self.sheet.cell(row=1, column=DATE_COLUMN).value = "Date column title"
+        self.sheet.cell(row=2, column=DATE_COLUMN).value = datetime(2021, 1, 1)
+        self.sheet.cell(row=3, column=DATE_COLUMN).value = datetime(2021, 1, 2)
+        self.sheet.cell(row=4, column=DATE_COLUMN).value = "2021-01-03"
+        # row 5 is a gap, e.g. at the end of a year
+        self.sheet.cell(row=6, column=DATE_COLUMN).value = datetime(2021, 1, 4)
+        self.sheet.cell(row=7, column=DATE_COLUMN).value = datetime(2021, 1, 5)
+        self.sheet.cell(row=2, column=BODYWEIGHT_COLUMN).value = 70.0
+
+    def test_plans_every_dated_row_up_to_today(self):
+        plan = plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 4, 14, 30))
+        self.assertEqual((plan.start_row, plan.todays_row), (3, 6))
+        self.assertEqual(plan.target_rows, [3, 4, 6])
+        self.assertFalse(plan.todays_bodyweight_written)
+
+    def test_starts_after_last_written_bodyweight(self):
+        self.sheet.cell(row=4, column=BODYWEIGHT_COLUMN).value = "?"
+        plan = plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 5))
+        self.assertEqual(plan.target_rows, [6, 7])
+
+    def test_todays_bodyweight_already_written(self):
+        self.sheet.cell(row=3, column=BODYWEIGHT_COLUMN).value = 70.5
+        plan = plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 2))
+        self.assertTrue(plan.todays_bodyweight_written)
+        self.assertEqual(plan.target_rows, [])
+
+    def test_raises_when_today_not_found(self):
+        with self.assertRaises(RuntimeError):
+            plan_bodyweight_backfill(self.sheet, datetime(2021, 2, 1))
+
+    def test_raises_when_too_many_empty_date_cells(self):
+        with self.assertRaises(RuntimeError):
+            plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 4), max_rows_without_date=1)
+
+    def test_continues_previous_sheet(self):
+        self.sheet.cell(row=2, column=BODYWEIGHT_COLUMN).value = None
+        with self.assertRaises(ValueError):
+            plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 2))
+        plan = plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 2), has_previous_sheet=True)
+        self.assertEqual(plan.target_rows, [2, 3])
+        self.assertTrue(plan.continues_previous_sheet)
+
+    def test_reads_only_the_rows_since_the_last_bodyweight(self):
+        sheet = Workbook().active
+        for row in range(2, 2002):
+            sheet.cell(row=row, column=DATE_COLUMN).value = datetime(2021, 1, 1) + timedelta(days=row - 2)
+            if row < 1990:
+                sheet.cell(row=row, column=BODYWEIGHT_COLUMN).value = 70.0
+        reader = OpenpyxlSheetReader(sheet)
+        with mock.patch.object(reader, "value", wraps=reader.value) as value, \
+                mock.patch.object(reader, "iter_columns", side_effect=AssertionError("scanned")):
+            plan = plan_bodyweight_backfill(reader, datetime(2021, 1, 1) + timedelta(days=1995))
+        self.assertEqual(plan.target_rows, list(range(1990, 1998)))
+        self.assertLess(value.call_count, 50)
+
+    def test_return_trailing_unwritten_rows(self):
+        self.assertEqual(return_trailing_unwritten_rows(self.sheet), [3, 4, 6, 7])
+        self.sheet.cell(row=6, column=BODYWEIGHT_COLUMN).value = 71.0
+        self.assertEqual(return_trailing_unwritten_rows(self.sheet), [7])
+
+    def test_pair(self):
+        plan = plan_bodyweight_backfill(self.sheet, datetime(2021, 1, 4))
+        pairings = plan.pair(tokenize_bodyweights_text("70.5, ?, 71"))
+        self.assertEqual(dict(pairings), {3: '70.5', 4: '?', 6: '71'})
+        with self.assertRaises(ValueError):
+            plan.pair(tokenize_bodyweights_text("70.5, ?"))
+
+
+class TestPrepareBodyweightsUpdate(unittest.TestCase):
+    def test_streams_unloaded_target(self):
+        today = datetime(2021, 1, 4)
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "Workouts.xlsx")
+            wb = Workbook()
+            wb.active.title = "Log"
+            for row, day in enumerate(range(1, 6), start=2):
+                wb.active.cell(row=row, column=DATE_COLUMN).value = datetime(2021, 1, day)
+            wb.active.cell(row=2, column=BODYWEIGHT_COLUMN).value = 70.0
+            wb.save(path)
+
+            note = Entry(title="Bodyweights", text="(70), 70.5, ?, 71", edit_timestamp=today)
+            with mock.patch.multiple(p, TARGET_PATH=path, TARGET_SHEET="Log", SHEET_READER="streaming"), \
+                    mock.patch("openpyxl.load_workbook", side_effect=AssertionError("loaded")):
+                update = prepare_bodyweights_update(TargetWorkbooks(), note, today)
+        self.assertEqual([dict(pairings) for pairings in update.pairings_by_partition.values()],
+                         [{3: '70.5', 4: '?', 5: '71'}])
+
+
+class TestUpdateBodyweightSeries(unittest.TestCase):
+    def test_failure_is_printed_not_raised(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "missing directory", "bodyweights.series")
+            workbooks = mock.Mock(config=Config.from_params(bodyweight_series_path=path), **{
+                "existing_partitions.return_value": []})
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                update_bodyweight_series(workbooks, {})
+            self.assertIn("Failed to update the bodyweight series file", stdout.getvalue())
+            self.assertFalse(os.path.exists(path))
+
+
 class TestRowBodyweightPairings(unittest.TestCase):
     def setUp(self):
         self.row_bodyweight_pairings = RowBodyweightPairings()
@@ -57,6 +167,9 @@ class TestRowBodyweightPairings(unittest.TestCase):
         with self.assertRaises(AssertionError):
             self.row_bodyweight_pairings[1] = '70a'
 
+        with self.assertRaises(ValueError):
+            self.row_bodyweight_pairings[1] = '70.5.1'
+
         with self.assertRaises(AssertionError):
             self.row_bodyweight_pairings[2] = ''
 
@@ -120,5 +233,37 @@ class TestValidateBodyweightNoteText(unittest.TestCase):
             validate_bodyweight_note_text(bw_note_text)
 
 
+class TestTokenizeBodyweightsText(unittest.TestCase):
+    def test_tokenize_bodyweights_text(self):
+        result = tokenize_bodyweights_text('(70.5,71.2), ?, 70.6\n71')
+        self.assertEqual([t.text for t in result], ['70.5', '71.2', '?', '70.6', '71'])
+        self.assertEqual([t.value for t in result], [70.5, 71.2, None, 70.6, 71.0])
+        self.assertEqual([t.committed for t in result], [True, True, False, False, False])
+        self.assertEqual(result[2].position, 13)
+
+    def test_tokenize_empty_text(self):
+        self.assertEqual(tokenize_bodyweights_text(''), [])
+        self.assertEqual(tokenize_bodyweights_text(', \n'), [])
+
+    def test_error_gives_position(self):
+        with self.assertRaisesRegex(ValueError, "line 2, column 3"):
+            tokenize_bodyweights_text('70.5,\n71a')
+
+    def test_rejects_invalid_formats(self):
+        for text in ['70.5, (71.2)', '(70.5', '70.5)', '(70.5), (71.2)', '(), 70.5', '70.5.1']:
+            with self.assertRaises(ValueError, msg=text):
+                tokenize_bodyweights_text(text)
+
+    def test_partially_unknown_bodyweight_is_missing(self):
+        result = tokenize_bodyweights_text('70.5, 7?')
+        self.assertEqual([t.text for t in result], ['70.5', '7?'])
+        self.assertEqual([t.value for t in result], [70.5, None])
+
+    def test_pairings_accept_tokens(self):
+        pairings = RowBodyweightPairings()
+        pairings[1] = tokenize_bodyweights_text('?')[0]
+        self.assertEqual(pairings[1], '?')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from openpyxl import Workbook
+import openpyxl
+from MultiAthleteRun.main import *
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TestMultiAthleteRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.profiles_path = os.path.join(self.root, "athletes.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_athlete(self, name: str, workout_days_ago: int, bodyweights_note=True) -> dict:
+        # return the profile of an athlete with one workout note, the bodyweights note unless told otherwise, and a
+        # target file with a row for each recent day, and bodyweights up to three days ago
+        athlete_dir = os.path.join(self.root, name)
+        notes_dir = os.path.join(athlete_dir, "notes")
+        os.makedirs(notes_dir)
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        for row, days_ago in enumerate(range(20, -5, -1), start=2):
+            sheet.cell(row=row, column=2).value = TODAY - timedelta(days=days_ago)
+            if days_ago >= 3:
+                sheet.cell(row=row, column=3).value = 70.0
+        wb.save(os.path.join(athlete_dir, "workouts.xlsx"))
+        title = (TODAY - timedelta(days=workout_days_ago)).strftime('%Y-%m-%d') + " legs"
+        with open(os.path.join(notes_dir, title + ".md"), 'w') as f:
+            f.write(f"Squat {90 + workout_days_ago}kg: 8\nEst 50 mins")
+        if bodyweights_note:
+            with open(os.path.join(notes_dir, "Bodyweights note.md"), 'w') as f:
+                f.write("(70)")
+
+        return {"name": name, "LOCAL_NOTES_SOURCE_DIR": notes_dir,
+                "TARGET_PATH": os.path.join(athlete_dir, "workouts.xlsx"), "TARGET_SHEET": "Log",
+                "LOCAL_NOTES_ARCHIVE_DIR": os.path.join(athlete_dir, "archive"),
+                "LOCAL_EXCEL_BACKUP_DIR": os.path.join(athlete_dir, "backups"),
+                "BODYWEIGHT_SERIES_PATH": os.path.join(athlete_dir, "bodyweights.series")}
+
+    def write_profiles(self, profiles: list):
+        with open(self.profiles_path, 'w') as f:
+            json.dump(profiles, f)
+
+    def test_each_athlete_is_processed_with_their_own_settings(self):
+        missing = self.create_athlete("carol", 1) | {"LOCAL_NOTES_SOURCE_DIR": os.path.join(self.root, "nowhere")}
+        self.write_profiles([self.create_athlete("alice", 2), self.create_athlete("bob", 5), missing])
+
+        results = {result.name: result for result in process_athletes(load_profiles(self.profiles_path), 2)}
+
+        self.assertEqual(set(results), {"alice", "bob", "carol"})
+        for name, days_ago in (("alice", 2), ("bob", 5)):
+            self.assertTrue(results[name].succeeded, results[name].error)
+            self.assertEqual(results[name].counters[rm.ROWS_WRITTEN], 1)
+            sheet = openpyxl.load_workbook(os.path.join(self.root, name, "workouts.xlsx"))["Log"]
+            self.assertEqual(sheet.cell(row=22 - days_ago, column=5).value, f"Squat {90 + days_ago}kg: 8. Est 50 mins")
+        self.assertFalse(results["carol"].succeeded)
+        self.assertIn("Could not find source directory", results["carol"].error)
+
+        summary = summarise(list(results.values()), 1.0)
+        self.assertTrue(summary[0].startswith("2 of 3 athletes processed successfully"))
+        self.assertIn("2 rows written", summary[1])
+        self.assertEqual(summary[2], "Failed: ['carol']")
+
+    def test_athlete_with_a_skipped_stage_fails(self):
+        self.write_profiles([self.create_athlete("alice", 2), self.create_athlete("dave", 3, bodyweights_note=False)])
+
+        results = {result.name: result for result in process_athletes(load_profiles(self.profiles_path), 2)}
+
+        self.assertTrue(results["alice"].succeeded, results["alice"].error)
+        self.assertFalse(results["dave"].succeeded)
+        self.assertIn("Skipping bodyweights", results["dave"].error)
+        # the workout was still written
+        self.assertEqual(results["dave"].counters[rm.ROWS_WRITTEN], 1)
+        self.assertEqual(summarise(list(results.values()), 1.0)[2], "Failed: ['dave']")
+
+    def test_athlete_whose_run_cannot_start_fails(self):
+        self.write_profiles([self.create_athlete("alice", 2)])
+        profile = load_profiles(self.profiles_path)[0]
+        with mock.patch.object(AthleteProfile, "apply_to_params"), \
+                mock.patch.object(rm, "record_run", side_effect=OSError("metrics unavailable")):
+            result = process_athlete(profile)
+        self.assertFalse(result.succeeded)
+        self.assertIn("metrics unavailable", result.error)
+
+    def test_invalid_profiles(self):
+        alice, bob = self.create_athlete("alice", 1), self.create_athlete("bob", 1)
+        for profiles, message in (([alice, alice | {"TARGET_PATH": "other.xlsx"}], "used more than once"),
+                                  ([alice, bob | {"TARGET_COLUMN": 3}], "doesn't have"),
+                                  ([alice, bob | {"TARGET_PATH": alice["TARGET_PATH"]}], "TARGET_PATH"),
+                                  ([{"TARGET_SHEET": "Log"}], "has no name")):
+            self.write_profiles(profiles)
+            with self.assertRaisesRegex(ValueError, message):
+                load_profiles(self.profiles_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from openpyxl import Workbook
+import openpyxl
+import utilities.params as p
+from NightlyRun.main import *
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TestNightlyRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.target_path = os.path.join(root, "workouts.xlsx")
+        self.notes_dir = os.path.join(root, "notes")
+        self.backup_dir = os.path.join(root, "backups")
+        os.makedirs(self.notes_dir)
+
+        # one row per day, with bodyweights up to three days ago
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        sheet.cell(row=1, column=2).value = "Date"
+        for row, days_ago in enumerate(range(20, -5, -1), start=2):
+            sheet.cell(row=row, column=2).value = TODAY - timedelta(days=days_ago)
+            if days_ago >= 3:
+                sheet.cell(row=row, column=3).value = 70.0
+        wb.save(self.target_path)
+
+        self.write_note((TODAY - timedelta(days=10)).strftime('%Y-%m-%d') + " legs", "Squat 90kg: 8\nEst 50 mins")
+        self.write_note((TODAY - timedelta(days=1)).strftime('%Y-%m-%d') + " push", "Bench 80kg: 8\nEst 40 mins")
+        self.write_note("Bodyweights note", "(70), 71, 72, 73")
+
+        self.params = mock.patch.multiple(p, TARGET_PATH=self.target_path, TARGET_SHEET="Log",
+                                          LOCAL_NOTES_SOURCE_DIR=self.notes_dir, ADDITIONAL_NOTES_SOURCE_DIRS=[],
+                                          LOCAL_NOTES_ARCHIVE_DIR=os.path.join(root, "archive"),
+                                          LOCAL_EXCEL_BACKUP_DIR=self.backup_dir,
+                                          BODYWEIGHT_SERIES_PATH=os.path.join(root, "bodyweights.series"),
+                                          MAX_CONCURRENT_FILE_OPERATIONS=1, WORKOUT_EXPORT_DIR="",
+                                          NIGHTLY_PRUNE_AFTER_DAYS=5)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def write_note(self, title: str, text: str):
+        with open(os.path.join(self.notes_dir, title + ".md"), 'w') as f:
+            f.write(text)
+
+    def test_writes_everything_with_one_backup(self):
+        with mock.patch("openpyxl.load_workbook", wraps=openpyxl.load_workbook) as load_workbook:
+            main()
+        self.assertEqual(1, load_workbook.call_count)
+        self.assertEqual(1, len(os.listdir(self.backup_dir)))
+
+        sheet = openpyxl.load_workbook(self.target_path)["Log"]
+        self.assertEqual("Squat 90kg: 8. Est 50 mins", sheet.cell(row=12, column=5).value)
+        self.assertEqual("Bench 80kg: 8. Est 40 mins", sheet.cell(row=21, column=5).value)
+        self.assertEqual([71, 72, 73], [sheet.cell(row=row, column=3).value for row in (20, 21, 22)])
+
+    def test_prunes_only_old_notes(self):
+        main()
+        self.assertCountEqual(["Bodyweights note.md", (TODAY - timedelta(days=1)).strftime('%Y-%m-%d') + " push.md"],
+                              os.listdir(self.notes_dir))
+
+    def test_never_prunes_notes_which_differ_from_the_target(self):
+        main()
+        self.write_note((TODAY - timedelta(days=12)).strftime('%Y-%m-%d') + " legs", "Squat 95kg: 8\nEst 50 mins")
+        wb = openpyxl.load_workbook(self.target_path)
+        wb["Log"].cell(row=10, column=5).value = "Squat 90kg: 8. Est 50 mins"
+        wb.save(self.target_path)
+        main()
+        self.assertIn((TODAY - timedelta(days=12)).strftime('%Y-%m-%d') + " legs.md", os.listdir(self.notes_dir))
+
+    def test_runs_with_given_settings(self):
+        result = run()
+        self.assertEqual((3, 2, 1), (result.bodyweights_written, result.workouts_written, result.notes_discarded))
+        self.assertEqual([], result.errors)
+
+        # a second athlete's settings, in the same process, leave params.py and the first target untouched
+        other_notes_dir = os.path.join(self.tmp_dir.name, "other notes")
+        os.makedirs(other_notes_dir)
+        with open(os.path.join(other_notes_dir, TODAY.strftime('%Y-%m-%d') + " pull.md"), 'w') as f:
+            f.write("Row 60kg: 10\nEst 30 mins")
+        wb = openpyxl.load_workbook(self.target_path)
+        wb["Log"].delete_cols(3, 3)
+        other_target_path = os.path.join(self.tmp_dir.name, "other.xlsx")
+        wb.save(other_target_path)
+        config = Config.from_params(local_notes_source_dir=other_notes_dir, target_path=other_target_path)
+
+        result = run(config)
+        self.assertEqual((0, 1, 0), (result.bodyweights_written, result.workouts_written, result.notes_discarded))
+        # that athlete has no bodyweights note
+        self.assertEqual(1, len(result.errors))
+        self.assertEqual("Row 60kg: 10. Est 30 mins", openpyxl.load_workbook(other_target_path)["Log"].cell(
+            row=22, column=5).value)
+        self.assertIsNone(openpyxl.load_workbook(self.target_path)["Log"].cell(row=22, column=5).value)
+        self.assertEqual(p.TARGET_PATH, self.target_path)
+
+    def test_skipped_stage_fails_the_run(self):
+        with mock.patch.object(wp, "prepare_unattended_workouts", side_effect=RuntimeError("unreadable")), \
+                mock.patch.object(rm, "_publish") as publish, self.assertRaises(SystemExit) as cm:
+            main()
+        self.assertEqual(1, cm.exception.code)
+        self.assertFalse(publish.call_args.args[0].succeeded)
+        # the bodyweights were still written
+        sheet = openpyxl.load_workbook(self.target_path)["Log"]
+        self.assertEqual([71, 72, 73], [sheet.cell(row=row, column=3).value for row in (20, 21, 22)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from openpyxl import Workbook
+import utilities.params as p
+from utilities.params import DATE_COLUMN, WORKOUT_COLUMN
+from NotePruner.main import *
+
+
+def make_workout_note(date_str: str) -> Entry:
+    return Entry(title=f"{date_str} workout", text="Squat 90kg: 8,8,8\nEst 50 mins")
+
+
+class TestGetDiscardCandidates(unittest.TestCase):
+    def setUp(self):
+        self.sheet = Workbook().active
+        self.sheet.cell(row=1, column=DATE_COLUMN).value = "Date column title"
+        self.sheet.cell(row=2, column=DATE_COLUMN).value = datetime(2021, 1, 1)
+        self.sheet.cell(row=3, column=DATE_COLUMN).value = datetime(2021, 1, 2)
+        self.sheet.cell(row=4, column=DATE_COLUMN).value = "2021-01-03"
+        self.sheet.cell(row=5, column=DATE_COLUMN).value = datetime(2021, 1, 4)
+
+        self.sheet.cell(row=2, column=WORKOUT_COLUMN).value = "Squat 90kg: 8,8,8. Est 50 mins"
+        self.sheet.cell(row=4, column=WORKOUT_COLUMN).value = "Bench 80kg: 8,8. Est 40 mins"
+        self.sheet.cell(row=5, column=WORKOUT_COLUMN).value = "Deadlift 120kg: 5. Est 30 mins"
+
+        self.notes = [make_workout_note(d) for d in ["2021-01-04", "2021-01-01", "2021-01-02", "2021-01-03"]]
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        target_path = os.path.join(self.tmp_dir.name, "workouts.xlsx")
+        self.sheet.title = "Log"
+        self.sheet.parent.save(target_path)
+        self.params = mock.patch.multiple(p, TARGET_PATH=target_path, TARGET_SHEET="Log", CACHE_PARSED_DATES=False)
+        self.params.start()
+        self.workbooks = TargetWorkbooks()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def test_returns_written_notes_in_date_order(self):
+        result = get_discard_candidates(self.workbooks, self.notes, end_date=datetime(2021, 1, 4))
+        self.assertEqual([c.floored_date for c in result],
+                         [datetime(2021, 1, 1), datetime(2021, 1, 3), datetime(2021, 1, 4)])
+        self.assertEqual(result[1].in_sheet_as, "Bench 80kg: 8,8. Est 40 mins")
+
+    def test_excludes_notes_after_end_date(self):
+        result = get_discard_candidates(self.workbooks, self.notes, end_date=datetime(2021, 1, 3, 12, 30))
+        self.assertEqual([c.floored_date for c in result], [datetime(2021, 1, 1), datetime(2021, 1, 3)])
+
+    def test_returns_nothing_when_all_notes_are_after_end_date(self):
+        result = get_discard_candidates(self.workbooks, self.notes, end_date=datetime(2020, 12, 31))
+        self.assertEqual(result, [])
+
+    def test_ignores_notes_missing_from_sheet(self):
+        notes = self.notes + [make_workout_note("2021-02-01")]
+        result = get_discard_candidates(self.workbooks, notes, end_date=datetime(2021, 3, 1))
+        self.assertEqual(len(result), 3)
+
+
+class TestRetrieveNoteSnippetsFromXlsx(unittest.TestCase):
+    def setUp(self):
+        self.sheet = Workbook().active
+        self.sheet.cell(row=1, column=DATE_COLUMN).value = datetime(2021, 1, 1)
+        self.sheet.cell(row=2, column=DATE_COLUMN).value = datetime(2021, 1, 2)
+        self.sheet.cell(row=1, column=WORKOUT_COLUMN).value = "workout 1"
+        self.sheet.cell(row=2, column=WORKOUT_COLUMN).value = "workout 2"
+
+    def test_reads_only_requested_dates(self):
+        result = retrieve_note_snippets_from_xlsx(self.sheet, [datetime(2021, 1, 2)])
+        self.assertEqual(result, {datetime(2021, 1, 2): "workout 2"})
+
+    def test_reads_past_dates_out_of_order(self):
+        self.sheet.cell(row=3, column=DATE_COLUMN).value = datetime(2021, 1, 5)
+        self.sheet.cell(row=4, column=DATE_COLUMN).value = datetime(2021, 1, 3)
+        self.sheet.cell(row=4, column=WORKOUT_COLUMN).value = "workout 3"
+        result = retrieve_note_snippets_from_xlsx(self.sheet, [datetime(2021, 1, 2), datetime(2021, 1, 3)])
+        self.assertEqual(result, {datetime(2021, 1, 2): "workout 2", datetime(2021, 1, 3): "workout 3"})
+
+    def test_raises_on_duplicated_date(self):
+        self.sheet.cell(row=3, column=DATE_COLUMN).value = datetime(2021, 1, 2)
+        with self.assertRaises(AssertionError):
+            retrieve_note_snippets_from_xlsx(self.sheet, [datetime(2021, 1, 2)])
+
+
+class TestNoteSnippets(unittest.TestCase):
+    def test_snippet_skips_properties_comments_and_plus_signs(self):
+        text = "---\ntags: workout\n---\n+ Squat 90kg: 8,8\n/comment\n(75kg: 8,8)\nEst 50 mins"
+        self.assertEqual("Squat 90kg: 8,8 Est 50 mins ", return_note_snippet(text, 100))
+        self.assertEqual("Squat 90kg", return_note_snippet(text, 10))
+
+    def test_snippet_matches_full_text_without_comments(self):
+        text = "Bench 80kg: 8,8\n/comment\n+ Ohp 40kg: 8\n" * 50 + "Est 50 mins"
+        full = return_note_text_minus_comments(text, remove_plus_signs=True)
+        self.assertEqual(full[:31], return_note_snippet(text, 31))
+
+    def test_snippet_raises_on_unclosed_properties(self):
+        with self.assertRaises(ValueError):
+            return_note_snippet("---\ntags: workout\nSquat 90kg: 8,8", 31)
+
+    def test_table_is_printed_in_batches(self):
+        candidates = [DiscardCandidate(floored_date=datetime(2021, 1, 1), note=make_workout_note("2021-01-01"),
+                                       in_sheet_as="Squat 90kg: 8,8,8. Est 50 mins")] * 5
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout, \
+                mock.patch("NotePruner.main.TABLE_ROWS_PER_BATCH", 3):
+            print_table_progressively(map(return_table_row, candidates))
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(7, len(lines))
+        self.assertTrue(lines[0].startswith("Date"))
+        self.assertTrue(lines[2].startswith("2021-01-01  Squat 90kg: 8,8,8 Est 50 mins"))
+
+
+if __name__ == '__main__':
+    unittest.main()
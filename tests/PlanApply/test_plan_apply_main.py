@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from openpyxl import Workbook
+import openpyxl
+import utilities.params as p
+from PlanApply.main import *
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TestPlanApply(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.target_path = os.path.join(root, "workouts.xlsx")
+        self.notes_dir = os.path.join(root, "notes")
+        self.plan_path = os.path.join(root, "changes.plan.json")
+        os.makedirs(self.notes_dir)
+
+        # one row per day, with bodyweights up to three days ago
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        for row, days_ago in enumerate(range(20, -5, -1), start=2):
+            sheet.cell(row=row, column=2).value = TODAY - timedelta(days=days_ago)
+            if days_ago >= 3:
+                sheet.cell(row=row, column=3).value = 70.0
+        sheet.cell(row=21, column=5).value = "Bench 75kg: 8. Est 40 mins"
+        wb.save(self.target_path)
+
+        self.write_note((TODAY - timedelta(days=10)).strftime('%Y-%m-%d') + " legs", "Squat 90kg: 8\nEst 50 mins")
+        self.write_note((TODAY - timedelta(days=1)).strftime('%Y-%m-%d') + " push", "Bench 80kg: 8\nEst 40 mins")
+        self.write_note("Bodyweights note", "(70), 71, 72, 73")
+
+        self.params = mock.patch.multiple(p, TARGET_PATH=self.target_path, TARGET_SHEET="Log",
+                                          LOCAL_NOTES_SOURCE_DIR=self.notes_dir, ADDITIONAL_NOTES_SOURCE_DIRS=[],
+                                          LOCAL_NOTES_ARCHIVE_DIR=os.path.join(root, "archive"),
+                                          LOCAL_EXCEL_BACKUP_DIR=os.path.join(root, "backups"),
+                                          BODYWEIGHT_SERIES_PATH=os.path.join(root, "bodyweights.series"),
+                                          MAX_CONCURRENT_FILE_OPERATIONS=1, WORKOUT_EXPORT_DIR="",
+                                          CHANGE_PLAN_PATH=self.plan_path)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def write_note(self, title: str, text: str):
+        with open(os.path.join(self.notes_dir, title + ".md"), 'w') as f:
+            f.write(text)
+
+    def test_plan_writes_nothing(self):
+        fingerprint = fingerprint_file(self.target_path)
+        change_plan = plan()
+        self.assertEqual(fingerprint, fingerprint_file(self.target_path))
+        self.assertEqual(["Bench 75kg: 8. Est 40 mins"], [w.existing for w in change_plan.overwrites])
+        self.assertEqual(["71", "72", "73"], [b.text for b in change_plan.bodyweights])
+        self.assertEqual(change_plan, ChangePlan.load(self.plan_path))
+        self.assertEqual({self.target_path: fingerprint}, change_plan.workbook_fingerprints)
+
+    def test_apply_writes_the_plan_without_reading_notes(self):
+        plan()
+        with mock.patch("builtins.input", return_value="y"), \
+                mock.patch.object(lr, "create_handler", side_effect=AssertionError("notes were scanned")):
+            apply()
+
+        sheet = openpyxl.load_workbook(self.target_path)["Log"]
+        self.assertEqual("Squat 90kg: 8. Est 50 mins", sheet.cell(row=12, column=5).value)
+        self.assertEqual("Bench 80kg: 8. Est 40 mins", sheet.cell(row=21, column=5).value)
+        self.assertEqual([71, 72, 73], [sheet.cell(row=row, column=3).value for row in (20, 21, 22)])
+        with open(os.path.join(self.notes_dir, "Bodyweights note.md")) as f:
+            self.assertEqual("(71, 72, 73), ", f.read())
+        self.assertFalse(os.path.exists(self.plan_path))
+
+    def test_declined_overwrites_write_nothing(self):
+        plan()
+        fingerprint = fingerprint_file(self.target_path)
+        with mock.patch("builtins.input", return_value="n"), self.assertRaises(SystemExit):
+            apply()
+        self.assertEqual(fingerprint, fingerprint_file(self.target_path))
+
+    def test_refuses_if_target_changed(self):
+        plan()
+        wb = openpyxl.load_workbook(self.target_path)
+        wb["Log"].cell(row=12, column=5).value = "Written elsewhere"
+        wb.save(self.target_path)
+        with self.assertRaises(RuntimeError):
+            apply()
+        sheet = openpyxl.load_workbook(self.target_path)["Log"]
+        self.assertEqual("Written elsewhere", sheet.cell(row=12, column=5).value)
+
+    def test_refuses_if_streamed_partition_changed(self):
+        # each year's partition is read without being loaded
+        partitioned_path = os.path.join(self.tmp_dir.name, "workouts {year}.xlsx")
+        for year in {TODAY.year, (TODAY - timedelta(days=20)).year}:
+            shutil.copy(self.target_path, partitioned_path.replace("{year}", str(year)))
+        with mock.patch.multiple(p, TARGET_PATH=partitioned_path, SHEET_READER="streaming"), \
+                mock.patch("openpyxl.load_workbook", side_effect=AssertionError("loaded")):
+            change_plan = plan()
+        partition_path = partitioned_path.replace("{year}", str(TODAY.year))
+        self.assertIn(partition_path, change_plan.workbook_fingerprints)
+
+        wb = openpyxl.load_workbook(partition_path)
+        wb["Log"].cell(row=12, column=5).value = "Written elsewhere"
+        wb.save(partition_path)
+        with mock.patch.multiple(p, TARGET_PATH=partitioned_path, SHEET_READER="streaming"), \
+                self.assertRaises(RuntimeError):
+            apply()
+
+    def test_refuses_if_bodyweights_note_changed(self):
+        plan()
+        self.write_note("Bodyweights note", "(70), 71, 72, 73, 74")
+        with self.assertRaises(RuntimeError):
+            apply()
+
+
+if __name__ == '__main__':
+    unittest.main()
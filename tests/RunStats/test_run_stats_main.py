@@ -0,0 +1,58 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from unittest import mock
+import utilities.params as p
+from RunStats.main import *
+from utilities.run_metrics import append_to_history
+
+START = datetime(2024, 1, 1, 3)
+
+
+def make_runs(durations, bytes_read=1000, days_apart=1):
+    return [RunRecord(tool="NightlyRun", started=START + timedelta(days=i * days_apart), duration_seconds=duration,
+                      counters={BYTES_READ: bytes_read})
+            for i, duration in enumerate(durations)]
+
+
+class TestRunStats(unittest.TestCase):
+    def test_spike_is_an_outlier(self):
+        runs = make_runs([10, 11, 9, 10, 12, 10, 30, 10])
+        outliers = find_outliers(runs)
+        self.assertEqual(list(outliers), [6])
+        self.assertIn("duration_seconds was 30 s, 3.0x the median", outliers[6][0])
+
+    def test_too_few_runs_to_compare(self):
+        self.assertEqual(find_outliers(make_runs([10, 10, 10, 50])), {})
+        self.assertIsNone(monthly_growth_pct(make_runs([10, 10, 10]), "duration_seconds"))
+
+    def test_gradual_growth(self):
+        # half a second longer every day: never an outlier, but about 100% a month
+        runs = make_runs([10 + i / 2 for i in range(20)])
+        self.assertEqual(find_outliers(runs), {})
+        self.assertAlmostEqual(monthly_growth_pct(runs, "duration_seconds"), 100 * 15 / 14.75, places=3)
+        self.assertEqual(monthly_growth_pct(runs, BYTES_READ), 0)
+
+    def test_main_reports_each_tool(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "runs.jsonl")
+            for run in make_runs([10, 11, 9, 10, 12, 10, 30]):
+                append_to_history(run, path)
+            append_to_history(RunRecord(tool="NotePruner", started=START, succeeded=False), path)
+
+            output = io.StringIO()
+            with mock.patch.object(p, "RUN_METRICS_HISTORY_PATH", path), mock.patch("sys.argv", ["main.py"]), \
+                    redirect_stdout(output):
+                main()
+        lines = output.getvalue().splitlines()
+        self.assertIn("NightlyRun: 7 runs, the latest at 2024-01-07 03:00", lines)
+        self.assertTrue(lines[7].endswith("SLOW"))
+        self.assertTrue(any(line.startswith("  ! the run at 2024-01-07 03:00: duration_seconds") for line in lines))
+        self.assertTrue(any(line.endswith("FAILED") for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
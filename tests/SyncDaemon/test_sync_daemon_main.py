@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from openpyxl import Workbook
+import openpyxl
+import utilities.params as p
+from SyncDaemon.main import *
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def title_of(days_ago: int, name: str) -> str:
+    return (TODAY - timedelta(days=days_ago)).strftime('%Y-%m-%d') + " " + name
+
+
+class TestSyncDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.target_path = os.path.join(root, "workouts.xlsx")
+        self.notes_dir = os.path.join(root, "notes")
+        self.other_notes_dir = os.path.join(root, "other notes")
+        self.backup_dir = os.path.join(root, "backups")
+        os.makedirs(self.notes_dir)
+        os.makedirs(self.other_notes_dir)
+
+        # one row per day, with bodyweights up to three days ago, and a workout five days ago
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        sheet.cell(row=1, column=2).value = "Date"
+        for row, days_ago in enumerate(range(20, -5, -1), start=2):
+            sheet.cell(row=row, column=2).value = TODAY - timedelta(days=days_ago)
+            if days_ago >= 3:
+                sheet.cell(row=row, column=3).value = 70.0
+        sheet.cell(row=17, column=5).value = "Deadlift 120kg: 5. Est 30 mins"
+        wb.save(self.target_path)
+        self.bodyweights_path = self.write_note(self.notes_dir, "Bodyweights note", "(70)")
+
+        self.params = mock.patch.multiple(p, TARGET_PATH=self.target_path, TARGET_SHEET="Log",
+                                          LOCAL_NOTES_SOURCE_DIR=self.notes_dir,
+                                          ADDITIONAL_NOTES_SOURCE_DIRS=[self.other_notes_dir],
+                                          LOCAL_NOTES_ARCHIVE_DIR=os.path.join(root, "archive"),
+                                          LOCAL_EXCEL_BACKUP_DIR=self.backup_dir,
+                                          BODYWEIGHT_SERIES_PATH=os.path.join(root, "bodyweights.series"),
+                                          MAX_CONCURRENT_FILE_OPERATIONS=1, WORKOUT_EXPORT_DIR="")
+        self.params.start()
+        self.daemon = SyncDaemon()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def write_note(directory: str, title: str, text: str) -> str:
+        path = os.path.join(directory, title + ".md")
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def read_target(self):
+        return openpyxl.load_workbook(self.target_path)["Log"]
+
+    def test_changes_in_every_directory_are_saved_once(self):
+        changed = {self.write_note(self.notes_dir, title_of(10, "legs"), "Squat 90kg: 8\nEst 50 mins"),
+                   self.write_note(self.other_notes_dir, title_of(1, "push"), "Bench 80kg: 8\nEst 40 mins"),
+                   self.write_note(self.notes_dir, "Bodyweights note", "(70), 71, 72, 73")}
+        with mock.patch.object(TargetWorkbooks, "save", autospec=True,
+                               side_effect=TargetWorkbooks.save) as save:
+            self.daemon.sync(changed)
+        self.assertEqual(1, save.call_count)
+        self.assertEqual(1, len(os.listdir(self.backup_dir)))
+
+        sheet = self.read_target()
+        self.assertEqual("Squat 90kg: 8. Est 50 mins", sheet.cell(row=12, column=5).value)
+        self.assertEqual("Bench 80kg: 8. Est 40 mins", sheet.cell(row=21, column=5).value)
+        self.assertEqual([71, 72, 73], [sheet.cell(row=row, column=3).value for row in (20, 21, 22)])
+
+    def test_own_writes_are_ignored(self):
+        self.daemon.sync({self.write_note(self.notes_dir, "Bodyweights note", "(70), 71, 72, 73")})
+        # the bodyweights note was rewritten by the sync. Being told about that changes nothing
+        with mock.patch.object(bw, "prepare_bodyweights_update", side_effect=AssertionError("prepared")):
+            self.daemon.sync({self.bodyweights_path})
+
+        # but the user's own edits to it are picked up, even though they come after ours
+        with open(self.bodyweights_path, 'a') as f:
+            f.write(" ")
+        os.utime(self.bodyweights_path, (os.path.getmtime(self.bodyweights_path) + 1,) * 2)
+        with mock.patch.object(bw, "prepare_bodyweights_update", return_value=None) as prepare:
+            self.daemon.sync({self.bodyweights_path})
+        prepare.assert_called_once()
+
+    def test_user_edits_within_the_timestamp_resolution_are_picked_up(self):
+        self.daemon.sync({self.write_note(self.notes_dir, "Bodyweights note", "(70), 71, 72, 73")})
+        mtime_ns = os.stat(self.bodyweights_path).st_mtime_ns
+        with open(self.bodyweights_path, 'a') as f:
+            f.write(" ")
+        os.utime(self.bodyweights_path, ns=(mtime_ns, mtime_ns))
+        with mock.patch.object(bw, "prepare_bodyweights_update", return_value=None) as prepare:
+            self.daemon.sync({self.bodyweights_path})
+        prepare.assert_called_once()
+
+    def test_clashing_workouts_are_skipped(self):
+        changed = {self.write_note(self.notes_dir, title_of(5, "pull"), "Row 60kg: 8\nEst 40 mins"),
+                   self.write_note(self.notes_dir, title_of(10, "legs"), "Squat 90kg: 8\nEst 50 mins")}
+        self.daemon.sync(changed)
+
+        sheet = self.read_target()
+        self.assertEqual("Deadlift 120kg: 5. Est 30 mins", sheet.cell(row=17, column=5).value)
+        self.assertEqual("Squat 90kg: 8. Est 50 mins", sheet.cell(row=12, column=5).value)
+
+
+if __name__ == '__main__':
+    unittest.main()
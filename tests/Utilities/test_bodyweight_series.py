@@ -0,0 +1,81 @@
+import math
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from openpyxl import Workbook
+from utilities.params import DATE_COLUMN, BODYWEIGHT_COLUMN
+from utilities.bodyweight_series import *
+
+
+class TestBodyweightSeries(unittest.TestCase):
+    def setUp(self):
+        self.series = BodyweightSeries()
+        # 2021-01-04 is a Monday
+        self.series.set(datetime(2021, 1, 4), '70.0')
+        self.series.set(datetime(2021, 1, 5), '?')
+        self.series.set(datetime(2021, 1, 6), 71.0)
+
+    def test_set_and_get(self):
+        self.assertEqual(self.series.get(datetime(2021, 1, 4)), 70.0)
+        self.assertTrue(math.isnan(self.series.get(datetime(2021, 1, 5))))
+        self.assertTrue(math.isnan(self.series.get(datetime(2020, 1, 1))))
+        self.assertEqual(len(self.series), 3)
+
+    def test_set_before_start_and_after_gap(self):
+        self.series.set(datetime(2021, 1, 2), 69.0)
+        self.series.set(datetime(2021, 1, 10), 72.0)
+        self.assertEqual(self.series.start_date, datetime(2021, 1, 2))
+        self.assertEqual(len(self.series), 9)
+        self.assertEqual(self.series.get(datetime(2021, 1, 2)), 69.0)
+        self.assertEqual(self.series.get(datetime(2021, 1, 6)), 71.0)
+        self.assertTrue(math.isnan(self.series.get(datetime(2021, 1, 3))))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bodyweights.series')
+            self.series.save(path)
+            loaded = BodyweightSeries.load(path)
+        self.assertEqual(loaded.start_date, datetime(2021, 1, 4))
+        self.assertEqual(loaded.get(datetime(2021, 1, 6)), 71.0)
+        self.assertTrue(math.isnan(loaded.get(datetime(2021, 1, 5))))
+
+    def test_rolling_mean_ignores_missing_values(self):
+        self.series.set(datetime(2021, 1, 7), 72.0)
+        self.assertEqual(list(self.series.rolling_mean(2)), [70.0, 70.0, 71.0, 71.5])
+
+    def test_weekly_summaries(self):
+        self.series.set(datetime(2021, 1, 11), 73.0)
+        summaries = self.series.weekly_summaries()
+        self.assertEqual([s.week_start for s in summaries], [datetime(2021, 1, 4), datetime(2021, 1, 11)])
+        self.assertEqual((summaries[0].count, summaries[0].mean, summaries[0].minimum, summaries[0].maximum),
+                         (2, 70.5, 70.0, 71.0))
+        self.assertEqual(summaries[1].count, 1)
+
+    def test_from_sheet(self):
+        sheet = Workbook().active
+        sheet.cell(row=1, column=DATE_COLUMN).value = "Date column title"
+        sheet.cell(row=1, column=BODYWEIGHT_COLUMN).value = "Bodyweight column title"
+        sheet.cell(row=2, column=DATE_COLUMN).value = datetime(2021, 1, 1)
+        sheet.cell(row=2, column=BODYWEIGHT_COLUMN).value = 70.5
+        sheet.cell(row=3, column=DATE_COLUMN).value = "2021-01-02"
+        sheet.cell(row=3, column=BODYWEIGHT_COLUMN).value = "?"
+        sheet.cell(row=4, column=DATE_COLUMN).value = datetime(2021, 1, 3)
+        sheet.cell(row=5, column=DATE_COLUMN).value = datetime(2021, 1, 4)
+        sheet.cell(row=5, column=BODYWEIGHT_COLUMN).value = "??"
+        sheet.cell(row=6, column=DATE_COLUMN).value = datetime(2021, 1, 5)
+        sheet.cell(row=6, column=BODYWEIGHT_COLUMN).value = "ill"
+
+        series = BodyweightSeries.from_sheet(sheet, DATE_COLUMN, BODYWEIGHT_COLUMN)
+        self.assertEqual(series.start_date, datetime(2021, 1, 1))
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.get(datetime(2021, 1, 1)), 70.5)
+        self.assertTrue(math.isnan(series.get(datetime(2021, 1, 4))))
+
+    def test_set_rejects_text(self):
+        with self.assertRaises(ValueError):
+            self.series.set(datetime(2021, 1, 7), "ill")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import utilities.params as p
+from utilities.local_file_handler import LocalFileHandler
+from utilities.composite_handler import *
+
+
+class TestCompositeHandler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.desktop_dir = os.path.join(root, "desktop")
+        self.phone_dir = os.path.join(root, "phone")
+        self.archive_dir = os.path.join(root, "archive")
+        os.makedirs(self.desktop_dir)
+        os.makedirs(self.phone_dir)
+
+        self.params = mock.patch.multiple(p,
+                                          LOCAL_NOTES_ARCHIVE_DIR=self.archive_dir,
+                                          LOCAL_EXCEL_BACKUP_DIR=os.path.join(root, "excel_backups"))
+        self.params.start()
+
+        self.write(self.desktop_dir, "2021-01-01 legs.md", "Squat 90kg: 8,8,8\nEst 50 mins", mtime=1000)
+        self.write(self.phone_dir, "2021-01-01 legs.md", "Squat 90kg: 8,8,9\nEst 50 mins", mtime=2000)
+        self.write(self.desktop_dir, "2021-01-02 push.md", "Bench 80kg: 8,8\nEst 40 mins", mtime=1000)
+        self.write(self.phone_dir, "2021-01-02 push.md", "Bench 80kg: 8,8\nEst 40 mins", mtime=3000)
+        self.write(self.phone_dir, "2021-01-03 pull.md", "Row 60kg: 10\nEst 30 mins", mtime=1000)
+        self.write(self.desktop_dir, "Bodyweights note.md", "(70.5), 71", mtime=1000)
+        self.write(self.phone_dir, "Bodyweights note.md", "(70.5), 71", mtime=1000)
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def write(directory: str, filename: str, text: str, mtime: float):
+        path = os.path.join(directory, filename)
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+
+    def make_handler(self, duplicate_resolution: str) -> CompositeHandler:
+        return CompositeHandler([LocalFileHandler(source_dir=self.desktop_dir),
+                                 LocalFileHandler(source_dir=self.phone_dir)],
+                                duplicate_resolution=duplicate_resolution)
+
+    def test_mtime_resolution_keeps_newest_note_per_date(self):
+        notes = self.make_handler("mtime").retrieve_notes()
+        workouts = sorted((n for n in notes if n.is_valid_workout_note()), key=lambda n: n.floored_datetime)
+        self.assertEqual([os.path.dirname(n.path) for n in workouts],
+                         [self.phone_dir, self.desktop_dir, self.phone_dir])
+        self.assertEqual(len([n for n in notes if n.is_bodyweights_note()]), 1)
+
+    def test_content_resolution_keeps_differing_notes(self):
+        notes = self.make_handler("content").retrieve_notes()
+        dates = sorted(n.floored_datetime.day for n in notes if n.is_valid_workout_note())
+        self.assertEqual(dates, [1, 1, 2, 3])
+
+    def test_discards_via_owning_handler(self):
+        handler = self.make_handler("mtime")
+        workouts = [n for n in handler.retrieve_notes() if n.is_valid_workout_note()]
+        handler.discard_notes(workouts)
+        # the duplicates which were ignored are left in place
+        self.assertEqual(sorted(os.listdir(self.phone_dir)), ["2021-01-02 push.md", "Bodyweights note.md"])
+        self.assertEqual(sorted(os.listdir(self.desktop_dir)), ["2021-01-01 legs.md", "Bodyweights note.md"])
+
+    def test_replace_bodyweights_note(self):
+        handler = self.make_handler("mtime")
+        handler.replace_bodyweights_note("(71), ")
+        with open(os.path.join(self.desktop_dir, "Bodyweights note.md")) as f:
+            self.assertEqual(f.read(), "(71), ")
+
+
+if __name__ == '__main__':
+    unittest.main()
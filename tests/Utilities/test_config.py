@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+import utilities.params as p
+from utilities.config import *
+
+
+class TestConfig(unittest.TestCase):
+    def test_from_params(self):
+        with mock.patch.multiple(p, TARGET_PATH="/dir/Workouts.xlsx", HISTORY_LENGTH=5):
+            config = Config.from_params(history_length=7)
+        self.assertEqual(config.target_path, "/dir/Workouts.xlsx")
+        self.assertEqual(config.history_length, 7)
+        self.assertEqual(config.date_column, p.DATE_COLUMN)
+        # a config is unaffected by later changes to params.py
+        self.assertNotEqual(p.TARGET_PATH, "/dir/Workouts.xlsx")
+
+    def test_replace(self):
+        config = Config.from_params()
+        changed = config.replace(target_sheet="Log")
+        self.assertEqual(changed.target_sheet, "Log")
+        self.assertEqual(config.target_sheet, p.TARGET_SHEET)
+        with self.assertRaises(TypeError):
+            Config.from_params(unknown_setting=1)
+
+    def test_list_settings_are_kept_as_tuples(self):
+        patterns = ["Templates/"]
+        with mock.patch.multiple(p, NOTE_IGNORE_PATTERNS=patterns, ADDITIONAL_NOTES_SOURCE_DIRS=[]):
+            config = Config.from_params()
+        patterns.append("Drafts/")
+        self.assertEqual(config.note_ignore_patterns, ("Templates/",))
+        self.assertEqual(config.additional_notes_source_dirs, ())
+        self.assertEqual(hash(config), hash(Config.from_params(note_ignore_patterns=["Templates/"],
+                                                               additional_notes_source_dirs=[])))
+
+    def test_has_setting(self):
+        self.assertTrue(Config.has_setting("TARGET_PATH"))
+        self.assertFalse(Config.has_setting("ATHLETE_PROFILES_PATH"))
+
+
+if __name__ == '__main__':
+    unittest.main()
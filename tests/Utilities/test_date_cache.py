@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import openpyxl
+from openpyxl import Workbook
+import utilities.params as p
+import utilities.basic_functions as bf
+import utilities.utility_functions as uf
+from utilities.date_cache import *
+
+
+class TestSheetDateCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "workouts.xlsx")
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        sheet.cell(row=1, column=2).value = "Date"
+        sheet.cell(row=2, column=2).value = datetime(2021, 1, 1, 12)
+        sheet.cell(row=3, column=2).value = "2021-01-02"
+        sheet.cell(row=4, column=2).value = "3 January 2021"
+        wb.save(self.path)
+
+        self.params = mock.patch.multiple(p, TARGET_PATH=self.path, TARGET_SHEET="Log", DATE_COLUMN=2,
+                                          CACHE_PARSED_DATES=True)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def load(self):
+        wb = openpyxl.load_workbook(self.path)
+        attach_to_sheet(wb, self.path, "Log")
+        return wb
+
+    def read_dates(self, sheet):
+        cache = for_sheet(sheet)
+        return [cache.floored_date(row, sheet.cell(row=row, column=2).value) for row in range(1, 5)]
+
+    def count_parses(self, sheet) -> int:
+        with mock.patch.object(bf, 'convert_cell_value_to_floored_datetime',
+                               wraps=bf.convert_cell_value_to_floored_datetime) as convert:
+            self.read_dates(sheet)
+        return len([c for c in convert.call_args_list if isinstance(c.args[0], str)])
+
+    def test_string_dates_are_parsed_once_per_workbook_revision(self):
+        sheet = self.load()["Log"]
+        self.assertEqual(self.read_dates(sheet),
+                         [None, datetime(2021, 1, 1), datetime(2021, 1, 2), datetime(2021, 1, 3)])
+        save_for_sheet(sheet)
+        self.assertTrue(os.path.exists(sidecar_path_of(self.path)))
+
+        self.assertEqual(self.count_parses(self.load()["Log"]), 0)
+
+    def test_cache_is_rekeyed_after_saving_the_workbook(self):
+        wb = self.load()
+        sheet = wb["Log"]
+        self.read_dates(sheet)
+        sheet.cell(row=2, column=5).value = "Squat 90kg: 8,8,8"
+        wb.save(self.path)
+        save_for_sheet(sheet, workbook_saved=True)
+
+        self.assertEqual(self.count_parses(self.load()["Log"]), 0)
+
+    def test_cache_is_discarded_when_workbook_is_changed_elsewhere(self):
+        wb = self.load()
+        self.read_dates(wb["Log"])
+        save_for_sheet(wb["Log"])
+
+        wb["Log"].cell(row=3, column=2).value = "2021-02-02"
+        wb.save(self.path)
+
+        sheet = self.load()["Log"]
+        self.assertEqual(self.count_parses(sheet), 3)
+        self.assertEqual(self.read_dates(sheet)[2], datetime(2021, 2, 2))
+
+    def test_sheets_built_in_memory_are_never_saved(self):
+        sheet = Workbook().active
+        sheet.cell(row=3, column=2).value = "2021-01-02"
+        self.assertEqual(self.read_dates(sheet)[2], datetime(2021, 1, 2))
+        save_for_sheet(sheet)
+        self.assertFalse(os.path.exists(sidecar_path_of(self.path)))
+
+
+class TestFindRowOfCellMatchingDatetime(unittest.TestCase):
+    def test_finds_datetime_and_string_dates(self):
+        sheet = Workbook().active
+        sheet.cell(row=1, column=2).value = "Date"
+        sheet.cell(row=2, column=2).value = datetime(2021, 1, 1)
+        sheet.cell(row=3, column=2).value = "2021-01-02"
+        self.assertEqual(uf.find_row_of_cell_matching_datetime(sheet, datetime(2021, 1, 1, 9), 2), 2)
+        self.assertEqual(uf.find_row_of_cell_matching_datetime(sheet, datetime(2021, 1, 2), 2), 3)
+        self.assertEqual(uf.find_row_of_cell_matching_datetime(sheet, datetime(2021, 1, 3), 2), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
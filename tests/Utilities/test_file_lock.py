@@ -0,0 +1,48 @@
+import os
+import tempfile
+import threading
+import unittest
+from utilities.file_lock import *
+
+
+class TestFileLock(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Workouts.xlsx")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lock_is_exclusive(self):
+        with FileLock(self.path, timeout=0):
+            with self.assertRaises(TimeoutError):
+                with FileLock(self.path, timeout=0):
+                    pass
+        with FileLock(self.path, timeout=0):
+            pass
+
+    def test_waits_for_release(self):
+        order = []
+        lock = FileLock(self.path)
+        lock.__enter__()
+
+        def write():
+            with FileLock(self.path, timeout=10):
+                order.append("second")
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        order.append("first")
+        lock.__exit__(None, None, None)
+        thread.join()
+        self.assertEqual(["first", "second"], order)
+
+    def test_lock_files_are_kept_out_of_the_locked_files_directory(self):
+        with FileLock(self.path):
+            self.assertEqual([], os.listdir(self.tmp_dir.name))
+        other_path = os.path.join(self.tmp_dir.name, "other", "Workouts.xlsx")
+        self.assertNotEqual(lock_path_of(self.path), lock_path_of(other_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
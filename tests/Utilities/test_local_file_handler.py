@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import utilities.params as p
+from utilities.local_file_handler import *
+
+
+class TestAsyncLocalFileHandler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.source_dir = os.path.join(root, "notes")
+        self.archive_dir = os.path.join(root, "archive")
+        os.makedirs(os.path.join(self.source_dir, "2021", "january"))
+        os.makedirs(os.path.join(self.source_dir, "Backups"))
+
+        self.write("2021/january/2021-01-01 legs.md", "Squat 90kg: 8,8,8\nEst 50 mins")
+        self.write("2021/2021-01-02 push.txt", "Bench 80kg: 8,8\nEst 40 mins")
+        self.write("Bodyweights note.md", "(70.5), 71")
+        self.write("image.png", "")
+        self.write("Backups/backup_2021_1_1_Bodyweights note.md", "(70.5)")
+
+        self.params = mock.patch.multiple(p,
+                                          LOCAL_NOTES_SOURCE_DIR=self.source_dir,
+                                          LOCAL_NOTES_ARCHIVE_DIR=self.archive_dir,
+                                          LOCAL_EXCEL_BACKUP_DIR=os.path.join(root, "excel_backups"))
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def write(self, relative_path: str, text: str):
+        with open(os.path.join(self.source_dir, relative_path), 'w') as f:
+            f.write(text)
+
+    def test_retrieves_same_notes_as_local_file_handler(self):
+        expected = LocalFileHandler().retrieve_notes()
+        result = BlockingHandler(AsyncLocalFileHandler(max_concurrency=2)).retrieve_notes()
+        self.assertEqual(result, expected)
+        self.assertEqual(len(result), 3)
+
+    def test_replace_bodyweights_note(self):
+        handler = BlockingHandler(AsyncLocalFileHandler())
+        self.assertEqual(handler.return_bodyweights_note().text, "(70.5), 71")
+        handler.replace_bodyweights_note("(70.5, 71), ")
+        with open(os.path.join(self.source_dir, "Bodyweights note.md")) as f:
+            self.assertEqual(f.read(), "(70.5, 71), ")
+        self.assertEqual(len(os.listdir(self.archive_dir)), 1)
+
+    def test_discard_notes(self):
+        handler = BlockingHandler(AsyncLocalFileHandler())
+        workout_notes = [note for note in handler.retrieve_notes() if note.is_valid_workout_note()]
+        handler.discard_notes(workout_notes)
+        self.assertEqual(sorted(os.listdir(self.archive_dir)), ["index.jsonl", "notes-2021-01.zip"])
+        self.assertEqual(sorted(note.member for note in na.list_archived_notes(self.archive_dir)),
+                         ["2021-01-01 legs.md", "2021-01-02 push.txt"])
+        self.assertFalse(os.path.exists(os.path.join(self.source_dir, "2021", "2021-01-02 push.txt")))
+
+    def test_discard_notes_as_individual_files(self):
+        with mock.patch.object(p, 'ARCHIVE_NOTES_IN_BUNDLES', False):
+            handler = BlockingHandler(AsyncLocalFileHandler())
+            workout_notes = [note for note in handler.retrieve_notes() if note.is_valid_workout_note()]
+            handler.discard_notes(workout_notes)
+        self.assertEqual(sorted(os.listdir(self.archive_dir)), ["2021-01-01 legs.md", "2021-01-02 push.txt"])
+        self.assertFalse(os.path.exists(os.path.join(self.source_dir, "2021", "2021-01-02 push.txt")))
+
+    def test_create_handler(self):
+        with mock.patch.object(p, 'MAX_CONCURRENT_FILE_OPERATIONS', 1):
+            self.assertIsInstance(create_handler(), LocalFileHandler)
+        with mock.patch.object(p, 'MAX_CONCURRENT_FILE_OPERATIONS', 8):
+            self.assertIsInstance(create_handler(), BlockingHandler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from unittest import mock
+import utilities.note_archive as na
+from utilities.note_archive import *
+
+
+class TestNoteArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.notes_dir = os.path.join(self.root, "notes")
+        self.archive_dir = os.path.join(self.root, "archive")
+        os.makedirs(self.notes_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_note(self, directory: str, title: str, text: str, mtime: float = 1700000000) -> Entry:
+        path = os.path.join(directory, title + ".md")
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+        return Entry(title=title, text=text, path=path, edit_timestamp=datetime.fromtimestamp(mtime))
+
+    def test_notes_are_bundled_by_month(self):
+        notes = [self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins"),
+                 self.write_note(self.notes_dir, "2021-01-31 push", "Bench 80kg: 8\nEst 40 mins"),
+                 self.write_note(self.notes_dir, "2021-02-01 pull", "Row 60kg: 10\nEst 30 mins"),
+                 self.write_note(self.notes_dir, "Journal", "Not a workout")]
+        self.assertEqual(archive_notes(notes, self.archive_dir), notes)
+
+        self.assertEqual(sorted(os.listdir(self.archive_dir)),
+                         ["index.jsonl", "notes-2021-01.zip", "notes-2021-02.zip", "notes-2023-11.zip"])
+        with zipfile.ZipFile(os.path.join(self.archive_dir, "notes-2021-01.zip")) as bundle:
+            self.assertEqual(sorted(bundle.namelist()), ["2021-01-01 legs.md", "2021-01-31 push.md"])
+        # the notes themselves are left for the caller to remove
+        self.assertEqual(len(os.listdir(self.notes_dir)), 4)
+        self.assertEqual([note.title for note in find_archived_notes(self.archive_dir, "2021-01")],
+                         ["2021-01-01 legs", "2021-01-31 push"])
+
+    def test_extract_note(self):
+        note = self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins")
+        archive_notes([note], self.archive_dir)
+        os.remove(note.path)
+        # archiving a note with the same name again keeps both
+        archive_notes([self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 95kg: 8\nEst 50 mins")],
+                      self.archive_dir)
+
+        first, second = list_archived_notes(self.archive_dir)
+        self.assertEqual((first.member, second.member), ("2021-01-01 legs.md", "2021-01-01 legs (2).md"))
+        destination = os.path.join(self.root, "restored")
+        path = extract_note(self.archive_dir, first, destination)
+        with open(path) as f:
+            self.assertEqual(f.read(), "Squat 90kg: 8\nEst 50 mins")
+        self.assertAlmostEqual(os.path.getmtime(path), 1700000000, delta=2)
+        with self.assertRaises(FileExistsError):
+            extract_note(self.archive_dir, first, destination)
+
+    def test_notes_are_appended_to_bundles(self):
+        archive_notes([self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins")],
+                      self.archive_dir)
+        bundle_path = os.path.join(self.archive_dir, "notes-2021-01.zip")
+        with zipfile.ZipFile(bundle_path) as bundle:
+            members_end = bundle.start_dir
+        with open(bundle_path, 'rb') as f:
+            members = f.read(members_end)
+
+        archive_notes([self.write_note(self.notes_dir, "2021-01-02 push", "Bench 80kg: 8\nEst 40 mins")],
+                      self.archive_dir)
+        with open(bundle_path, 'rb') as f:
+            self.assertEqual(members, f.read(members_end))
+        with zipfile.ZipFile(bundle_path) as bundle:
+            self.assertEqual(bundle.namelist(), ["2021-01-01 legs.md", "2021-01-02 push.md"])
+
+    def archive_with_failing_write(self, notes: List[Entry], failing_member: str) -> List[Entry]:
+        # archive the notes, failing once the given member has been partly written to its bundle
+        real_write = zipfile.ZipFile.write
+
+        def write(bundle, filename, arcname=None, *args, **kwargs):
+            if arcname == failing_member:
+                bundle.fp.write(b"half-written member")
+                raise OSError("disk full")
+            return real_write(bundle, filename, arcname, *args, **kwargs)
+
+        with mock.patch.object(zipfile.ZipFile, "write", write):
+            return archive_notes(notes, self.archive_dir)
+
+    def test_failed_append_is_rolled_back(self):
+        archive_notes([self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins")],
+                      self.archive_dir)
+        bundle_path = os.path.join(self.archive_dir, "notes-2021-01.zip")
+        with open(bundle_path, 'rb') as f:
+            before = f.read()
+
+        notes = [self.write_note(self.notes_dir, "2021-01-02 push", "Bench 80kg: 8\nEst 40 mins"),
+                 self.write_note(self.notes_dir, "2021-01-03 pull", "Row 60kg: 10\nEst 30 mins")]
+        self.assertEqual(self.archive_with_failing_write(notes, "2021-01-03 pull.md"), [])
+        with open(bundle_path, 'rb') as f:
+            self.assertEqual(before, f.read())
+        self.assertEqual(sorted(os.listdir(self.archive_dir)), ["index.jsonl", "notes-2021-01.zip"])
+        self.assertEqual(len(list_archived_notes(self.archive_dir)), 1)
+
+    def test_append_cut_short_by_a_crash_is_rolled_back_later(self):
+        archive_notes([self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins")],
+                      self.archive_dir)
+        bundle_path = os.path.join(self.archive_dir, "notes-2021-01.zip")
+        # a crash leaves the bundle half-written, and isn't rolled back straight away
+        with mock.patch.object(na, "_roll_back"):
+            self.archive_with_failing_write([self.write_note(self.notes_dir, "2021-01-02 push",
+                                                             "Bench 80kg: 8\nEst 40 mins")], "2021-01-02 push.md")
+        self.assertTrue(os.path.exists(bundle_path + ".journal"))
+
+        archive_notes([self.write_note(self.notes_dir, "2021-01-03 pull", "Row 60kg: 10\nEst 30 mins")],
+                      self.archive_dir)
+        self.assertFalse(os.path.exists(bundle_path + ".journal"))
+        with zipfile.ZipFile(bundle_path) as bundle:
+            self.assertIsNone(bundle.testzip())
+            self.assertEqual(bundle.namelist(), ["2021-01-01 legs.md", "2021-01-03 pull.md"])
+
+    def test_each_bundle_is_indexed_as_soon_as_it_is_written(self):
+        os.makedirs(os.path.join(self.archive_dir, "notes-2021-02.zip"))
+        notes = [self.write_note(self.notes_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins"),
+                 self.write_note(self.notes_dir, "2021-02-01 pull", "Row 60kg: 10\nEst 30 mins")]
+        self.assertEqual(archive_notes(notes, self.archive_dir), notes[:1])
+        self.assertEqual([note.title for note in list_archived_notes(self.archive_dir)], ["2021-01-01 legs"])
+
+    def test_pack_loose_notes(self):
+        os.makedirs(self.archive_dir)
+        self.write_note(self.archive_dir, "2021-01-01 legs", "Squat 90kg: 8\nEst 50 mins")
+        self.write_note(self.archive_dir, "2021-03-02 push", "Bench 80kg: 8\nEst 40 mins")
+        self.assertEqual(pack_loose_notes(self.archive_dir, ('.md', '.txt')), 2)
+        self.assertEqual(sorted(os.listdir(self.archive_dir)),
+                         ["index.jsonl", "notes-2021-01.zip", "notes-2021-03.zip"])
+        self.assertEqual(pack_loose_notes(self.archive_dir, ('.md', '.txt')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import utilities.params as p
+import utilities.run_metrics as rm
+from utilities.local_file_handler import LocalFileHandler
+from utilities.note_classifier import *
+
+
+class TestClassifyNoteFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.long_text = "Dear diary.\n" * 1000
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def classify(self, filename: str, text: str) -> str:
+        path = os.path.join(self.tmp_dir.name, filename)
+        with open(path, 'w') as f:
+            f.write(text)
+        return classify_note_file(path, os.path.getsize(path))
+
+    def test_workout(self):
+        self.assertEqual(WORKOUT, self.classify("2021-01-01 legs.md", "Squat 90kg: 8,8,8\nEst 50 mins"))
+        self.assertEqual(WORKOUT, self.classify("2021-01-01 legs.md", self.long_text + "Squat: 8\nest ?? mins"))
+
+    def test_bodyweights(self):
+        self.assertEqual(BODYWEIGHTS, self.classify("bodyweights NOTE.md", "(70.5), 71"))
+
+    def test_other(self):
+        self.assertEqual(OTHER, self.classify("2021-01-01 journal.md", "Went for a walk"))
+        self.assertEqual(OTHER, self.classify("Journal.md", self.long_text))
+
+    def test_undated_note_with_estimate_is_kept(self):
+        # so that reading it warns about the missing date
+        self.assertEqual(WORKOUT, self.classify("Legs.md", "Squat 90kg: 8,8,8\nEst 50 mins"))
+
+    def test_estimate_must_be_near_the_end(self):
+        self.assertEqual(OTHER, self.classify("2021-01-01 legs.md", "Squat: 8\nEst 50 mins\n" + self.long_text))
+
+    def test_tail_is_bounded(self):
+        path = os.path.join(self.tmp_dir.name, "note.md")
+        with open(path, 'w') as f:
+            f.write("é" + "a" * (TAIL_BYTES - 1))
+        # "é" is 2 bytes long, so the tail starts with its second byte, which is dropped
+        self.assertEqual("a" * (TAIL_BYTES - 1), read_tail(path, os.path.getsize(path)))
+
+
+class TestSkippingOtherNotes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        source_dir = self.tmp_dir.name
+        for filename, text in [("2021-01-01 legs.md", "Squat 90kg: 8,8,8\nEst 50 mins"),
+                               ("Bodyweights note.md", "70"),
+                               ("Journal.md", "Dear diary.\n" * 1000)]:
+            with open(os.path.join(source_dir, filename), 'w') as f:
+                f.write(text)
+        self.params = mock.patch.multiple(p, LOCAL_NOTES_SOURCE_DIR=source_dir,
+                                          LOCAL_EXCEL_BACKUP_DIR=os.path.join(source_dir, "excel_backups"),
+                                          CLASSIFY_NOTES_BEFORE_READING=True)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def test_other_notes_are_skipped(self):
+        titles = sorted(note.title for note in LocalFileHandler().retrieve_notes())
+        self.assertEqual(["2021-01-01 legs", "Bodyweights note"], titles)
+
+    def test_each_byte_is_read_once(self):
+        with mock.patch.object(rm, "_publish"), rm.record_run("test") as record:
+            notes = LocalFileHandler().retrieve_notes()
+        self.assertEqual(len("Squat 90kg: 8,8,8\nEst 50 mins") + len("70") + TAIL_BYTES,
+                         record.counters[rm.BYTES_READ])
+        self.assertIn("Squat 90kg: 8,8,8\nEst 50 mins", [note.text for note in notes])
+
+    def test_long_workout_note_is_read_whole(self):
+        text = "Squat 90kg: 8\r\n" * 1000 + "Est 50 mins"
+        with open(os.path.join(p.LOCAL_NOTES_SOURCE_DIR, "2021-01-02 legs.md"), 'w', newline='') as f:
+            f.write(text)
+        notes = {note.title: note for note in LocalFileHandler().retrieve_notes()}
+        self.assertEqual(text.replace("\r\n", "\n"), notes["2021-01-02 legs"].text)
+
+    def test_classification_can_be_disabled(self):
+        with mock.patch.object(p, "CLASSIFY_NOTES_BEFORE_READING", False):
+            self.assertEqual(3, len(LocalFileHandler().retrieve_notes()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+import utilities.note_preprocessing as npp
+from utilities.note_preprocessing import *
+
+
+class TestPreprocessNote(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def test_properties_are_split_off(self):
+        text = "---\ntags: workout\n---\nSquat 90kg: 8,8\nEst 50 mins"
+        note = preprocess_note(text)
+        self.assertEqual((0, len("---\ntags: workout\n---\n")), note.properties_span)
+        self.assertEqual("Squat 90kg: 8,8\nEst 50 mins", note.body)
+
+    def test_note_without_properties(self):
+        note = preprocess_note("Squat 90kg: 8,8\nEst 50 mins")
+        self.assertIsNone(note.properties_span)
+        self.assertEqual("Squat 90kg: 8,8\nEst 50 mins", note.body)
+
+    def test_properties_closing_at_end_of_note(self):
+        self.assertEqual("", preprocess_note("---\ntags: workout\n---").body)
+
+    def test_unclosed_properties_raise(self):
+        with self.assertRaises(ValueError):
+            preprocess_note("---\ntags: workout\nSquat 90kg: 8,8")
+
+    def test_comment_lines_are_dropped(self):
+        note = preprocess_note("Squat 90kg: 8,8 \n/comment\n(80kg: 8,8)\n\n+ Dead hang\nEst 50 mins")
+        self.assertEqual(("Squat 90kg: 8,8", "+ Dead hang", "Est 50 mins"), note.non_comment_lines)
+
+    def test_memoized_by_content(self):
+        text = "Squat 90kg: 8,8\nEst 50 mins"
+        self.assertIs(preprocess_note(text), preprocess_note(''.join(["Squat 90kg: 8,8\n", "Est 50 mins"])))
+
+    def test_least_recently_used_are_evicted(self):
+        with mock.patch.object(npp, "MAX_CACHED_NOTES", 2):
+            first = preprocess_note("a")
+            preprocess_note("b")
+            preprocess_note("a")
+            preprocess_note("c")
+            self.assertIs(first, preprocess_note("a"))
+            self.assertEqual(2, len(npp._cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
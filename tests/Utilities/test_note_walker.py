@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from utilities.note_walker import *
+
+
+class TestIgnoreRules(unittest.TestCase):
+    def test_unanchored_pattern_matches_at_any_depth(self):
+        rules = IgnoreRules(["*.excalidraw.md"])
+        self.assertTrue(rules.is_ignored("drawing.excalidraw.md", is_dir=False))
+        self.assertTrue(rules.is_ignored("2021/january/drawing.excalidraw.md", is_dir=False))
+        self.assertFalse(rules.is_ignored("2021/january/2021-01-01 legs.md", is_dir=False))
+
+    def test_anchored_pattern_matches_from_root_only(self):
+        rules = IgnoreRules(["/Templates/"])
+        self.assertTrue(rules.is_ignored("Templates", is_dir=True))
+        self.assertFalse(rules.is_ignored("2021/Templates", is_dir=True))
+
+    def test_directory_pattern_doesnt_match_files(self):
+        rules = IgnoreRules(["*backup*/"])
+        self.assertTrue(rules.is_ignored("Backups", is_dir=True))
+        self.assertTrue(rules.is_ignored("2021/excel_backup_dir", is_dir=True))
+        self.assertFalse(rules.is_ignored("backup plan.md", is_dir=False))
+
+    def test_double_star_matches_across_directories(self):
+        rules = IgnoreRules(["drafts/**/*.md"])
+        self.assertTrue(rules.is_ignored("drafts/a.md", is_dir=False))
+        self.assertTrue(rules.is_ignored("drafts/2021/january/a.md", is_dir=False))
+        self.assertFalse(rules.is_ignored("2021/drafts/a.md", is_dir=False))
+
+    def test_negation_and_last_match_wins(self):
+        rules = IgnoreRules(["# comment", "", "*.txt", "!keep*.txt"])
+        self.assertTrue(rules.is_ignored("notes.txt", is_dir=False))
+        self.assertFalse(rules.is_ignored("keep me.txt", is_dir=False))
+
+    def test_case_insensitive(self):
+        rules = IgnoreRules(["archive/"])
+        self.assertTrue(rules.is_ignored("ARCHIVE", is_dir=True))
+
+
+class TestNoteWalker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        for relative_path in ["a.md", "b.png", "1/b.txt", "1/2/c.md", "1/2/3/d.md", "Backups/e.md", "skip/f.md"]:
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def walk(self, max_depth: int, ignore_dirs: List[str] = ()) -> List[str]:
+        walker = NoteWalker(self.root, ('.txt', '.md'), IgnoreRules(["*backup*/"]), list(ignore_dirs), max_depth)
+        return sorted(os.path.relpath(entry.path, self.root).replace(os.sep, '/') for entry in walker.walk())
+
+    def test_walks_notes_skipping_ignored_directories(self):
+        self.assertEqual(self.walk(max_depth=5, ignore_dirs=[os.path.join(self.root, "skip")]),
+                         ["1/2/3/d.md", "1/2/c.md", "1/b.txt", "a.md"])
+
+    def test_depth_limit(self):
+        self.assertEqual(self.walk(max_depth=0), ["a.md"])
+        self.assertEqual(self.walk(max_depth=2), ["1/2/c.md", "1/b.txt", "a.md", "skip/f.md"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from utilities.config import Config
+from utilities.note_watcher import *
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        os.makedirs(os.path.join(self.root, "workouts"))
+        os.makedirs(os.path.join(self.root, "Backups"))
+        self.note_path = os.path.join(self.root, "workouts", "2021-01-01 legs.md")
+        self.write(self.note_path, "Squat\nEst 50 mins")
+        self.watcher = PollingWatcher(self.root, extensions=('.txt', '.md'), ignore_dirs=[], interval=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def write(path: str, text: str, mtime: float | None = None):
+        with open(path, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.wait_for_changes(), set())
+
+    def test_detects_created_modified_and_deleted_notes(self):
+        new_path = os.path.join(self.root, "2021-01-02 push.txt")
+        self.write(new_path, "Bench\nEst 40 mins")
+        self.write(self.note_path, "Squat\nEst 55 mins", mtime=os.path.getmtime(self.note_path) + 10)
+        self.assertEqual(self.watcher.wait_for_changes(), {new_path, self.note_path})
+
+        os.remove(new_path)
+        self.assertEqual(self.watcher.wait_for_changes(), {new_path})
+
+    def test_ignores_other_files_and_backup_directories(self):
+        self.write(os.path.join(self.root, "image.png"), "")
+        self.write(os.path.join(self.root, "Backups", "backup_2021_1_1_note.md"), "")
+        self.assertEqual(self.watcher.wait_for_changes(), set())
+
+    def test_follows_the_ignore_patterns_of_the_given_config(self):
+        config = Config.from_params(note_ignore_patterns=["workouts/"])
+        watcher = PollingWatcher(self.root, extensions=('.md',), ignore_dirs=[], interval=0, config=config)
+        self.write(self.note_path, "Squat\nEst 55 mins", mtime=os.path.getmtime(self.note_path) + 10)
+        self.write(os.path.join(self.root, "2021-01-02 push.md"), "Bench\nEst 40 mins")
+        self.assertEqual(watcher.wait_for_changes(), {os.path.join(self.root, "2021-01-02 push.md")})
+
+
+if __name__ == '__main__':
+    unittest.main()
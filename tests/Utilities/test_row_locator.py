@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+from utilities.row_locator import *
+from utilities.sheet_reader import OpenpyxlSheetReader
+
+
+class CountingReader(OpenpyxlSheetReader):
+    # counts the cells read one at a time, and how many times the whole column was scanned
+    def __init__(self, sheet):
+        super().__init__(sheet)
+        self.cells_read = 0
+        self.scans = 0
+
+    def value(self, row: int, column: int):
+        self.cells_read += 1
+        return super().value(row, column)
+
+    def iter_columns(self, columns, min_row=1):
+        self.scans += 1
+        return super().iter_columns(columns, min_row)
+
+
+def build_sheet(first_date: datetime, day_count: int, blank_rows=(), skipped_days=()):
+    # a header, then one row per day from first_date, leaving the given rows blank and skipping the given day offsets
+    sheet = Workbook().active
+    sheet.cell(row=1, column=2).value = "Date"
+    row = 2
+    for day in range(day_count):
+        while row in blank_rows:
+            row += 1
+        if day not in skipped_days:
+            sheet.cell(row=row, column=2).value = first_date + timedelta(days=day)
+            row += 1
+    return sheet
+
+
+def scan_for(sheet, date: datetime) -> int:
+    for row in range(1, sheet.max_row + 1):
+        value = sheet.cell(row=row, column=2).value
+        if isinstance(value, datetime) and value == date:
+            return row
+    return -1
+
+
+class TestDateRowLocator(unittest.TestCase):
+    first_date = datetime(2020, 12, 1)
+
+    def test_well_formed_sheet_needs_a_few_cells_per_lookup(self):
+        reader = CountingReader(build_sheet(self.first_date, 5000))
+        locator = DateRowLocator(reader, 2)
+        reader.cells_read = 0
+        for day in (4321, 17, 2500, 4999, 0):
+            self.assertEqual(locator.row_of(self.first_date + timedelta(days=day, hours=9)), day + 2)
+        # the predicted row, the row above it in case the date is duplicated, and the dated rows either side of it
+        self.assertLessEqual(reader.cells_read, 4 * 5)
+        self.assertEqual(reader.scans, 0)
+
+    def test_blank_rows_and_missing_days(self):
+        sheet = build_sheet(self.first_date, 400, blank_rows={33, 34, 35, 200}, skipped_days={50, 51, 300})
+        reader = CountingReader(sheet)
+        locator = DateRowLocator(reader, 2)
+        for day in range(-3, 403):
+            date = self.first_date + timedelta(days=day)
+            self.assertEqual(locator.row_of(date), scan_for(sheet, date), date)
+
+    def test_duplicated_date_gives_first_row(self):
+        sheet = build_sheet(self.first_date, 30)
+        sheet.cell(row=12, column=2).value = sheet.cell(row=11, column=2).value
+        self.assertEqual(DateRowLocator(sheet, 2).row_of(self.first_date + timedelta(days=9)), 11)
+
+    def test_dates_out_of_order_are_still_found(self):
+        sheet = build_sheet(self.first_date, 30)
+        sheet.cell(row=10, column=2).value = datetime(2019, 5, 5)
+        sheet.cell(row=20, column=2).value = "2022-01-01"
+        locator = DateRowLocator(sheet, 2)
+        self.assertEqual(locator.row_of(datetime(2019, 5, 5)), 10)
+        self.assertEqual(locator.row_of(datetime(2022, 1, 1)), 20)
+        self.assertEqual(locator.row_of(self.first_date + timedelta(days=25)), 27)
+        self.assertEqual(locator.row_of(self.first_date + timedelta(days=8)), -1)
+
+    def test_first_occurrence_found_among_dates_out_of_order(self):
+        sheet = build_sheet(self.first_date, 30)
+        date = self.first_date + timedelta(days=19)
+        sheet.cell(row=20, column=2).value = self.first_date + timedelta(days=25)
+        sheet.cell(row=8, column=2).value = date
+        self.assertEqual(DateRowLocator(sheet, 2).row_of(date), 8)
+
+    def test_column_is_scanned_once(self):
+        reader = CountingReader(build_sheet(self.first_date, 30))
+        locator = DateRowLocator(reader, 2)
+        for date in (datetime(2019, 5, 5), datetime(2022, 1, 1), self.first_date + timedelta(days=3)):
+            locator.row_of(date)
+        self.assertEqual(locator.row_of(datetime(2019, 5, 5)), -1)
+        self.assertEqual(locator.row_of(self.first_date + timedelta(days=3)), 5)
+        self.assertEqual(reader.scans, 1)
+
+    def test_row_range_reads_a_few_cells(self):
+        sheet = build_sheet(self.first_date, 5000)
+        sheet.cell(row=1002, column=2).value = sheet.cell(row=1001, column=2).value
+        reader = CountingReader(sheet)
+        locator = DateRowLocator(reader, 2)
+        reader.cells_read = 0
+        start, end = self.first_date + timedelta(days=900), self.first_date + timedelta(days=999)
+        self.assertEqual(locator.row_range(start, end), (902, 1002))
+        self.assertLessEqual(reader.cells_read, 4 * 2 + 2)
+        self.assertEqual(reader.scans, 0)
+        self.assertEqual(locator.row_range(None, self.first_date + timedelta(days=1)), (1, 3))
+
+    def test_row_range_among_dates_out_of_order(self):
+        sheet = build_sheet(self.first_date, 30)
+        sheet.cell(row=22, column=2).value = self.first_date + timedelta(days=25)
+        locator = DateRowLocator(sheet, 2)
+        # the range's dates run from row 21 down, and the sheet is read to its end in case of duplicates further down
+        self.assertEqual(locator.row_range(self.first_date + timedelta(days=19), self.first_date + timedelta(days=21)),
+                         (21, 31))
+        self.assertIsNone(locator.row_range(datetime(2019, 1, 1), datetime(2019, 2, 1)))
+
+    def test_sheet_without_dates(self):
+        sheet = Workbook().active
+        sheet.cell(row=1, column=2).value = "Date"
+        self.assertEqual(DateRowLocator(sheet, 2).row_of(self.first_date), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
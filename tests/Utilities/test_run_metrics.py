@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import utilities.params as p
+from utilities.run_metrics import *
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.history_path = os.path.join(self.tmp_dir.name, "runs.jsonl")
+        self.textfile_dir = os.path.join(self.tmp_dir.name, "textfiles")
+        self.params = mock.patch.multiple(p, RUN_METRICS_HISTORY_PATH=self.history_path,
+                                          RUN_METRICS_TEXTFILE_DIR=self.textfile_dir)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def test_run_is_recorded_with_counters_and_stages(self):
+        with record_run("NightlyRun"):
+            count(NOTES_SCANNED, 3)
+            count(ROWS_WRITTEN)
+            with stage("write"):
+                pass
+            with stage("write"):
+                pass
+
+        [run] = load_history(self.history_path)
+        self.assertEqual(run.tool, "NightlyRun")
+        self.assertTrue(run.succeeded)
+        self.assertEqual(run.counters[NOTES_SCANNED], 3)
+        self.assertEqual(run.counters[ROWS_WRITTEN], 1)
+        self.assertEqual(run.counters[BACKUPS_MADE], 0)
+        self.assertEqual(list(run.stage_seconds), ["write"])
+
+        with open(textfile_path_of("NightlyRun", self.textfile_dir)) as f:
+            textfile = f.read()
+        self.assertIn('workout_notes_notes_scanned{tool="NightlyRun"} 3\n', textfile)
+        self.assertIn('workout_notes_run_succeeded{tool="NightlyRun"} 1\n', textfile)
+        self.assertIn('workout_notes_stage_duration_seconds{tool="NightlyRun",stage="write"} ', textfile)
+
+    def test_decorated_function_which_exits_or_raises(self):
+        @record_run("WorkoutsToExcel")
+        def exits():
+            exit()
+
+        @record_run("WorkoutsToExcel")
+        def raises():
+            raise RuntimeError("Failed")
+
+        with self.assertRaises(SystemExit):
+            exits()
+        with self.assertRaises(RuntimeError):
+            raises()
+        self.assertEqual([run.succeeded for run in load_history(self.history_path)], [True, False])
+
+    def test_counting_outside_a_run_does_nothing(self):
+        count(NOTES_SCANNED)
+        with stage("write"):
+            pass
+        self.assertFalse(os.path.exists(self.history_path))
+
+    def test_runs_in_different_threads_are_recorded_separately(self):
+        started = threading.Barrier(2)
+
+        def run(tool: str, amount: int):
+            with record_run(tool):
+                started.wait()
+                count(NOTES_SCANNED, amount)
+                # worker threads count towards the run which started them
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(in_current_run(lambda _: count(ROWS_WRITTEN)), range(amount)))
+                started.wait()
+
+        threads = [threading.Thread(target=run, args=(f"Tool {amount}", amount)) for amount in (2, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        runs = {run.tool: run for run in load_history(self.history_path)}
+        self.assertEqual((2, 2), (runs["Tool 2"].counters[NOTES_SCANNED], runs["Tool 2"].counters[ROWS_WRITTEN]))
+        self.assertEqual((5, 5), (runs["Tool 5"].counters[NOTES_SCANNED], runs["Tool 5"].counters[ROWS_WRITTEN]))
+
+    def test_unreadable_lines_are_skipped(self):
+        with record_run("NotePruner"):
+            pass
+        with open(self.history_path, 'a') as f:
+            f.write('{"tool": "NotePr')
+        self.assertEqual([run.tool for run in load_history(self.history_path)], ["NotePruner"])
+
+    def test_labels_and_filenames_are_escaped(self):
+        run = RunRecord(tool='Plan "Apply"', started=datetime(2024, 1, 1))
+        self.assertIn('{tool="Plan \\"Apply\\""}', format_textfile(run))
+        self.assertEqual(os.path.basename(textfile_path_of("PlanApply apply", self.textfile_dir)),
+                         "planapply_apply.prom")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from datetime import datetime
+from utilities.shared_types import *
+
+
+class TestEntry(unittest.TestCase):
+    def setUp(self):
+        self.note = Entry(title="2021-01-02 legs",
+                          text="Squat 90kg: 8,8,8\nEst 50 mins",
+                          edit_timestamp=datetime(2021, 1, 2, 20, 15),
+                          path="/vault/workouts/2021-01-02 legs.md")
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.note, '__dict__'))
+
+    def test_fields_round_trip(self):
+        self.assertEqual(self.note.title, "2021-01-02 legs")
+        self.assertEqual(self.note.path, "/vault/workouts/2021-01-02 legs.md")
+        self.assertEqual(self.note.edit_timestamp, datetime(2021, 1, 2, 20, 15))
+        self.assertEqual(self.note.floored_datetime, datetime(2021, 1, 2))
+
+    def test_title_independent_of_filename(self):
+        note = Entry(title="Bodyweights note", text="70.5, ?", path="/vault/bodyweights.md")
+        self.assertEqual(note.title, "Bodyweights note")
+        self.assertIsNone(note.floored_datetime)
+
+    def test_moving_note_keeps_title(self):
+        self.note.path = "/vault/archive/2021-01-02 legs (1).md"
+        self.assertEqual(self.note.title, "2021-01-02 legs")
+
+    def test_entry_without_path(self):
+        note = Entry(title="2021-01-02 legs", text="Est 50 mins")
+        self.assertIsNone(note.path)
+        self.assertEqual(note.title, "2021-01-02 legs")
+
+    def test_directories_are_shared(self):
+        other = Entry(title="2021-01-03 push", text="", path="/vault/workouts/2021-01-03 push.md")
+        self.assertIs(self.note._directory, other._directory)
+
+    def test_equality(self):
+        same = Entry(title="2021-01-02 legs",
+                     text="Squat 90kg: 8,8,8\nEst 50 mins",
+                     edit_timestamp=datetime(2021, 1, 2, 20, 15),
+                     path="/vault/workouts/2021-01-02 legs.md")
+        self.assertEqual(self.note, same)
+        same.text = "changed"
+        self.assertNotEqual(self.note, same)
+
+
+if __name__ == '__main__':
+    unittest.main()
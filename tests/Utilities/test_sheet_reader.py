@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from openpyxl import Workbook
+import openpyxl
+import utilities.params as p
+import utilities.utility_functions as uf
+from utilities.sheet_reader import *
+from utilities.target_router import TargetWorkbooks, partition_of
+
+
+class TestStreamingSheetReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Workouts.xlsx")
+        self.today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "Log"
+        wb.create_sheet("Other").cell(row=1, column=1).value = "Not this one"
+        sheet.cell(row=1, column=2).value = "Date"
+        for row, days_ago in enumerate(range(10, -3, -1), start=2):
+            sheet.cell(row=row, column=2).value = self.today - timedelta(days=days_ago)
+            if days_ago > 4:
+                sheet.cell(row=row, column=3).value = 70.5 if row % 2 else 71
+        sheet.cell(row=3, column=5).value = "Squat 90kg: 8. Est 50 mins"
+        sheet.cell(row=4, column=5).value = "=C3+1"
+        sheet.cell(row=5, column=5).value = True
+        sheet.cell(row=6, column=5).value = "Squat 90kg: 8. Est 50 mins"
+        # a date written as text, and a row left empty
+        sheet.cell(row=20, column=2).value = "14 March 2021"
+        wb.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_values_as_openpyxl(self):
+        expected = OpenpyxlSheetReader(openpyxl.load_workbook(self.path)["Log"])
+        streamed = StreamingSheetReader(self.path, "Log")
+        columns = [5, 2, 3, 4]
+        self.assertEqual(list(expected.iter_columns(columns)), list(streamed.iter_columns(columns)))
+        self.assertEqual(list(expected.iter_columns([2], min_row=10)), list(streamed.iter_columns([2], min_row=10)))
+        self.assertEqual(expected.value(4, 5), streamed.value(4, 5))
+
+    def test_missing_sheet(self):
+        with self.assertRaises(ValueError):
+            StreamingSheetReader(self.path, "Missing")
+
+    def test_columns_are_parsed_once(self):
+        reader = StreamingSheetReader(self.path, "Log", columns=[2, 5])
+        # loading the date cache hashes the sheet, so load it first
+        reader.date_cache
+        with mock.patch("zipfile.ZipFile", side_effect=AssertionError("parsed again")):
+            self.assertEqual(7, uf.find_row_of_cell_matching_datetime(reader, self.today - timedelta(days=5), 2))
+            self.assertEqual(True, reader.value(5, 5))
+
+    def test_first_absent_bodyweight_row(self):
+        sheet = openpyxl.load_workbook(self.path)["Log"]
+        self.assertEqual(8, uf.return_first_absent_bodyweight_row(sheet, 2, 3))
+        self.assertEqual(8, uf.return_first_absent_bodyweight_row(StreamingSheetReader(self.path, "Log"), 2, 3))
+
+    def test_target_workbooks_stream_unloaded_partitions(self):
+        with mock.patch.multiple(p, TARGET_PATH=self.path, TARGET_SHEET="Log", SHEET_READER="streaming"), \
+                mock.patch("openpyxl.load_workbook", side_effect=AssertionError("loaded")):
+            reader = TargetWorkbooks().reader(partition_of(self.today))
+            self.assertEqual("Squat 90kg: 8. Est 50 mins", reader.value(6, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
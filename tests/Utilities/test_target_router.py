@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from openpyxl import Workbook
+import utilities.params as p
+from utilities.file_lock import FileLock
+from utilities.target_router import *
+
+
+class TestTargetWorkbooks(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        for year in (2020, 2021, 2022):
+            wb = Workbook()
+            wb.active.title = "Log"
+            wb.active.cell(row=2, column=2).value = datetime(year, 1, 1)
+            wb.save(os.path.join(self.root, f"Workouts {year}.xlsx"))
+
+        self.params = mock.patch.multiple(p, TARGET_PATH=os.path.join(self.root, "Workouts {year}.xlsx"),
+                                          TARGET_SHEET="Log", LOCAL_EXCEL_BACKUP_DIR=os.path.join(self.root, "bk"),
+                                          CACHE_PARSED_DATES=False)
+        self.params.start()
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def test_partition_of(self):
+        self.assertTrue(is_partitioned())
+        partition = partition_of(datetime(2021, 6, 1))
+        self.assertEqual(partition, Partition(os.path.join(self.root, "Workouts 2021.xlsx"), "Log", 2021))
+
+    def test_unpartitioned_target_is_a_single_partition(self):
+        with mock.patch.multiple(p, TARGET_PATH=os.path.join(self.root, "Workouts 2021.xlsx")):
+            self.assertFalse(is_partitioned())
+            self.assertEqual(partition_of(datetime(2021, 6, 1)), partition_of(datetime(2022, 6, 1)))
+            self.assertEqual(len(TargetWorkbooks().existing_partitions()), 1)
+
+    def test_workbooks_with_different_settings(self):
+        # a workbooks object keeps the settings it was given, whatever params.py says later
+        single = TargetWorkbooks(Config.from_params(target_path=os.path.join(self.root, "Workouts 2021.xlsx")))
+        partitioned = TargetWorkbooks()
+        with mock.patch.multiple(p, TARGET_SHEET="Other"):
+            self.assertEqual(len(single.existing_partitions()), 1)
+            self.assertEqual(single.partition_of(datetime(2022, 6, 1)).path,
+                             os.path.join(self.root, "Workouts 2021.xlsx"))
+            self.assertEqual([part.year for part in partitioned.existing_partitions()], [2020, 2021, 2022])
+
+    def test_partitions_between(self):
+        workbooks = TargetWorkbooks()
+        self.assertEqual([part.year for part in workbooks.existing_partitions()], [2020, 2021, 2022])
+        self.assertEqual([part.year for part in workbooks.partitions_between(None, datetime(2021, 3, 1))],
+                         [2020, 2021])
+        self.assertEqual([part.year for part in workbooks.partitions_between(datetime(2021, 3, 1),
+                                                                             datetime(2030, 1, 1))], [2021, 2022])
+        self.assertEqual(workbooks.previous_partition(partition_of(datetime(2020, 1, 1))), None)
+
+    def test_sheet_partitions(self):
+        wb = Workbook()
+        for year in (2020, 2021):
+            wb.create_sheet(f"Log {year}")
+        wb.save(os.path.join(self.root, "Workouts.xlsx"))
+        with mock.patch.multiple(p, TARGET_PATH=os.path.join(self.root, "Workouts.xlsx"), TARGET_SHEET="Log {year}"):
+            workbooks = TargetWorkbooks()
+            self.assertEqual([part.sheet_name for part in workbooks.existing_partitions()], ["Log 2020", "Log 2021"])
+            self.assertFalse(workbooks.exists(partition_of(datetime(2022, 1, 1))))
+
+    def test_group_by_partition(self):
+        dates = [datetime(2022, 1, 1), datetime(2020, 5, 1), datetime(2020, 1, 1)]
+        grouped = TargetWorkbooks().group_by_partition(dates, lambda date: date)
+        self.assertEqual([(part.year, items) for part, items in grouped.items()],
+                         [(2020, [datetime(2020, 1, 1), datetime(2020, 5, 1)]), (2022, [datetime(2022, 1, 1)])])
+
+    def test_saves_only_modified_partitions(self):
+        workbooks = TargetWorkbooks()
+        modified, untouched = partition_of(datetime(2021, 1, 1)), partition_of(datetime(2022, 1, 1))
+        untouched_mtime = os.path.getmtime(untouched.path)
+        workbooks.sheet(untouched)
+        workbooks.sheet(modified).cell(row=2, column=5).value = "Squat 90kg: 8"
+        workbooks.mark_modified(modified)
+        workbooks.save(backup=True)
+
+        self.assertEqual(os.path.getmtime(untouched.path), untouched_mtime)
+        self.assertEqual(len(os.listdir(os.path.join(self.root, "bk"))), 1)
+        self.assertEqual(TargetWorkbooks().sheet(modified).cell(row=2, column=5).value, "Squat 90kg: 8")
+
+    def test_reloads_workbooks_changed_elsewhere(self):
+        workbooks = TargetWorkbooks()
+        partition = partition_of(datetime(2021, 1, 1))
+        self.assertIsNone(workbooks.sheet(partition).cell(row=2, column=5).value)
+
+        other = TargetWorkbooks()
+        other.sheet(partition).cell(row=2, column=5).value = "Bench 80kg: 8"
+        other.mark_modified(partition)
+        other.save(backup=False)
+        os.utime(partition.path, (0, 0))
+
+        self.assertEqual(workbooks.sheet(partition).cell(row=2, column=5).value, "Bench 80kg: 8")
+
+    def test_change_within_the_same_modification_time_is_noticed(self):
+        workbooks = TargetWorkbooks()
+        partition = partition_of(datetime(2021, 1, 1))
+        workbooks.write_cell(partition, 2, 3, 70.5)
+        loaded_mtime_ns = os.stat(partition.path).st_mtime_ns
+
+        other = TargetWorkbooks()
+        other.write_cell(partition, 2, 5, "Bench 80kg: 8")
+        other.save(backup=False)
+        os.utime(partition.path, ns=(loaded_mtime_ns, loaded_mtime_ns))
+        workbooks.save(backup=False)
+
+        sheet = TargetWorkbooks().sheet(partition)
+        self.assertEqual("Bench 80kg: 8", sheet.cell(row=2, column=5).value)
+        self.assertEqual(70.5, sheet.cell(row=2, column=3).value)
+
+    def test_concurrent_writes_are_merged(self):
+        partition = partition_of(datetime(2021, 1, 1))
+        first, second = TargetWorkbooks(), TargetWorkbooks()
+        first.write_cell(partition, 2, 5, "Squat 90kg: 8")
+        second.write_cell(partition, 2, 3, 70.5)
+        first.save(backup=False)
+        os.utime(partition.path, (0, 0))
+        second.save(backup=False)
+
+        sheet = TargetWorkbooks().sheet(partition)
+        self.assertEqual("Squat 90kg: 8", sheet.cell(row=2, column=5).value)
+        self.assertEqual(70.5, sheet.cell(row=2, column=3).value)
+
+    def test_concurrent_writes_to_the_same_cell_are_refused(self):
+        partition = partition_of(datetime(2021, 1, 1))
+        first, second = TargetWorkbooks(), TargetWorkbooks()
+        first.write_cell(partition, 2, 5, "Squat 90kg: 8")
+        second.write_cell(partition, 2, 5, "Squat 95kg: 8")
+        first.save(backup=False)
+        os.utime(partition.path, (0, 0))
+        with self.assertRaises(RuntimeError):
+            second.save(backup=False)
+        self.assertEqual("Squat 90kg: 8", TargetWorkbooks().sheet(partition).cell(row=2, column=5).value)
+
+    def test_write_planned_from_an_outdated_read_is_refused(self):
+        partition = partition_of(datetime(2021, 1, 1))
+        for row, sheet_reader in enumerate(("openpyxl", "streaming"), start=2):
+            with self.subTest(sheet_reader=sheet_reader):
+                workbooks = TargetWorkbooks(Config.from_params(sheet_reader=sheet_reader))
+                self.assertIsNone(workbooks.reader(partition).value(row, 5))
+
+                other = TargetWorkbooks()
+                other.write_cell(partition, row, 5, "Bench 80kg: 8")
+                other.write_cell(partition, row, 3, 70.5)
+                other.save(backup=False)
+                os.utime(partition.path, (0, 0))
+
+                with self.assertRaises(RuntimeError):
+                    workbooks.write_cell(partition, row, 5, "Squat 90kg: 8")
+                # cells the other program didn't write to are written, and its changes kept
+                workbooks.write_cell(partition, row, 4, "Squat 90kg: 8")
+                workbooks.save(backup=False)
+                sheet = TargetWorkbooks().sheet(partition)
+                self.assertEqual("Bench 80kg: 8", sheet.cell(row=row, column=5).value)
+                self.assertEqual(70.5, sheet.cell(row=row, column=3).value)
+                self.assertEqual("Squat 90kg: 8", sheet.cell(row=row, column=4).value)
+
+    def test_waits_for_lock(self):
+        partition = partition_of(datetime(2021, 1, 1))
+        workbooks = TargetWorkbooks(Config.from_params(file_lock_timeout_seconds=0))
+        workbooks.write_cell(partition, 2, 5, "Squat 90kg: 8")
+        with FileLock(partition.path):
+            with self.assertRaises(TimeoutError):
+                workbooks.save(backup=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
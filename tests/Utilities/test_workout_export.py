@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from openpyxl import Workbook
+import utilities.params as p
+import utilities.workout_export as we
+from utilities.workout_export import *
+
+
+class TestDecomposeWorkout(unittest.TestCase):
+    def test_sets_with_load_changes(self):
+        rows = decompose_workout(datetime(2021, 1, 1),
+                                 "Bench press 75kg: 8,8,7; Assisted pull up -9kg: 7,5, -18kg: 7,?. Est 50 mins")
+        self.assertEqual(7, len(rows))
+        self.assertEqual([("Bench press", 1, 75.0, "kg", 8), ("Bench press", 3, 75.0, "kg", 7)],
+                         [(r.exercise, r.set_number, r.load, r.unit, r.reps) for r in (rows[0], rows[2])])
+        pull_ups = [(r.set_number, r.load, r.reps, r.detail) for r in rows if r.exercise == "Assisted pull up"]
+        self.assertEqual([(1, -9.0, 7, ""), (2, -9.0, 5, ""), (3, -18.0, 7, ""), (4, -18.0, None, "?")], pull_ups)
+
+    def test_colons_within_parentheses(self):
+        rows = decompose_workout(datetime(2021, 1, 1), "Rack pull 110kg (with hold 2:5): 5,5. Est 20 mins")
+        self.assertEqual(["Rack pull (with hold 2:5)"] * 2, [r.exercise for r in rows])
+        self.assertEqual([110.0, 110.0], [r.load for r in rows])
+
+    def test_exercises_without_sets(self):
+        rows = decompose_workout(datetime(2021, 1, 1), "Squat 100: 5, 110: 3; RC rotations; Dead hang. Est 9 mins")
+        self.assertEqual([100.0, 110.0], [r.load for r in rows if r.exercise == "Squat"])
+        self.assertEqual(["RC rotations", "Dead hang"], [r.exercise for r in rows if r.set_number is None])
+
+    def test_detail(self):
+        rows = decompose_workout(datetime(2021, 1, 1), "Cardio (target heart rate 120-130): 45 mins. Est 45 mins")
+        self.assertEqual(1, len(rows))
+        self.assertEqual((None, "45 mins"), (rows[0].reps, rows[0].detail))
+
+    def test_circuit_is_a_row_per_set(self):
+        rows = decompose_workout(datetime(2021, 1, 1), "3X25 jabs. Est 5 mins")
+        self.assertEqual([(1, 25), (2, 25), (3, 25)], [(r.set_number, r.reps) for r in rows])
+
+
+class TestExportWorkouts(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.export_dir = self.tmp_dir.name
+        self.workouts = {datetime(2021, 1, 31): "Squat 90kg: 8,8. Est 10 mins",
+                         datetime(2021, 2, 1): "Bench press 60kg: 5; Dead hang. Est 10 mins"}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_partitioned_by_month(self):
+        self.assertEqual(4, export_workouts(self.workouts, self.export_dir))
+        self.assertEqual(["month=2021-01", "month=2021-02"], sorted(os.listdir(self.export_dir)))
+
+    def test_export_is_idempotent(self):
+        export_workouts(self.workouts, self.export_dir)
+        export_workouts(self.workouts, self.export_dir)
+        self.assertEqual(4, len(list(read_exported_sets(self.export_dir))))
+
+    def test_reexported_date_replaces_stored_rows(self):
+        export_workouts(self.workouts, self.export_dir)
+        export_workouts({datetime(2021, 1, 31): "Squat 95kg: 8. Est 5 mins"}, self.export_dir)
+        squats = list(read_exported_sets(self.export_dir, exercise="squat"))
+        self.assertEqual([(95.0, 8)], [(r.load, r.reps) for r in squats])
+
+    def test_read_range(self):
+        export_workouts(self.workouts, self.export_dir)
+        rows = list(read_exported_sets(self.export_dir, start_date=datetime(2021, 2, 1, 15),
+                                       end_date=datetime(2021, 2, 1)))
+        self.assertEqual(["Bench press", "Dead hang"], [r.exercise for r in rows])
+        self.assertEqual(datetime(2021, 2, 1), rows[0].date)
+
+    def test_parquet_requires_pyarrow(self):
+        with mock.patch.object(we, "pyarrow", None):
+            with self.assertRaises(ImportError):
+                export_workouts(self.workouts, self.export_dir, export_format="parquet")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            validate_export_format("xlsx")
+
+    def test_failed_export_of_written_workouts_is_reported(self):
+        config = Config.from_params(workout_export_dir=self.export_dir, workout_export_format="parquet")
+        with mock.patch.object(we, "pyarrow", None), mock.patch("builtins.print") as mock_print:
+            export_written_workouts(self.workouts, config)
+        self.assertIn("Failed to export", mock_print.call_args.args[0])
+
+
+class TestExportTarget(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.target_path = os.path.join(self.tmp_dir.name, "workouts.xlsx")
+        wb = Workbook()
+        wb.active.title = "Log"
+        wb.active.cell(row=1, column=p.DATE_COLUMN).value = "Date"
+        for row, (day, workout) in enumerate([(1, "Squat 90kg: 8,8. Est 10 mins"), (2, None), (3, " ")], start=2):
+            wb.active.cell(row=row, column=p.DATE_COLUMN).value = datetime(2021, 1, day)
+            wb.active.cell(row=row, column=p.WORKOUT_COLUMN).value = workout
+        wb.save(self.target_path)
+        self.config = Config.from_params(target_path=self.target_path, target_sheet="Log", cache_parsed_dates=False,
+                                         workout_export_dir=os.path.join(self.tmp_dir.name, "export"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_exports_every_written_workout(self):
+        main(self.config)
+        rows = list(read_exported_sets(self.config.workout_export_dir))
+        self.assertEqual([(datetime(2021, 1, 1), "Squat", 1), (datetime(2021, 1, 1), "Squat", 2)],
+                         [(r.date, r.exercise, r.set_number) for r in rows])
+
+    def test_disabled_export_does_nothing(self):
+        main(self.config.replace(workout_export_dir=""))
+        self.assertEqual(["workouts.xlsx"], os.listdir(self.tmp_dir.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
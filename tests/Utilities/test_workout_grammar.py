@@ -0,0 +1,76 @@
+import unittest
+from utilities.workout_grammar import *
+
+
+class TestParseExercise(unittest.TestCase):
+    def test_loads_and_reps(self):
+        exercise = parse_exercise("Assisted pull up -9kg: 7,5, -18kg: 7,5")
+        self.assertEqual("Assisted pull up", exercise.name)
+        self.assertEqual([Load(-9.0, "kg"), Load(-18.0, "kg")], exercise.loads)
+        self.assertEqual([[7, 5], [7, 5]], [[s.reps for s in group.sets] for group in exercise.groups])
+
+    def test_units(self):
+        self.assertEqual([Load(24.0, "ea")], parse_exercise("Db incline 24ea: 8,9,9").loads)
+        self.assertEqual([Load(40.0, "lb"), Load(32.0, "lb")], parse_exercise("Bayesian curl 40lb: 10, 32lb: 7").loads)
+        self.assertEqual([Load(100.0), Load(110.0)], parse_exercise("Squat 100: 5, 110: 3").loads)
+
+    def test_parentheses_are_part_of_the_name(self):
+        exercise = parse_exercise("Rack pull 110kg (with hold 2:5): 5,5,5")
+        self.assertEqual("Rack pull (with hold 2:5)", exercise.name)
+        self.assertEqual([Load(110.0, "kg")], exercise.loads)
+        self.assertEqual(3, len(list(exercise.sets())))
+
+    def test_qualified_load(self):
+        exercise = parse_exercise("Machine crunch 36kg with reset: 12, without reset 36kg: 8")
+        self.assertEqual("Machine crunch with reset", exercise.name)
+        self.assertEqual(["", "without reset"], [group.qualifier for group in exercise.groups])
+
+    def test_missing_comma_before_load(self):
+        exercise = parse_exercise("Chest supported row 45kg: 15,15 43kg: 14")
+        self.assertEqual([[15, 15], [14]], [[s.reps for s in group.sets] for group in exercise.groups])
+
+    def test_sets_which_arent_reps(self):
+        exercise = parse_exercise("Cardio (target heart rate 120-130): 45 mins")
+        self.assertEqual([ExerciseSet(reps=None, text="45 mins")], exercise.groups[0].sets)
+        self.assertEqual([ExerciseSet(reps=8, text="8"), ExerciseSet(reps=None, text="?")],
+                         [s for _, s in parse_exercise("Ohp 40kg: 8,?").sets()])
+
+    def test_circuit(self):
+        exercise = parse_exercise("3X25 jabs")
+        self.assertEqual("jabs", exercise.name)
+        self.assertEqual([ExerciseSet(reps=25, text="3X25", count=3)], [s for _, s in exercise.sets()])
+
+    def test_exercise_without_sets(self):
+        exercise = parse_exercise("RC external rotations, 2 sets")
+        self.assertEqual("RC external rotations, 2 sets", exercise.name)
+        self.assertEqual([], exercise.groups)
+
+    def test_text_is_reproduced_exactly(self):
+        for line in ["Leg raise: 10,10, 5kg: 10", "(Kinda low) Hanging circular leg raise (no reset): 9,6",
+                     "Unbalanced (( parentheses: 3", "Neck forwards curl, 15kg on forehead: 15,15", ""]:
+            self.assertEqual(line, parse_exercise(line).text)
+
+
+class TestStructuredWorkout(unittest.TestCase):
+    def test_estimated_duration(self):
+        self.assertEqual(65, parse_estimated_duration("Est 65 mins").minutes)
+        self.assertIsNone(parse_estimated_duration("Est ?? mins").minutes)
+
+    def test_workout_without_exercises(self):
+        with self.assertRaises(ValueError):
+            parse_workout_lines(["Est 5 mins"])
+
+    def test_render_round_trip(self):
+        data = "Squat 90kg: 8,8,8; Leg raise: 10,10, 5kg: 10; Dead hang 1. Est ?? mins"
+        workout = parse_workout_data(data)
+        self.assertEqual(3, len(workout.exercises))
+        self.assertEqual(data, workout.render())
+
+    def test_parse_lines(self):
+        workout = parse_workout_lines(["Squat 90kg: 8,8", "Dead hang", "Est 50 mins"])
+        self.assertEqual("Squat 90kg: 8,8; Dead hang. Est 50 mins", workout.render())
+        self.assertEqual(50, workout.estimated_duration.minutes)
+
+
+if __name__ == '__main__':
+    unittest.main()
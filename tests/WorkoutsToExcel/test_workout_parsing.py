@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from openpyxl import Workbook
+import utilities.params as p
+from utilities.shared_types import Entry
+from utilities.workout_grammar import parse_workout_data
+from WorkoutsToExcel.workout_parsing import *
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_fixture(name: str) -> ParsedWorkout:
+    # the first line of each fixture is its date, which is the title of a note
+    with open(os.path.join(FIXTURES_DIR, name), 'r') as f:
+        text = f.read()
+    note = Entry(text=text.split('\n', 1)[1], title="2021-11-22 workout")
+    return parse_workout_notes([note])[0]
+
+
+class TestParseWorkoutNotes(unittest.TestCase):
+    def test_flattened_workouts(self):
+        self.assertEqual(''.join(['Squat 90kg: 8,8,8; Deadlift 90kg: 7,7; ',
+                                  'Barbell momentum shrug and hold (3s top, 5s bottom) 130kg: 5,5; ',
+                                  'Pendlay row 70kg: 8,8,8; Calf press machine 79kg: 16,17; ',
+                                  'Leg raise: 10,10, 5kg: 10; ',
+                                  'Machine crunch 30kg: 10,20; Bayesian curl 40lb: 10, 32lb: 7, 22lb: 12; ',
+                                  'Back supported Tricep pushdown 23kg: 15,18; Machine lateral raise 45kg: 17,17; ',
+                                  'Dead hang 1. Est ?? mins']),
+                         parse_fixture("single_workout2").data)
+        self.assertEqual(''.join(['Shadowboxing; Front delts; Straight arm pulldowns; Side delts; Band dislocates; ',
+                                  '3X25 jabs; 3X25 hooks; 3X25 uppercuts; 2X25 foot jab; 2X25 hook kicks. ',
+                                  'Est 27 mins']),
+                         parse_fixture("single_shadowboxing1").data)
+
+    def test_structure(self):
+        workout = parse_fixture("single_workout1")
+        self.assertEqual(workout.data, workout.structure.render())
+        self.assertEqual(65, workout.structure.estimated_duration.minutes)
+        pull_up = workout.structure.exercises[3]
+        self.assertEqual("Assisted pull up", pull_up.name)
+        self.assertEqual([-9.0, -18.0], [load.value for load in pull_up.loads])
+
+    def test_rendering_matches_every_fixture(self):
+        for name in ["single_workout1", "single_workout2", "single_workout3", "single_cardio1",
+                     "single_shadowboxing1", "noisy_data_single_workout1"]:
+            workout = parse_fixture(name)
+            self.assertEqual(workout.data, parse_workout_data(workout.data).render(), name)
+
+
+class TestPairWorkoutsWithPartitions(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        target_path = os.path.join(self.tmp_dir.name, "workouts.xlsx")
+        wb = Workbook()
+        wb.active.title = "Log"
+        for row, day in enumerate((1, 2), start=2):
+            wb.active.cell(row=row, column=p.DATE_COLUMN).value = datetime(2021, 1, day)
+        wb.active.cell(row=2, column=p.WORKOUT_COLUMN).value = "Squat 85kg: 8. Est 50 mins"
+        wb.save(target_path)
+        self.params = mock.patch.multiple(p, TARGET_PATH=target_path, TARGET_SHEET="Log", CACHE_PARSED_DATES=False)
+        self.params.start()
+        self.workouts = [ParsedWorkout(title_datetime=datetime(2021, 1, 1), data="Squat 90kg: 8. Est 50 mins"),
+                         ParsedWorkout(title_datetime=datetime(2021, 1, 2), data="Bench 80kg: 8. Est 40 mins")]
+
+    def tearDown(self):
+        self.params.stop()
+        self.tmp_dir.cleanup()
+
+    def test_overwrites_are_refused_without_asking_by_default(self):
+        with mock.patch("builtins.input", side_effect=AssertionError("asked")):
+            pairing = pair_workouts_with_partitions(TargetWorkbooks(), self.workouts)
+        self.assertEqual({}, pairing.to_write)
+        self.assertIn("not confirmed", pairing.reason)
+
+    def test_confirmed_overwrites_are_paired(self):
+        confirm = mock.Mock(return_value=True)
+        pairing = pair_workouts_with_partitions(TargetWorkbooks(), self.workouts, confirm=confirm)
+        self.assertEqual([(self.workouts[0], "Squat 85kg: 8. Est 50 mins")], confirm.call_args.args[0])
+        [rows] = pairing.to_write.values()
+        self.assertEqual({2: self.workouts[0], 3: self.workouts[1]}, rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
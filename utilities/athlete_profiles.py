@@ -0,0 +1,75 @@
+# athlete profiles let one installation serve several athletes, each with their own notes and target file. The profiles
+# are listed in a JSON file (see ATHLETE_PROFILES_PATH in params.py), e.g.
+#     [{"name": "alice", "LOCAL_NOTES_SOURCE_DIR": "/notes/alice", "TARGET_PATH": "/sheets/alice.xlsx", ...},
+#      {"name": "bob", ...}]
+# Each profile overrides any of the settings in params.py, by name. Settings a profile doesn't list are as in params.py.
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import utilities.params as p
+from utilities.config import Config
+
+# the settings which no two athletes can share, as the files they point to would be mixed up or overwritten. Empty
+# settings (i.e. disabled features) may be shared
+PER_ATHLETE_PARAMS = ("LOCAL_NOTES_SOURCE_DIR", "TARGET_PATH", "LOCAL_NOTES_ARCHIVE_DIR", "LOCAL_EXCEL_BACKUP_DIR",
+                      "BODYWEIGHT_SERIES_PATH", "WORKOUT_EXPORT_DIR")
+
+
+@dataclass
+class AthleteProfile:
+    name: str
+    # setting name -> value, overriding params.py
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    def param(self, name: str) -> Any:
+        return self.params.get(name, getattr(p, name))
+
+    def config(self) -> Config:
+        # return the settings for processing this athlete: params.py's, overridden by this profile's
+        return Config.from_params(**{name.lower(): value for name, value in self.params.items()
+                                     if Config.has_setting(name)})
+
+    def apply_to_params(self) -> None:
+        # overwrite the settings in params.py with this profile's. Only do this in a process of the profile's own
+        for name, value in self.params.items():
+            setattr(p, name, value)
+
+
+def _is_param_name(name: str) -> bool:
+    return name.isupper() and hasattr(p, name)
+
+
+def load_profiles(path: str) -> List[AthleteProfile]:
+    """
+    Load the athlete profiles listed in the JSON file at the given path. Raise ValueError if a profile has no name or a
+    duplicated name, names a setting which params.py doesn't have, or shares a per-athlete setting with another profile.
+    :param path: the path of the profiles file
+    :return: the profiles, in the order listed
+    """
+    with open(path) as f:
+        listed = json.load(f)
+    if not isinstance(listed, list):
+        raise ValueError(f"The athlete profiles file `{path}` should hold a list of profiles")
+
+    profiles = []
+    for idx, entry in enumerate(listed):
+        entry = dict(entry)
+        name = entry.pop("name", None)
+        if not name:
+            raise ValueError(f"Athlete profile {idx + 1} in `{path}` has no name")
+        if unknown := [key for key in entry if not _is_param_name(key)]:
+            raise ValueError(f"Athlete profile `{name}` names settings which params.py doesn't have: {unknown}")
+        profiles.append(AthleteProfile(name=str(name), params=entry))
+
+    names = [profile.name for profile in profiles]
+    if duplicated := sorted({name for name in names if names.count(name) > 1}):
+        raise ValueError(f"These athlete profile names are used more than once: {duplicated}")
+    for param in PER_ATHLETE_PARAMS:
+        profiles_by_value: Dict[Any, List[str]] = {}
+        for profile in profiles:
+            if value := profile.param(param):
+                profiles_by_value.setdefault(value, []).append(profile.name)
+        if shared := {value: sharing for value, sharing in profiles_by_value.items() if len(sharing) > 1}:
+            raise ValueError(f"Each athlete needs their own {param}, but these profiles share one: {shared}")
+    return profiles
@@ -0,0 +1,105 @@
+# functions which use nothing else from utilities, so that any module can import them without an import cycle. They
+# can still be used through utility_functions.py, where they used to live.
+import os
+import shutil
+from datetime import datetime
+from typing import Tuple
+
+
+def backup_file_to_dir(source_file_path: str,
+                       backup_directory: str,
+                       basename_override: str = "",
+                       keep_date_info=True) -> None:
+    """
+    This function backs up a file to a specified directory. If the directory does not exist, it creates it. The
+    default format of the new basename is "backup_YYYY_MM_DD_source_file_name". However, this can be overridden by
+    passing in the correct parameters.
+
+    :param source_file_path: The full path to the file to be backed up.
+    :param backup_directory: The directory to back the file up to. The path must be a full path.
+    :param basename_override: An optional string to override the basename of the backup file. Unless keep_date_info is
+    set to True, then this string will be the full basename.
+    :param keep_date_info: A boolean indicating whether to include the current date in the backup file's name.
+
+    :return: None.
+    """
+    os.makedirs(backup_directory, exist_ok=True)
+
+    basename_parts = []
+    if not basename_override:
+        basename_parts.append('backup')
+    else:
+        basename_parts.append(basename_override)
+
+    if keep_date_info:
+        now = datetime.now()
+        ymd = '_'.join(str(v) for v in [now.year, now.month, now.day])
+        basename_parts.append(ymd)
+
+    if not basename_override:
+        basename_parts.append(os.path.basename(source_file_path))
+
+    extension = os.path.splitext(source_file_path)[1]
+    full_backup_path = os.path.join(backup_directory, "_".join(basename_parts)) + extension
+    shutil.copy(source_file_path, full_backup_path)
+
+
+def convert_string_to_datetime(date_str: str, regress_future_dates=True) -> datetime:
+    """
+    Return the input string's datetime equivalent. Raise on failure to convert.
+    :param date_str: the string to convert
+    :param regress_future_dates: if true, then subtract one year from the date to be returned, if that date is in the
+    future as of the time of execution.
+    :return: a datetime object
+    """
+    if isinstance(date_str, datetime):
+        return date_str
+
+    assert isinstance(date_str, str), f"Invalid parameter type received {type(date_str)}. Expected string"
+    for char in ['\n', ';', ' ', '.', '-', '_', '/']:
+        date_str = date_str.replace(char, '')
+
+    # try to match the date string to a datetime object, with and without year
+    for year_format in ['%Y%m%d', '%d%B%Y', '%d%b%Y', '%B%d%Y', '%b%d%Y', '%d%B', '%d%b', '%B%d', '%b%d']:
+        try:
+            datetime_obj = datetime.strptime(date_str, year_format)
+        except ValueError:
+            continue
+
+        now = datetime.now()
+        if datetime_obj.year < 2000:
+            # year was not specified in the date string. Assume it's the current year.
+            datetime_obj = datetime_obj.replace(year=now.year)
+
+        if now < datetime_obj and regress_future_dates:
+            # datetime is in the future, but future date is not wanted. Return previous year.
+            return datetime_obj.replace(year=now.year - 1)
+        return datetime_obj
+
+    # matching to datetime failed, both with and without year
+    raise ValueError(f"Failed to convert this value to datetime: '{date_str}'")
+
+
+def convert_cell_value_to_floored_datetime(value) -> datetime | None:
+    """
+    Return the date held in a date column cell, without time component, or None if the cell holds no date.
+    Note that in xlsx files: headers and strings are str, dates are datetime objects, empty cells are NoneType.
+    :param value: the cell's value
+    :return: a datetime object, or None
+    """
+    if isinstance(value, datetime):
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if isinstance(value, str):
+        try:
+            return convert_string_to_datetime(value, regress_future_dates=False).replace(hour=0, minute=0, second=0,
+                                                                                          microsecond=0)
+        except ValueError:
+            return None
+    return None
+
+
+def file_version(path: str) -> Tuple[int, int]:
+    # return the file's modification time in nanoseconds, and its size. Unlike a float modification time, this is
+    # compared exactly, and a rewrite within the timestamp's resolution is still noticed if it changed the size
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
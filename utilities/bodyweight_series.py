@@ -0,0 +1,191 @@
+# A compact, columnar copy of the bodyweights written to the target file, kept alongside it so that trends can be
+# computed without loading the workbook.
+import math
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+import utilities.date_cache as dc
+
+# the file starts with this marker, followed by the first date's ordinal, followed by one double per day
+_FILE_MAGIC = b'BWS1'
+_HEADER = struct.Struct('<4sq')
+
+
+@dataclass
+class WeeklySummary:
+    # week_start is the Monday of the week. Statistics exclude missing ("?") bodyweights, and are NaN if the whole
+    # week is missing
+    week_start: datetime
+    count: int
+    mean: float
+    minimum: float
+    maximum: float
+
+
+class BodyweightSeries:
+    # One value per calendar day, starting at start_date. Missing bodyweights, whether unknown ("?") or not yet
+    # recorded, are NaN.
+    def __init__(self, start_date: datetime | None = None, values: array | None = None):
+        self._start_ordinal: int | None = start_date.toordinal() if start_date else None
+        self.values: array = values if values is not None else array('d')
+
+    @classmethod
+    def load(cls, path: str) -> 'BodyweightSeries':
+        """
+        Read a series from the given file.
+        :param path: the full path of the series file
+        :return: the series stored in that file
+        """
+        with open(path, 'rb') as f:
+            magic, start_ordinal = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _FILE_MAGIC:
+                raise ValueError(f"File is not a bodyweight series file: `{path}`")
+            values = array('d')
+            values.frombytes(f.read())
+
+        if sys.byteorder != 'little':
+            values.byteswap()
+        series = cls(values=values)
+        series._start_ordinal = start_ordinal
+        return series
+
+    def save(self, path: str) -> None:
+        """
+        Write the series to the given file. The file is replaced atomically, so that readers never see a partial write.
+        """
+        values = array('d', self.values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_FILE_MAGIC, self._start_ordinal or 0))
+            values.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_sheet(cls, sheet, date_column: int, bodyweight_column: int) -> 'BodyweightSeries':
+        """
+        Build a series from every dated row of the given sheet which has a bodyweight.
+        """
+        return cls.from_sheets([sheet], date_column, bodyweight_column)
+
+    @classmethod
+    def from_sheets(cls, sheets: List, date_column: int, bodyweight_column: int) -> 'BodyweightSeries':
+        """
+        Build a series from every dated row of the given sheets which has a bodyweight, e.g. one sheet per year. Cells
+        which don't hold a number or question marks, e.g. notes left in old sheets, are skipped.
+        """
+        series = cls()
+        # openpyxl yields the columns between the two in each row as well, so we index into each row
+        first_col = min(date_column, bodyweight_column)
+        for sheet in sheets:
+            date_cache = dc.for_sheet(sheet)
+            for row, values in enumerate(sheet.iter_rows(min_col=first_col,
+                                                         max_col=max(date_column, bodyweight_column),
+                                                         values_only=True),
+                                         start=1):
+                date = date_cache.floored_date(row, values[date_column - first_col])
+                bodyweight = values[bodyweight_column - first_col]
+                if bodyweight is None or date is None:
+                    # headers, for example
+                    continue
+                try:
+                    series.set(date, bodyweight)
+                except ValueError:
+                    continue
+        return series
+
+    @property
+    def start_date(self) -> datetime | None:
+        if self._start_ordinal is None:
+            return None
+        return datetime.fromordinal(self._start_ordinal)
+
+    def set(self, date: datetime, bodyweight: str | float | int) -> None:
+        """
+        Record the bodyweight for the given date. A bodyweight of question marks, e.g. "?" or "??", is recorded as
+        missing. Raise a ValueError if the bodyweight is neither that nor a number.
+        """
+        text = str(bodyweight).strip()
+        value = math.nan if text and text.count('?') == len(text) else float(text)
+        ordinal = date.toordinal()
+
+        if self._start_ordinal is None:
+            self._start_ordinal = ordinal
+        if ordinal < self._start_ordinal:
+            # extend the series backwards
+            self.values[:0] = array('d', [math.nan]) * (self._start_ordinal - ordinal)
+            self._start_ordinal = ordinal
+
+        idx = ordinal - self._start_ordinal
+        if idx >= len(self.values):
+            self.values.extend(array('d', [math.nan]) * (idx - len(self.values) + 1))
+        self.values[idx] = value
+
+    def get(self, date: datetime) -> float:
+        # return the bodyweight for the given date, or NaN if there is none
+        if self._start_ordinal is None:
+            return math.nan
+        idx = date.toordinal() - self._start_ordinal
+        if 0 <= idx < len(self.values):
+            return self.values[idx]
+        return math.nan
+
+    def rolling_mean(self, window: int) -> array:
+        """
+        Return the trailing mean of each day's bodyweight over the given number of days, ignoring missing values. Days
+        whose whole window is missing are NaN. This is computed in a single pass, using running sums.
+        :param window: the number of days in each window, including the day itself
+        :return: an array aligned with self.values
+        """
+        assert isinstance(window, int) and window > 0, "Window must be a positive integer"
+
+        means = array('d', bytes(8 * len(self.values)))
+        total, count = 0.0, 0
+        for idx, value in enumerate(self.values):
+            if not math.isnan(value):
+                total += value
+                count += 1
+            if idx >= window and not math.isnan(dropped := self.values[idx - window]):
+                total -= dropped
+                count -= 1
+            means[idx] = total / count if count else math.nan
+        return means
+
+    def weekly_summaries(self) -> List[WeeklySummary]:
+        """
+        Return summary statistics for every Monday-to-Sunday week covered by the series, in date order.
+        """
+        if self._start_ordinal is None:
+            return []
+
+        summaries = []
+        # the offset of the start date within its week, where Monday is 0
+        idx = -(self.start_date.weekday())
+        while idx < len(self.values):
+            week = [v for v in self.values[max(idx, 0):idx + 7] if not math.isnan(v)]
+            week_start = datetime.fromordinal(self._start_ordinal + idx)
+            if week:
+                summaries.append(WeeklySummary(week_start=week_start,
+                                               count=len(week),
+                                               mean=sum(week) / len(week),
+                                               minimum=min(week),
+                                               maximum=max(week)))
+            else:
+                summaries.append(WeeklySummary(week_start=week_start, count=0,
+                                               mean=math.nan, minimum=math.nan, maximum=math.nan))
+            idx += 7
+        return summaries
+
+    def __len__(self):
+        return len(self.values)
+
+    def dates(self) -> List[datetime]:
+        # return the date of each value in the series
+        return [self.start_date + timedelta(days=i) for i in range(len(self.values))]
@@ -0,0 +1,105 @@
+# a change plan records every cell which WorkoutsToExcel and BodyweightsToExcel would write, along with the bodyweights
+# note's new text, so that the notes can be scanned and paired with rows ahead of time (see PlanApply). It also records
+# fingerprints of the files it was planned against, so that it's never applied to files which have changed since.
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List
+
+from utilities.target_router import Partition
+
+# incremented whenever the plan file's format changes, so that plans written by other versions are refused
+PLAN_FORMAT_VERSION = 1
+
+
+def fingerprint_file(path: str) -> str:
+    # return a hash of the file's contents. Contents rather than modification times are hashed, so that copying or
+    # touching a file doesn't invalidate plans, and changing it within a second of planning does
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class PlannedWorkout:
+    partition: Partition
+    row: int
+    date: datetime
+    data: str
+    # what the target cell holds now, if anything. If it holds something, applying the plan overwrites it
+    existing: str | None = None
+
+
+@dataclass
+class PlannedBodyweight:
+    partition: Partition
+    row: int
+    # the bodyweight as written in the note, e.g. "70.5" or "?"
+    text: str
+
+
+@dataclass
+class PlannedNoteUpdate:
+    path: str
+    # the note's fingerprint when the plan was made. The note isn't replaced if it's been edited since
+    fingerprint: str
+    new_text: str
+
+
+@dataclass
+class ChangePlan:
+    created: datetime
+    # the fingerprint of every target workbook read while planning, keyed by path
+    workbook_fingerprints: Dict[str, str] = field(default_factory=dict)
+    workouts: List[PlannedWorkout] = field(default_factory=list)
+    bodyweights: List[PlannedBodyweight] = field(default_factory=list)
+    bodyweights_note: PlannedNoteUpdate | None = None
+
+    @property
+    def overwrites(self) -> List[PlannedWorkout]:
+        # the planned workouts whose target cells already hold something else
+        return [workout for workout in self.workouts if workout.existing]
+
+    def is_empty(self) -> bool:
+        return not self.workouts and not self.bodyweights
+
+    def changed_files(self) -> List[str]:
+        """
+        Return the files this plan was made against which have changed, or been deleted, since.
+        """
+        files = dict(self.workbook_fingerprints)
+        if self.bodyweights_note is not None:
+            files[self.bodyweights_note.path] = self.bodyweights_note.fingerprint
+        return [path for path, fingerprint in files.items()
+                if not os.path.exists(path) or fingerprint_file(path) != fingerprint]
+
+    def save(self, path: str) -> None:
+        as_dict = asdict(self)
+        as_dict["version"] = PLAN_FORMAT_VERSION
+        with open(path, 'w') as f:
+            json.dump(as_dict, f, separators=(',', ':'), default=datetime.isoformat)
+
+    @classmethod
+    def load(cls, path: str) -> 'ChangePlan':
+        """
+        Load a plan saved by ChangePlan.save. Raise if it was saved in a different format.
+        """
+        with open(path) as f:
+            as_dict = json.load(f)
+        if as_dict.pop("version", None) != PLAN_FORMAT_VERSION:
+            raise ValueError(f"The change plan `{path}` was made by a different version of this program. Please make "
+                             f"a new one")
+
+        bodyweights_note = as_dict["bodyweights_note"]
+        return cls(created=datetime.fromisoformat(as_dict["created"]),
+                   workbook_fingerprints=as_dict["workbook_fingerprints"],
+                   workouts=[PlannedWorkout(**(w | {"partition": Partition(**w["partition"]),
+                                                    "date": datetime.fromisoformat(w["date"])}))
+                             for w in as_dict["workouts"]],
+                   bodyweights=[PlannedBodyweight(**(b | {"partition": Partition(**b["partition"])}))
+                                for b in as_dict["bodyweights"]],
+                   bodyweights_note=None if bodyweights_note is None else PlannedNoteUpdate(**bodyweights_note))
@@ -0,0 +1,142 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import utilities.run_metrics as rm
+from utilities.shared_types import Entry, Handler
+
+
+class CompositeHandler(Handler):
+    # Merges the notes of several handlers (for example, one per notes directory) into a single stream of notes, so
+    # that one run of a tool can process them all. Notes from different handlers which represent the same thing (a
+    # workout on the same date, or the bodyweights note) are resolved to a single note, according to
+    # duplicate_resolution:
+    #  "mtime": keep the most recently edited note
+    #  "content": drop notes whose text is identical to another's, but keep differing notes
+    # Duplicates within a single handler are left alone, for the tools to report as they always have. The bodyweights
+    # note's title defaults to the one in params.py.
+    def __init__(self, handlers: List[Handler], duplicate_resolution: str = "mtime",
+                 bodyweights_note_title: str | None = None):
+        super().__init__()
+        assert handlers, "At least one handler is required"
+        assert duplicate_resolution in ("mtime", "content"), f"Unknown duplicate resolution `{duplicate_resolution}`"
+        self._handlers = handlers
+        self._duplicate_resolution = duplicate_resolution
+        self._bodyweights_note_title = bodyweights_note_title
+
+        # which handler each note came from, keyed by id(), since notes are unhashable
+        self._owner_by_note_id: Dict[int, Handler] = {}
+        self._notes: List[Entry] | None = None
+
+    def retrieve_notes(self) -> List[Entry] | None:
+        """
+        Retrieve the notes of every handler, concurrently, then merge them. Notes are retrieved once, then cached.
+        :return: the merged notes
+        """
+        if self._notes is not None:
+            return self._notes
+
+        with ThreadPoolExecutor(max_workers=len(self._handlers)) as executor:
+            retrieve = rm.in_current_run(lambda h: h.retrieve_notes() or [])
+            notes_per_handler = list(executor.map(retrieve, self._handlers))
+
+        for handler, notes in zip(self._handlers, notes_per_handler):
+            for note in notes:
+                self._owner_by_note_id[id(note)] = handler
+
+        self._notes = self._merge(notes_per_handler)
+        return self._notes
+
+    @property
+    def source_file_extensions(self) -> Tuple[str, ...]:
+        extensions = (extension for handler in self._handlers for extension in handler.source_file_extensions)
+        return tuple(dict.fromkeys(extensions))
+
+    def refresh_notes(self, paths: List[str]) -> List[Entry]:
+        """
+        Re-read the notes at the given paths via the handlers whose directories hold them, then merge every handler's
+        notes again, so that duplicates are resolved afresh. Each handler ignores the paths outside its directory.
+        :param paths: full paths of notes which have been created, modified or deleted
+        :return: the re-read notes which survived the merge
+        """
+        self.retrieve_notes()
+        refreshed = [note for handler in self._handlers for note in handler.refresh_notes(paths)]
+        # each handler's notes are retrieved from its cache, so merging again doesn't read anything
+        self._notes = None
+        self._owner_by_note_id.clear()
+        merged_ids = {id(note) for note in self.retrieve_notes()}
+        return [note for note in refreshed if id(note) in merged_ids]
+
+    def _merge(self, notes_per_handler: List[List[Entry]]) -> List[Entry]:
+        # group the notes which may be duplicates of each other
+        groups: Dict[datetime | str, List[Tuple[int, Entry]]] = {}
+        for handler_idx, notes in enumerate(notes_per_handler):
+            for note in notes:
+                if note.floored_datetime is not None:
+                    groups.setdefault(note.floored_datetime, []).append((handler_idx, note))
+                elif note.is_bodyweights_note(self._bodyweights_note_title):
+                    groups.setdefault("bodyweights note", []).append((handler_idx, note))
+
+        dropped_ids = set()
+        for group in groups.values():
+            if len({handler_idx for handler_idx, _ in group}) < 2:
+                continue
+            for note in self._resolve_duplicates([note for _, note in group]):
+                print(f"Ignoring `{note.path}`, which duplicates a note in another directory")
+                dropped_ids.add(id(note))
+
+        # keep the order in which handlers returned their notes
+        return [note for notes in notes_per_handler for note in notes if id(note) not in dropped_ids]
+
+    def _resolve_duplicates(self, notes: List[Entry]) -> List[Entry]:
+        # return the notes to drop from the given group of duplicate notes
+        dropped = []
+        kept = []
+        seen_hashes = set()
+        for note in notes:
+            content_hash = hashlib.sha256(note.text.encode()).digest()
+            if content_hash in seen_hashes:
+                dropped.append(note)
+            else:
+                seen_hashes.add(content_hash)
+                kept.append(note)
+
+        if self._duplicate_resolution == "mtime" and len(kept) > 1:
+            newest = max(kept, key=lambda n: n.edit_timestamp or datetime.min)
+            dropped.extend(note for note in kept if note is not newest)
+        return dropped
+
+    def _owner(self, note: Entry) -> Handler:
+        self.retrieve_notes()
+        if (owner := self._owner_by_note_id.get(id(note))) is None:
+            raise ValueError(f"Note `{note.title}` was not retrieved by this handler")
+        return owner
+
+    def return_bodyweights_note(self) -> Entry:
+        """
+        Return the note that contains the bodyweight data. Raise if it can't be found, or multiple matches are found
+        :return: the note object
+        """
+        n = [note for note in self.retrieve_notes() if note.is_bodyweights_note(self._bodyweights_note_title)]
+        count = len(n)
+        match count:
+            case 0:
+                raise RuntimeError(f"Failed to find the bodyweights note.")
+            case 1:
+                return n[0]
+            case _:
+                raise RuntimeError(f"Found {count} bodyweight notes. Expected only one.")
+
+    def replace_bodyweights_note(self, new_text) -> None:
+        # replace the bodyweights note via the handler it came from
+        self._owner(self.return_bodyweights_note()).replace_bodyweights_note(new_text)
+
+    def discard_notes(self, notes: List[Entry]) -> None:
+        # discard each note via the handler it came from
+        notes_by_owner: Dict[int, Tuple[Handler, List[Entry]]] = {}
+        for note in notes:
+            owner = self._owner(note)
+            notes_by_owner.setdefault(id(owner), (owner, []))[1].append(note)
+        for owner, owned_notes in notes_by_owner.values():
+            owner.discard_notes(owned_notes)
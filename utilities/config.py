@@ -0,0 +1,59 @@
+# the settings which reading notes and reading and writing the target file depend on. By default they're those in
+# params.py, but a Config can hold any settings, and is passed explicitly to the note handlers, TargetWorkbooks, and the
+# functions which parse, pair and write workouts and bodyweights. So a single process can serve many runs, with
+# different settings if need be, without reloading params.py or the caches kept between runs.
+from dataclasses import dataclass, fields, replace
+from typing import Tuple
+
+import utilities.params as p
+
+
+@dataclass(frozen=True)
+class Config:
+    # each setting is described in params.py, under the same name in upper case
+    local_notes_source_dir: str
+    additional_notes_source_dirs: Tuple[str, ...]
+    duplicate_note_resolution: str
+    note_ignore_patterns: Tuple[str, ...]
+    max_note_search_depth: int
+    local_notes_archive_dir: str
+    archive_notes_in_bundles: bool
+    local_excel_backup_dir: str
+    target_path: str
+    target_sheet: str
+    bodyweight_series_path: str
+    cache_parsed_dates: bool
+    sheet_reader: str
+    file_lock_timeout_seconds: float
+    workout_export_dir: str
+    workout_export_format: str
+    date_column: int
+    bodyweight_column: int
+    workout_column: int
+    max_concurrent_file_operations: int
+    classify_notes_before_reading: bool
+    bodyweights_note_title: str
+    history_length: int
+    nightly_prune_after_days: int
+
+    def __post_init__(self):
+        # settings given as lists, as in params.py, are kept as tuples, so that they can't be changed in place either
+        for name in ("additional_notes_source_dirs", "note_ignore_patterns"):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+
+    @classmethod
+    def from_params(cls, **overrides) -> 'Config':
+        """
+        Return the settings in params.py, as they are now, with any of them overridden.
+        :param overrides: settings to use instead of those in params.py, e.g. target_path="/dir/Workouts.xlsx"
+        """
+        return cls(**({field.name: getattr(p, field.name.upper()) for field in fields(cls)} | overrides))
+
+    def replace(self, **changes) -> 'Config':
+        # return a copy of these settings, with the given ones changed
+        return replace(self, **changes)
+
+    @staticmethod
+    def has_setting(name: str) -> bool:
+        # whether a setting of params.py, e.g. "TARGET_PATH", is one of these
+        return any(field.name == name.lower() for field in fields(Config))
@@ -0,0 +1,186 @@
+# caches the dates parsed from string cells in the target sheet's date column, across runs.
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime
+from typing import Dict, Tuple
+from weakref import WeakKeyDictionary
+
+import utilities.params as p
+import utilities.basic_functions as bf
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_RELATIONSHIP_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_PACKAGE_RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# bump this whenever the sidecar format, or the way string dates are parsed, changes
+_CACHE_VERSION = 1
+
+
+def sheet_part_of(archive: zipfile.ZipFile, sheet_name: str) -> str:
+    """
+    Return the name of the given sheet's XML file within the xlsx archive, e.g. "xl/worksheets/sheet1.xml". Raise
+    StopIteration if there's no such sheet.
+    :param archive: the opened xlsx file
+    :param sheet_name: the name of the sheet within the workbook
+    """
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    relationship_id = next(sheet.get(_RELATIONSHIP_ID) for sheet in workbook.iter(f"{_MAIN_NS}sheet")
+                           if sheet.get("name") == sheet_name)
+    relationships = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    target = next(rel.get("Target") for rel in relationships.iter(f"{_PACKAGE_RELS_NS}Relationship")
+                  if rel.get("Id") == relationship_id)
+    # targets are usually relative to the xl directory, but may be absolute within the archive
+    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+
+def sheet_xml_hash(workbook_path: str, sheet_name: str) -> str:
+    """
+    Return a hash of the given sheet's XML within the xlsx file, along with the workbook's shared strings, in which
+    string cell values are usually stored. Any edit to the sheet's cells changes this hash.
+    :param workbook_path: the path of the xlsx file
+    :param sheet_name: the name of the sheet within the workbook
+    :return: a hex digest
+    """
+    with zipfile.ZipFile(workbook_path) as archive:
+        digest = hashlib.sha256(archive.read(sheet_part_of(archive, sheet_name)))
+        if "xl/sharedStrings.xml" in archive.namelist():
+            digest.update(archive.read("xl/sharedStrings.xml"))
+    return digest.hexdigest()
+
+
+class SheetDateCache:
+    # Remembers the floored date parsed from each string cell in a sheet's date column, so that string dates are only
+    # parsed once per revision of the workbook. Date cells that openpyxl already returns as datetime objects are cheap,
+    # and aren't cached.
+    # The cache is kept in a sidecar file next to the workbook, keyed by the hash of the sheet's XML. Each entry also
+    # records the string it was parsed from, so that a sheet modified in memory since loading is never given a stale
+    # date. Dates without a year are resolved to the current year, so entries are also discarded when the year changes.
+    def __init__(self, workbook_path: str | None = None, sheet_name: str = "", sheet_hash: str = "",
+                 date_column: int = 0):
+        self._workbook_path = workbook_path
+        self._sidecar_path = sidecar_path_of(workbook_path) if workbook_path is not None else None
+        self._sheet_name = sheet_name
+        self._sheet_hash = sheet_hash
+        self._date_column = date_column
+        # row -> (cell string, ISO date or None if the string isn't a date)
+        self._dates_by_row: Dict[int, Tuple[str, str | None]] = {}
+        self._dirty = False
+
+    @classmethod
+    def for_workbook(cls, workbook_path: str, sheet_name: str, date_column: int) -> 'SheetDateCache':
+        # return the cache for the given sheet, loaded from its sidecar file if that matches the workbook as it's
+        # currently saved
+        cache = cls(workbook_path=workbook_path, sheet_name=sheet_name,
+                    sheet_hash=sheet_xml_hash(workbook_path, sheet_name), date_column=date_column)
+        cache._load()
+        return cache
+
+    def _load(self) -> None:
+        try:
+            with open(self._sidecar_path, 'r') as f:
+                sheets = json.load(f).get("sheets", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        cached = sheets.get(self._sheet_name)
+        if (cached is None or cached.get("version") != _CACHE_VERSION or cached.get("hash") != self._sheet_hash
+                or cached.get("date_column") != self._date_column or cached.get("year") != datetime.now().year):
+            return
+        self._dates_by_row = {int(row): (text, iso_date) for row, (text, iso_date) in cached["rows"].items()}
+
+    def floored_date(self, row: int, value) -> datetime | None:
+        """
+        Return the date held in the given date column cell, without time component, or None if it holds no date.
+        :param row: the cell's row
+        :param value: the cell's value
+        :return: a datetime object, or None
+        """
+        if not isinstance(value, str):
+            return bf.convert_cell_value_to_floored_datetime(value)
+
+        cached = self._dates_by_row.get(row)
+        if cached is not None and cached[0] == value:
+            return None if cached[1] is None else datetime.fromisoformat(cached[1])
+
+        floored_date = bf.convert_cell_value_to_floored_datetime(value)
+        self._dates_by_row[row] = (value, None if floored_date is None else floored_date.date().isoformat())
+        self._dirty = True
+        return floored_date
+
+    def save(self, workbook_saved=False) -> None:
+        """
+        Write the cache to its sidecar file, if anything new was parsed. Caches without a sidecar file are never saved.
+        :param workbook_saved: whether the workbook was just saved. The cache is then keyed by its new hash. Only pass
+        this if the date column wasn't changed, as is the case when writing workouts and bodyweights.
+        """
+        if self._sidecar_path is None:
+            return
+        if workbook_saved:
+            new_hash = sheet_xml_hash(self._workbook_path, self._sheet_name)
+            self._dirty |= new_hash != self._sheet_hash
+            self._sheet_hash = new_hash
+        if not self._dirty:
+            return
+
+        try:
+            with open(self._sidecar_path, 'r') as f:
+                contents = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            contents = {}
+        contents.setdefault("sheets", {})[self._sheet_name] = {
+            "version": _CACHE_VERSION,
+            "hash": self._sheet_hash,
+            "date_column": self._date_column,
+            "year": datetime.now().year,
+            "rows": {str(row): list(entry) for row, entry in sorted(self._dates_by_row.items())},
+        }
+
+        # write to a temporary file first, so that an interrupted write can't leave a corrupt cache behind
+        temp_path = self._sidecar_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(contents, f)
+        os.replace(temp_path, self._sidecar_path)
+        self._dirty = False
+
+
+def sidecar_path_of(workbook_path: str) -> str:
+    # e.g. /dir/Workouts.xlsx -> /dir/.Workouts.xlsx.dates.json
+    directory, filename = os.path.split(workbook_path)
+    return os.path.join(directory, f".{filename}.dates.json")
+
+
+# the cache for each loaded target sheet. Sheets without one attached, such as those built in memory, get an unsaved
+# cache instead
+_cache_by_sheet: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def attach_to_sheet(wb, workbook_path: str, sheet_name: str, date_column: int | None = None,
+                    enabled: bool | None = None) -> None:
+    # load the cache of the given sheet's parsed dates, if enabled and not loaded already. Call this straight after
+    # loading the workbook from the given path, before the sheet is modified. The date column and whether the cache is
+    # enabled default to those in params.py
+    enabled = p.CACHE_PARSED_DATES if enabled is None else enabled
+    date_column = p.DATE_COLUMN if date_column is None else date_column
+    if enabled and wb[sheet_name] not in _cache_by_sheet:
+        _cache_by_sheet[wb[sheet_name]] = SheetDateCache.for_workbook(workbook_path, sheet_name, date_column)
+
+
+def for_sheet(sheet) -> SheetDateCache:
+    # return the date cache of the given sheet
+    if (cache := _cache_by_sheet.get(sheet)) is None:
+        cache = _cache_by_sheet[sheet] = SheetDateCache()
+    return cache
+
+
+def save_for_sheet(sheet, workbook_saved: bool = False) -> None:
+    """
+    Save the date cache of the given sheet, if it has one.
+    :param sheet: the sheet
+    :param workbook_saved: whether the workbook was just saved to the path it was loaded from, in which case the cache
+    is re-keyed to the saved workbook, so that the next run can use it
+    """
+    if (cache := _cache_by_sheet.get(sheet)) is not None:
+        cache.save(workbook_saved=workbook_saved)
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Dict, Set
+
+import utilities.row_locator as rl
+import utilities.sheet_reader as sr
+
+
+class SheetDateIndex:
+    # A read-only view of a sheet's date column, mapping each floored date between min_date and max_date to the row
+    # that holds it. Only the rows between those dates' rows, as found by the row locator, are read, so that callers
+    # that only care about a few dates don't pay for the years of rows around them.
+    def __init__(self, sheet, date_column: int, min_date: datetime | None = None, max_date: datetime | None = None):
+        # sheet may be an openpyxl sheet, or a reader of one
+        self._row_by_date: Dict[datetime, int] = {}
+        self._duplicates: Set[datetime] = set()
+
+        if min_date is not None:
+            min_date = min_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if max_date is not None:
+            max_date = max_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        reader = sr.reader_for(sheet)
+        date_cache = reader.date_cache
+        start_row, end_row = 1, reader.max_row
+        if min_date is not None or max_date is not None:
+            rows = rl.DateRowLocator(reader, date_column).row_range(min_date, max_date)
+            if rows is None:
+                # none of the dates are in the sheet
+                return
+            start_row, end_row = rows
+        for row, (value,) in reader.iter_columns([date_column], min_row=start_row):
+            if row > end_row:
+                break
+            floored_date = date_cache.floored_date(row, value)
+            if floored_date is None:
+                # empty cells, headers and other non-date values
+                continue
+            if (min_date is not None and floored_date < min_date) or (max_date is not None and floored_date > max_date):
+                # out of range, among rows which aren't in ascending order
+                continue
+            if floored_date in self._row_by_date:
+                self._duplicates.add(floored_date)
+                continue
+            self._row_by_date[floored_date] = row
+
+    def row_of(self, date: datetime) -> int:
+        """
+        Return the row holding the given date, or -1 if it isn't indexed.
+        :param date: the date to look up. Any time component is ignored.
+        :return: a row number, or -1
+        """
+        return self._row_by_date.get(date.replace(hour=0, minute=0, second=0, microsecond=0), -1)
+
+    def is_duplicated(self, date: datetime) -> bool:
+        # return True if the given date occurs in more than one row of the date column
+        return date.replace(hour=0, minute=0, second=0, microsecond=0) in self._duplicates
+
+    def __len__(self):
+        return len(self._row_by_date)
+
+    def __contains__(self, date: datetime):
+        return self.row_of(date) != -1
@@ -0,0 +1,72 @@
+# advisory locks on files which several of these tools may modify at once, e.g. the target workbook when two cron jobs
+# overlap. Every tool takes a file's lock before modifying it, so that their writes are serialized. The locks are
+# advisory: programs which don't take them, such as Excel, aren't stopped.
+import hashlib
+import os
+import tempfile
+import time
+
+import utilities.params as p
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# how often to retry taking a lock held by another process, in seconds
+LOCK_POLL_INTERVAL_SECONDS = 0.1
+
+
+def lock_path_of(path: str) -> str:
+    # lock files are kept in the temporary directory rather than next to the files they lock, so that they don't
+    # clutter the notes directory. e.g. /dir/Workouts.xlsx -> /tmp/Workouts.xlsx.1f2e3d4c5b6a7988.lock
+    absolute_path = os.path.abspath(path)
+    path_hash = hashlib.blake2b(absolute_path.encode(), digest_size=8).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"{os.path.basename(absolute_path)}.{path_hash}.lock")
+
+
+class FileLock:
+    # Holds an exclusive lock on a file for the duration of a with block, e.g.
+    #     with FileLock(p.TARGET_PATH):
+    #         wb.save(p.TARGET_PATH)
+    # The lock is taken on a separate lock file, so that the file itself can be replaced while locked. Locks are
+    # released when the process holding them exits, even if it crashes.
+    def __init__(self, path: str, timeout: float | None = None):
+        self._path = path
+        self._lock_path = lock_path_of(path)
+        self._timeout = p.FILE_LOCK_TIMEOUT_SECONDS if timeout is None else timeout
+        self._file = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def __enter__(self) -> 'FileLock':
+        self._file = open(self._lock_path, 'a')
+        deadline = time.monotonic() + self._timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                self._file.close()
+                self._file = None
+                raise TimeoutError(f"Timed out after {self._timeout} seconds waiting for another program to finish "
+                                   f"writing to `{self._path}`")
+            time.sleep(LOCK_POLL_INTERVAL_SECONDS)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
@@ -1,70 +1,120 @@
+import asyncio
 import datetime
 import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import cache
-from typing import List
+from typing import List, Tuple
 
-import utilities.params as p
+import utilities.note_archive as na
+import utilities.note_classifier as nc
+import utilities.run_metrics as rm
 import utilities.utility_functions as uf
-from utilities.shared_types import Entry, Handler
+from utilities.composite_handler import CompositeHandler
+from utilities.config import Config
+from utilities.file_lock import FileLock
+from utilities.note_walker import NoteWalker
+from utilities.shared_types import AsyncHandler, Entry, Handler
 
 
 class LocalFileHandler(Handler):
     # this class handles reading from, writing to, and updating local files
-    def __init__(self):
+    def __init__(self, source_dir: str | None = None, config: Config | None = None):
         super().__init__()
 
+        # the settings for reading and archiving notes. Default to those in params.py
+        self._config = config or Config.from_params()
+        # the directory containing the notes. Defaults to the one specified in the settings
+        self._source_dir = source_dir or self._config.local_notes_source_dir
         # the extensions of the files that are considered notes
         self._source_file_extensions = ('.txt', '.md')
         self._notes: List[Entry] = self.retrieve_notes()
 
+    @property
+    def source_file_extensions(self) -> Tuple[str, ...]:
+        return self._source_file_extensions
+
     @cache
     def retrieve_notes(self) -> List[Entry] | None:
         """
         Retrieve all notes from local filesystem, or None if no notes are found.
         :return: a dict of note objects, where the keys are the note titles, and the values are the note contents
         """
-        if not os.path.exists(p.LOCAL_NOTES_SOURCE_DIR):
-            raise ValueError(f"Could not find source directory `{p.LOCAL_NOTES_SOURCE_DIR}`")
+        if not os.path.exists(self._source_dir):
+            raise ValueError(f"Could not find source directory `{self._source_dir}`")
 
         print('Retrieving notes')
-        notes = self._retrieve_recursively(directory=p.LOCAL_NOTES_SOURCE_DIR)
+        notes = self._retrieve_recursively(directory=self._source_dir)
         if notes:
             return notes
-        print(f"No notes found in the following directory or any of its children `{p.LOCAL_NOTES_SOURCE_DIR}`!")
+        print(f"No notes found in the following directory or any of its children `{self._source_dir}`!")
         return []
 
-    def _retrieve_recursively(self, directory: str, max_depth=5, include_archive=True) -> List[Entry] | None:
+    def _retrieve_recursively(self, directory: str, include_archive=True) -> List[Entry]:
         """
-        Recursively retrieve notes from local filesystem if found, or None if no notes are found.
+        Recursively retrieve notes from local filesystem, skipping the paths ignored according to params.py.
         :param directory: the directory to search
-        :param max_depth: break if this depth is reached
-        :return:
+        :param include_archive: whether to retrieve notes from the archive directory, if it's within this directory
+        :return: a list of notes
         """
-        ignore_dirs = [p.LOCAL_EXCEL_BACKUP_DIR]
+        ignore_dirs = [self._config.local_excel_backup_dir]
         if not include_archive:
-            ignore_dirs.append(p.LOCAL_NOTES_ARCHIVE_DIR)
-
-        # todo: rename max_depth variable
-        if (max_depth == -1) or (directory in ignore_dirs):
-            return []
-
-        notes = []
-        for filename in os.listdir(directory):
-            if os.path.isdir(os.path.join(directory, filename)) and "backup" not in filename.lower():
-                notes.extend(self._retrieve_recursively(os.path.join(directory, filename), max_depth - 1))
-            elif filename.endswith(self._source_file_extensions):
-                with open(os.path.join(directory, filename), 'r') as f:
-                    # get the file's modification timestamp as datetime
-                    timestamp = os.path.getmtime(os.path.join(directory, filename))
-                    as_datetime = datetime.datetime.fromtimestamp(timestamp)
-                    # drop the file extension
-                    notes.append(Entry(title=os.path.splitext(filename)[0], text=f.read(), edit_timestamp=as_datetime,
-                                       path=os.path.join(directory, filename)))
-        return [note for note in notes if note]
+            ignore_dirs.append(self._config.local_notes_archive_dir)
+
+        walker = NoteWalker.from_config(self._config, directory, self._source_file_extensions, ignore_dirs)
+        notes = (self._read_note_if_relevant(entry.path, entry.stat(), self._config) for entry in walker.walk())
+        return [note for note in notes if note is not None]
+
+    @staticmethod
+    def _read_note_if_relevant(path: str, stat: os.stat_result, config: Config) -> Entry | None:
+        # read the note at the given path, unless it's classified as neither a workout nor the bodyweights note
+        rm.count(rm.NOTES_SCANNED)
+        if not config.classify_notes_before_reading:
+            rm.count(rm.BYTES_READ, stat.st_size)
+            return LocalFileHandler._read_note(path, stat.st_mtime)
+        text = nc.read_note_if_relevant(path, stat.st_size, bodyweights_note_title=config.bodyweights_note_title)
+        return None if text is None else LocalFileHandler._entry_of(path, text, stat.st_mtime)
+
+    @staticmethod
+    def _read_note(path: str, timestamp: float | None = None) -> Entry:
+        # read the note at the given path. Its modification timestamp is looked up unless it's provided
+        with open(path, 'r') as f:
+            if timestamp is None:
+                timestamp = os.path.getmtime(path)
+            return LocalFileHandler._entry_of(path, f.read(), timestamp)
+
+    @staticmethod
+    def _entry_of(path: str, text: str, timestamp: float) -> Entry:
+        # get the file's modification timestamp as datetime, and drop the file extension
+        return Entry(title=os.path.splitext(os.path.basename(path))[0], text=text,
+                     edit_timestamp=datetime.datetime.fromtimestamp(timestamp), path=path)
+
+    def refresh_notes(self, paths: List[str]) -> List[Entry]:
+        """
+        Re-read the notes at the given paths, replacing any previously retrieved versions of them. Paths which no longer
+        exist are dropped from the retrieved notes. Paths which aren't notes, or aren't within the source directory, are
+        ignored.
+        :param paths: full paths of notes which have been created, modified or deleted
+        :return: the re-read notes
+        """
+        paths = {path for path in paths
+                 if path.endswith(self._source_file_extensions) and _is_within(path, self._source_dir)}
+        # update in place, because retrieve_notes returns this same list
+        self._notes[:] = [note for note in self._notes if note.path not in paths]
+
+        refreshed = [note for note in (self._reread_note(path, self._config) for path in sorted(paths))
+                     if note is not None]
+        self._notes.extend(refreshed)
+        return refreshed
 
     @staticmethod
-    def is_bodyweights_note(note: Entry) -> bool:
-        return note.title.casefold().strip() == p.BODYWEIGHTS_NOTE_TITLE.casefold().strip()
+    def _reread_note(path: str, config: Config) -> Entry | None:
+        # read the note at the given path again, unless it's been deleted or isn't relevant
+        if not os.path.isfile(path):
+            return None
+        return LocalFileHandler._read_note_if_relevant(path, os.stat(path), config)
+
+    def is_bodyweights_note(self, note: Entry) -> bool:
+        return note.is_bodyweights_note(self._config.bodyweights_note_title)
 
     def return_bodyweights_note(self) -> Entry:
         """
@@ -86,28 +136,211 @@ class LocalFileHandler(Handler):
         Backup the old bodyweights note and replace it with a new one containing the new text.
         :return:
         """
-        bw_note_path = self.return_bodyweights_note().path
+        write_bodyweights_note(self.return_bodyweights_note().path, new_text, self._config)
+
+    def discard_notes(self, notes: List[Entry]) -> None:
+        """
+        Moves the provided notes from their current path into the note archive directory, packed into monthly bundles
+        unless the settings say otherwise.
+        """
+        if self._config.archive_notes_in_bundles:
+            self._discard_notes_into_bundles(notes, self._config)
+            return
+        for note in notes:
+            self._discard_note(note, self._config.local_notes_archive_dir)
+
+    @staticmethod
+    def _discard_notes_into_bundles(notes: List[Entry], config: Config) -> None:
+        # only remove the original files once they're safely in their bundles
+        for note in na.archive_notes(notes, config.local_notes_archive_dir, config.file_lock_timeout_seconds):
+            os.remove(note.path)
+
+    @staticmethod
+    def _discard_note(note: Entry, archive_dir: str) -> None:
+        try:
+            uf.backup_file_to_dir(note.path,
+                                  archive_dir,
+                                  # personal preference. If it's already going to be in the archive directory,
+                                  # I don't need the word "backup" in the filename
+                                  basename_override=f"{note.title}",
+                                  keep_date_info=False)
+        except Exception as e:
+            print(f"Failed to backup file {note.path}. Error: {e}. This file will be left in place and untouched")
+        else:
+            # only remove the original file if backup was successful
+            os.remove(note.path)
+
+
+class AsyncLocalFileHandler(AsyncHandler):
+    # the asynchronous equivalent of LocalFileHandler. Blocking file operations (directory listings, stat calls, reads,
+    # writes) run in worker threads, with at most max_concurrency of them in flight at once. This hides latency on slow
+    # mounts, where most of the time is spent waiting on each call rather than transferring data.
+    def __init__(self, max_concurrency: int = 16, source_dir: str | None = None, config: Config | None = None):
+        super().__init__()
+        assert max_concurrency > 0, "max_concurrency must be a positive integer"
+        self._config = config or Config.from_params()
+        self._source_dir = source_dir or self._config.local_notes_source_dir
+        self._source_file_extensions = ('.txt', '.md')
+        self._max_concurrency = max_concurrency
+        self._notes: List[Entry] | None = None
+
+    @property
+    def source_file_extensions(self) -> Tuple[str, ...]:
+        return self._source_file_extensions
+
+    async def _run_blocking(self, semaphore: asyncio.Semaphore, func, *args):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def retrieve_notes(self) -> List[Entry] | None:
+        """
+        Retrieve all notes from local filesystem. Notes are retrieved once, then cached.
+        :return: a list of notes, in the same order as LocalFileHandler would return them
+        """
+        if self._notes is not None:
+            return self._notes
+
+        if not os.path.exists(self._source_dir):
+            raise ValueError(f"Could not find source directory `{self._source_dir}`")
+
+        print('Retrieving notes')
+        # semaphores belong to the running event loop, so we create one per retrieval
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        walker = NoteWalker.from_config(self._config, self._source_dir, self._source_file_extensions)
+        self._notes = await self._retrieve_recursively(semaphore, walker, self._source_dir, depth=0)
+        if not self._notes:
+            print(f"No notes found in the following directory or any of its children `{self._source_dir}`!")
+        return self._notes
+
+    async def _retrieve_recursively(self, semaphore: asyncio.Semaphore, walker: NoteWalker, directory: str,
+                                    depth: int) -> List[Entry]:
+        # read this directory's notes and retrieve its subdirectories' notes concurrently, in the same order as
+        # LocalFileHandler. The semaphore is only held for each blocking call, never while awaiting children, so this
+        # can't deadlock
+        note_entries, subdirs = await self._run_blocking(semaphore, walker.list_directory, directory)
+        if depth >= walker.max_depth:
+            subdirs = []
+        results = await asyncio.gather(
+            *[self._run_blocking(semaphore, self._read_note_entry, entry) for entry in note_entries],
+            *[self._retrieve_recursively(semaphore, walker, subdir.path, depth + 1) for subdir in subdirs])
+        # notes which were skipped without being read are None
+        return ([note for note in results[:len(note_entries)] if note is not None]
+                + [note for notes in results[len(note_entries):] for note in notes])
+
+    def _read_note_entry(self, entry: os.DirEntry) -> Entry | None:
+        return LocalFileHandler._read_note_if_relevant(entry.path, entry.stat(), self._config)
+
+    async def refresh_notes(self, paths: List[str]) -> List[Entry]:
+        # as LocalFileHandler.refresh_notes, re-reading the notes concurrently
+        notes = await self.retrieve_notes()
+        paths = {path for path in paths
+                 if path.endswith(self._source_file_extensions) and _is_within(path, self._source_dir)}
+        notes[:] = [note for note in notes if note.path not in paths]
+
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        results = await asyncio.gather(*[self._run_blocking(semaphore, LocalFileHandler._reread_note, path,
+                                                            self._config)
+                                         for path in sorted(paths)])
+        refreshed = [note for note in results if note is not None]
+        notes.extend(refreshed)
+        return refreshed
+
+    async def return_bodyweights_note(self) -> Entry:
+        """
+        Return the note that contains the bodyweight data. Raise if it can't be found, or multiple matches are found
+        :return: the note object
+        """
+        n = [note for note in await self.retrieve_notes()
+             if note.is_bodyweights_note(self._config.bodyweights_note_title)]
+        count = len(n)
+        match count:
+            case 0:
+                raise RuntimeError(f"Failed to find the bodyweights note.")
+            case 1:
+                return n[0]
+            case _:
+                raise RuntimeError(f"Found {count} bodyweight notes. Expected only one.")
+
+    async def replace_bodyweights_note(self, new_text) -> None:
+        # Backup the old bodyweights note and replace it with a new one containing the new text.
+        bw_note_path = (await self.return_bodyweights_note()).path
+        await asyncio.to_thread(write_bodyweights_note, bw_note_path, new_text, self._config)
+
+    async def discard_notes(self, notes: List[Entry]) -> None:
+        # Moves the provided notes from their current path into the note archive directory, concurrently. Bundles are
+        # written one at a time, as each is a single file
+        if self._config.archive_notes_in_bundles:
+            await asyncio.to_thread(LocalFileHandler._discard_notes_into_bundles, notes, self._config)
+            return
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        archive_dir = self._config.local_notes_archive_dir
+        await asyncio.gather(*[self._run_blocking(semaphore, LocalFileHandler._discard_note, note, archive_dir)
+                               for note in notes])
+
+
+class BlockingHandler(Handler):
+    # a thin synchronous wrapper around an AsyncHandler, so that it can be used wherever a Handler is expected. Each
+    # call runs to completion in its own event loop.
+    def __init__(self, async_handler: AsyncHandler):
+        super().__init__()
+        self._async_handler = async_handler
+
+    @property
+    def source_file_extensions(self) -> Tuple[str, ...]:
+        return self._async_handler.source_file_extensions
+
+    def retrieve_notes(self) -> List[Entry] | None:
+        return asyncio.run(self._async_handler.retrieve_notes())
+
+    def refresh_notes(self, paths: List[str]) -> List[Entry]:
+        return asyncio.run(self._async_handler.refresh_notes(paths))
+
+    def return_bodyweights_note(self) -> Entry:
+        return asyncio.run(self._async_handler.return_bodyweights_note())
+
+    def replace_bodyweights_note(self, new_text) -> None:
+        asyncio.run(self._async_handler.replace_bodyweights_note(new_text))
+
+    def discard_notes(self, notes: List[Entry]) -> None:
+        asyncio.run(self._async_handler.discard_notes(notes))
+
+
+def _is_within(path: str, directory: str) -> bool:
+    directory = os.path.abspath(directory)
+    return os.path.commonpath([os.path.abspath(path), directory]) == directory
+
+
+def write_bodyweights_note(bw_note_path: str, new_text: str, config: Config | None = None) -> None:
+    # back up the bodyweights note at the given path, then replace its text. Other tools wait meanwhile
+    config = config or Config.from_params()
+    with FileLock(bw_note_path, config.file_lock_timeout_seconds):
         uf.backup_file_to_dir(bw_note_path,
-                              p.LOCAL_NOTES_ARCHIVE_DIR,
+                              config.local_notes_archive_dir,
                               basename_override="backup_bodyweights_note",
                               keep_date_info=True)
+        rm.count(rm.BACKUPS_MADE)
         with open(bw_note_path, 'w') as f:
             f.write(new_text)
 
-    def discard_notes(self, notes: List[Entry]) -> None:
-        """
-        Moves the provided notes from their current path into the note archive directory.
-        """
-        for note in notes:
-            try:
-                uf.backup_file_to_dir(note.path,
-                                      p.LOCAL_NOTES_ARCHIVE_DIR,
-                                      # personal preference. If it's already going to be in the archive directory,
-                                      # I don't need the word "backup" in the filename
-                                      basename_override=f"{note.title}",
-                                      keep_date_info=False)
-            except Exception as e:
-                print(f"Failed to backup file {note.path}. Error: {e}. This file will be left in place and untouched")
-            else:
-                # only remove the original file if backup was successful
-                os.remove(note.path)
+
+def create_handler(config: Config | None = None) -> Handler:
+    # return the handler to use for local files, according to the given settings, or params.py. If notes are kept in
+    # several directories, then return a single handler which merges the notes from all of them
+    config = config or Config.from_params()
+    source_dirs = [config.local_notes_source_dir, *config.additional_notes_source_dirs]
+    if len(source_dirs) == 1:
+        return _create_single_directory_handler(config.local_notes_source_dir, config)
+
+    # handlers read their notes on creation, so create them concurrently
+    with ThreadPoolExecutor(max_workers=len(source_dirs)) as executor:
+        create = rm.in_current_run(lambda source_dir: _create_single_directory_handler(source_dir, config))
+        handlers = list(executor.map(create, source_dirs))
+    return CompositeHandler(handlers, duplicate_resolution=config.duplicate_note_resolution,
+                            bodyweights_note_title=config.bodyweights_note_title)
+
+
+def _create_single_directory_handler(source_dir: str, config: Config) -> Handler:
+    if config.max_concurrent_file_operations > 1:
+        return BlockingHandler(AsyncLocalFileHandler(max_concurrency=config.max_concurrent_file_operations,
+                                                     source_dir=source_dir, config=config))
+    return LocalFileHandler(source_dir=source_dir, config=config)
@@ -0,0 +1,230 @@
+# keeps discarded notes in one compressed bundle per month, e.g. notes-2021-01.zip, rather than one file per note, so
+# that the archive directory holds a handful of files per year however long the history grows. Each note is filed under
+# the month of its workout's date, or of its last edit if it isn't a workout note. An index of every archived note,
+# index.jsonl, lets notes be listed without opening the bundles, and any note can be extracted again.
+import json
+import os
+import shutil
+import zipfile
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from utilities.file_lock import FileLock
+from utilities.shared_types import Entry
+
+BUNDLE_PREFIX = "notes-"
+INDEX_NAME = "index.jsonl"
+
+
+@dataclass
+class ArchivedNote:
+    title: str
+    # the file name of the bundle holding the note, within the archive directory
+    bundle: str
+    # the note's file name within the bundle. Usually its original file name, unless a note with the same name was
+    # archived in the same month before, e.g. "2021-01-01 legs (2).md"
+    member: str
+    archived: datetime
+    # the note's uncompressed size, in bytes
+    size: int
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(',', ':'), default=datetime.isoformat)
+
+    @classmethod
+    def from_json(cls, line: str) -> 'ArchivedNote':
+        as_dict = json.loads(line)
+        return cls(**(as_dict | {"archived": datetime.fromisoformat(as_dict["archived"])}))
+
+
+def bundle_name_of(month: datetime) -> str:
+    return f"{BUNDLE_PREFIX}{month.strftime('%Y-%m')}.zip"
+
+
+def month_of(note: Entry) -> datetime:
+    # the month whose bundle the note is filed in
+    date = note.floored_datetime or note.edit_timestamp or datetime.now()
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _unique_member_name(filename: str, taken: set) -> str:
+    # e.g. "2021-01-01 legs.md" -> "2021-01-01 legs (2).md", if the former is taken
+    stem, extension = os.path.splitext(filename)
+    name, count = filename, 1
+    while name in taken:
+        count += 1
+        name = f"{stem} ({count}){extension}"
+    return name
+
+
+def _write_journal(bundle_path: str, journal_path: str) -> None:
+    # record what appending to the bundle overwrites: its central directory (the list of its members, at its end), and
+    # where that starts. Everything before it is left as it is. A new bundle is recorded as starting at 0
+    start = 0
+    if os.path.exists(bundle_path):
+        with zipfile.ZipFile(bundle_path) as bundle:
+            start = bundle.start_dir
+        with open(bundle_path, 'rb') as f:
+            f.seek(start)
+            central_directory = f.read()
+    else:
+        central_directory = b""
+    # the journal is swapped in whole, so that one which exists is always complete
+    temp_path = journal_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(start.to_bytes(8, 'little') + central_directory)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal_path)
+
+
+def _roll_back(bundle_path: str, journal_path: str) -> None:
+    # restore the bundle to how it was before an append which was cut short, e.g. by a crash, then drop the journal
+    with open(journal_path, 'rb') as f:
+        start, central_directory = int.from_bytes(f.read(8), 'little'), f.read()
+    if start == 0:
+        # the bundle was new
+        if os.path.exists(bundle_path):
+            os.remove(bundle_path)
+    else:
+        with open(bundle_path, 'r+b') as f:
+            f.truncate(start)
+            f.seek(start)
+            f.write(central_directory)
+    os.remove(journal_path)
+
+
+def _add_to_bundle(archive_dir: str, bundle_name: str, notes: List[Entry],
+                   lock_timeout: float | None) -> List[ArchivedNote]:
+    """
+    Add the notes' files to the bundle, creating it if needed, then add them to the index. The notes are appended to
+    the bundle rather than the bundle being rewritten. What the append overwrites is kept in a journal until it's done,
+    so that a bundle left half-written by a crash is rolled back the next time it's added to. The bundle stays locked
+    until the index is written, so that the index is never missing notes which can be removed.
+    """
+    bundle_path = os.path.join(archive_dir, bundle_name)
+    journal_path = bundle_path + ".journal"
+    index_path = os.path.join(archive_dir, INDEX_NAME)
+    archived = []
+    with FileLock(bundle_path, lock_timeout):
+        if os.path.exists(journal_path):
+            # left behind by an earlier run which crashed
+            _roll_back(bundle_path, journal_path)
+        _write_journal(bundle_path, journal_path)
+        try:
+            # zip files can't hold modification times before 1980. Earlier ones are recorded as 1980 instead of failing
+            with zipfile.ZipFile(bundle_path, 'a', compression=zipfile.ZIP_DEFLATED, strict_timestamps=False) as bundle:
+                taken = set(bundle.namelist())
+                for note in notes:
+                    member = _unique_member_name(os.path.basename(note.path), taken)
+                    taken.add(member)
+                    # the file's modification time is kept within the bundle
+                    bundle.write(note.path, arcname=member)
+                    archived.append(ArchivedNote(title=note.title, bundle=bundle_name, member=member,
+                                                 archived=datetime.now(), size=os.path.getsize(note.path)))
+            with open(bundle_path, 'r+b') as f:
+                os.fsync(f.fileno())
+        except BaseException:
+            _roll_back(bundle_path, journal_path)
+            raise
+        os.remove(journal_path)
+
+        with FileLock(index_path, lock_timeout), open(index_path, 'a') as f:
+            f.write("".join(entry.to_json() + "\n" for entry in archived))
+    return archived
+
+
+def archive_notes(notes: List[Entry], archive_dir: str, lock_timeout: float | None = None) -> List[Entry]:
+    """
+    Add copies of the given notes to their months' bundles in the archive directory, and to its index. The notes
+    themselves are left in place. If a bundle can't be written, the notes meant for it are reported and left out.
+    :param notes: the notes to archive
+    :param archive_dir: the archive directory. Created if needed
+    :param lock_timeout: how long to wait for another program archiving to the same bundle. Defaults to
+    FILE_LOCK_TIMEOUT_SECONDS in params.py
+    :return: the notes which were archived, and so may be removed
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    notes_by_bundle: Dict[str, List[Entry]] = {}
+    for note in notes:
+        notes_by_bundle.setdefault(bundle_name_of(month_of(note)), []).append(note)
+
+    archived_notes = []
+    for bundle_name, bundle_notes in sorted(notes_by_bundle.items()):
+        try:
+            _add_to_bundle(archive_dir, bundle_name, bundle_notes, lock_timeout)
+        except Exception as e:
+            print(f"Failed to archive {len(bundle_notes)} notes to `{bundle_name}`. Error: {e}. These files will be "
+                  f"left in place and untouched")
+        else:
+            archived_notes += bundle_notes
+    return archived_notes
+
+
+def pack_loose_notes(archive_dir: str, extensions: Tuple[str, ...], lock_timeout: float | None = None) -> int:
+    """
+    Move the notes kept as individual files directly within the archive directory, e.g. those archived before bundles
+    were used, into their months' bundles.
+    :param archive_dir: the archive directory
+    :param extensions: the extensions of the files that are considered notes
+    :param lock_timeout: as in archive_notes
+    :return: how many notes were packed
+    """
+    notes = []
+    with os.scandir(archive_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(extensions):
+                with open(entry.path) as f:
+                    notes.append(Entry(title=os.path.splitext(entry.name)[0], text=f.read(), path=entry.path,
+                                       edit_timestamp=datetime.fromtimestamp(entry.stat().st_mtime)))
+
+    archived = archive_notes(sorted(notes, key=lambda note: note.path), archive_dir, lock_timeout)
+    for note in archived:
+        os.remove(note.path)
+    return len(archived)
+
+
+def list_archived_notes(archive_dir: str) -> List[ArchivedNote]:
+    """
+    Return every note in the archive directory's index, in the order they were archived. Lines which can't be read,
+    e.g. one cut short by a crash, are skipped.
+    """
+    index_path = os.path.join(archive_dir, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return []
+    archived = []
+    with open(index_path) as f:
+        for line in f:
+            try:
+                archived.append(ArchivedNote.from_json(line))
+            except (ValueError, TypeError, KeyError):
+                continue
+    return archived
+
+
+def find_archived_notes(archive_dir: str, text: str) -> List[ArchivedNote]:
+    # return the archived notes whose title or file name contains the given text, case-insensitively
+    text = text.casefold()
+    return [note for note in list_archived_notes(archive_dir)
+            if text in note.title.casefold() or text in note.member.casefold()]
+
+
+def extract_note(archive_dir: str, archived: ArchivedNote, destination_dir: str) -> str:
+    """
+    Extract an archived note into the given directory, under its file name within its bundle. The note stays archived.
+    Raise FileExistsError rather than overwrite a file.
+    :return: the extracted note's path
+    """
+    destination = os.path.join(destination_dir, archived.member)
+    if os.path.exists(destination):
+        raise FileExistsError(f"Won't overwrite `{destination}`")
+    os.makedirs(destination_dir, exist_ok=True)
+    with zipfile.ZipFile(os.path.join(archive_dir, archived.bundle)) as bundle:
+        info = bundle.getinfo(archived.member)
+        with bundle.open(info) as source, open(destination, 'wb') as f:
+            shutil.copyfileobj(source, f)
+    # restore the note's modification time, which the tools read as its edit time
+    modified = datetime(*info.date_time).timestamp()
+    os.utime(destination, (modified, modified))
+    return destination
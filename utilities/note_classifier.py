@@ -0,0 +1,97 @@
+# decides whether a note file is a workout note, the bodyweights note or some other note, from its title and a bounded
+# read of its end, so that other notes (journals, meeting notes, etc.) needn't be read in full. Workout notes end with
+# their time estimate line, so that's the only place it's looked for.
+import io
+import os
+
+import utilities.params as p
+import utilities.run_metrics as rm
+from utilities.shared_types import EST_XX_MINS_REGEX
+
+WORKOUT = "workout"
+BODYWEIGHTS = "bodyweights"
+OTHER = "other"
+
+# the number of bytes read from the end of each note file to look for a time estimate line
+TAIL_BYTES = 4096
+
+
+def _read_tail_bytes(path: str, size: int, tail_bytes: int = TAIL_BYTES) -> bytes:
+    with open(path, 'rb') as f:
+        if size > tail_bytes:
+            f.seek(size - tail_bytes)
+        tail = f.read(tail_bytes)
+    rm.count(rm.BYTES_READ, len(tail))
+    return tail
+
+
+def read_tail(path: str, size: int, tail_bytes: int = TAIL_BYTES) -> str:
+    """
+    Return up to the last tail_bytes bytes of the file, decoded. A character cut in two at the start is dropped.
+    :param path: the file's path
+    :param size: the file's size in bytes, e.g. from the stat call made when it was found
+    :param tail_bytes: the maximum number of bytes to read
+    """
+    return _read_tail_bytes(path, size, tail_bytes).decode(errors='ignore')
+
+
+def _classify_by_title(path: str, title: str | None, bodyweights_note_title: str | None) -> str | None:
+    # return BODYWEIGHTS if the note's title says so, otherwise None, as its text has to be looked at
+    if title is None:
+        title = os.path.splitext(os.path.basename(path))[0]
+    if bodyweights_note_title is None:
+        bodyweights_note_title = p.BODYWEIGHTS_NOTE_TITLE
+    return BODYWEIGHTS if title.casefold().strip() == bodyweights_note_title.casefold().strip() else None
+
+
+def _decode(data: bytes) -> str:
+    # decode a note file's bytes as open(path, 'r') would: in the default encoding, with universal newlines
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+
+def classify_note_file(path: str, size: int, title: str | None = None,
+                       bodyweights_note_title: str | None = None) -> str:
+    """
+    Return WORKOUT, BODYWEIGHTS or OTHER for the note file at the given path, reading at most TAIL_BYTES of it. A note
+    is classified as WORKOUT if its time estimate line is within its last TAIL_BYTES, which is always the case when that
+    line is the note's last, as WorkoutsToExcel expects. WORKOUT notes may still turn out to be invalid once read, e.g.
+    if their title has no date.
+    :param path: the file's path
+    :param size: the file's size in bytes
+    :param title: the note's title. Defaults to the filename without its extension
+    :param bodyweights_note_title: the bodyweights note's title. Defaults to the one in params.py
+    :return: the classification
+    """
+    if classification := _classify_by_title(path, title, bodyweights_note_title):
+        return classification
+    if EST_XX_MINS_REGEX.search(read_tail(path, size)):
+        return WORKOUT
+    return OTHER
+
+
+def read_note_if_relevant(path: str, size: int, title: str | None = None,
+                          bodyweights_note_title: str | None = None) -> str | None:
+    """
+    Return the text of the note file at the given path, unless classify_note_file would classify it as OTHER, in which
+    case return None. The end of the file read to classify it isn't read again, so no byte is read twice.
+    :param path: the file's path
+    :param size: the file's size in bytes
+    :param title: as in classify_note_file
+    :param bodyweights_note_title: as in classify_note_file
+    :return: the note's text, or None
+    """
+    if _classify_by_title(path, title, bodyweights_note_title):
+        with open(path, 'rb') as f:
+            data = f.read()
+        rm.count(rm.BYTES_READ, len(data))
+        return _decode(data)
+
+    tail = _read_tail_bytes(path, size)
+    if not EST_XX_MINS_REGEX.search(tail.decode(errors='ignore')):
+        return None
+    head = b""
+    if len(tail) < size:
+        with open(path, 'rb') as f:
+            head = f.read(size - len(tail))
+        rm.count(rm.BYTES_READ, len(head))
+    return _decode(head + tail)
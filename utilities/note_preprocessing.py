@@ -0,0 +1,89 @@
+# splits a note's text into its Obsidian properties, its body, and its non-comment lines, once per distinct text. Every
+# tool which reads note text goes through here, so a note parsed by one stage (e.g. WorkoutsToExcel) isn't split again
+# by the next (e.g. NotePruner) within the same process.
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Tuple
+
+# Obsidian uses these 3 dashes to indicate the start and end of a properties section
+OBSIDIAN_SEPARATOR = "---"
+
+# the number of preprocessed notes kept. Once exceeded, the least recently used are evicted
+MAX_CACHED_NOTES = 4096
+
+
+@dataclass(frozen=True)
+class PreprocessedNote:
+    # the start and end offsets of the Obsidian properties section within the note's text, including both separator
+    # lines, or None if the note has no properties
+    properties_span: Tuple[int, int] | None
+    # the note's text without its properties
+    body: str
+    # the body's lines which aren't empty or comments, stripped. Lines holding only whitespace become empty strings
+    non_comment_lines: Tuple[str, ...]
+
+
+def line_is_comment(line: str) -> bool:
+    """
+    Return True if the input string matches the format used by comment lines, i.e. it starts with either "/" or "(".
+    :param line: the string to process
+    :return: True or False
+    """
+    return line.startswith(('/', '('))
+
+
+def _find_properties_end(text: str) -> int | None:
+    # return the offset just past the line closing the properties section, or None if there's no properties section
+    if not text.startswith(OBSIDIAN_SEPARATOR):
+        return None
+
+    start = text.find('\n') + 1
+    while start:
+        end = text.find('\n', start)
+        line = text[start:] if end == -1 else text[start:end]
+        if line.strip() == OBSIDIAN_SEPARATOR:
+            return len(text) if end == -1 else end + 1
+        start = end + 1
+    raise ValueError("Found Obsidian separator only at start of note, but it's expected to occur twice")
+
+
+def _preprocess(text: str) -> PreprocessedNote:
+    properties_end = _find_properties_end(text)
+    body = text if properties_end is None else text[properties_end:]
+    # comment lines are those starting with a comment character, before stripping
+    non_comment_lines = tuple(line.strip() for line in body.split('\n') if line and not line_is_comment(line))
+    return PreprocessedNote(properties_span=None if properties_end is None else (0, properties_end),
+                            body=body,
+                            non_comment_lines=non_comment_lines)
+
+
+_cache: OrderedDict[bytes, PreprocessedNote] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def preprocess_note(text: str) -> PreprocessedNote:
+    """
+    Return the note's properties span, body and non-comment lines. Results are memoized by a hash of the text, so that
+    notes with the same content are only split once. Raise ValueError if the properties section isn't closed.
+    :param text: the note's full text
+    :return: the preprocessed note
+    """
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _cache_lock:
+        if (preprocessed := _cache.get(key)) is not None:
+            _cache.move_to_end(key)
+            return preprocessed
+
+    preprocessed = _preprocess(text)
+    with _cache_lock:
+        _cache[key] = preprocessed
+        while len(_cache) > MAX_CACHED_NOTES:
+            _cache.popitem(last=False)
+    return preprocessed
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
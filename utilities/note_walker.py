@@ -0,0 +1,170 @@
+# finds note files within a notes directory, skipping ignored files and directories.
+import os
+import re
+from typing import Iterator, List, Tuple
+
+from utilities.config import Config
+
+
+def _translate_pattern(pattern: str) -> str:
+    # translate a gitignore-style glob into a regular expression matching a relative path
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            # zero or more directories
+            regex += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[' and (end := pattern.find(']', i + 1)) != -1:
+            char_class = pattern[i + 1:end]
+            if char_class.startswith('!'):
+                char_class = '^' + char_class[1:]
+            regex += '[' + char_class.replace('\\', '\\\\') + ']'
+            i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class IgnoreRules:
+    # A subset of gitignore syntax, matched against paths relative to the notes directory:
+    #  - blank lines and lines starting with "#" are skipped
+    #  - "*" matches anything except "/", "?" matches one character except "/", "[...]" matches a character class, and
+    #    "**" matches across directories
+    #  - a pattern ending in "/" only matches directories
+    #  - a pattern containing any other "/" is anchored to the notes directory. Otherwise it matches at any depth
+    #  - a pattern starting with "!" re-includes paths excluded by an earlier pattern
+    # Matching is case-insensitive, since notes are often synced across case-insensitive filesystems.
+    def __init__(self, patterns: List[str]):
+        # each rule is (compiled regex, negated, directories only)
+        self._rules: List[Tuple[re.Pattern, bool, bool]] = []
+        # most vaults only ignore directories, in which case files needn't be matched at all
+        self.has_file_rules = False
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negated = pattern.startswith('!')
+            pattern = pattern.lstrip('!')
+            dirs_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if '/' in pattern:
+                regex = _translate_pattern(pattern.lstrip('/'))
+            else:
+                regex = '(?:.*/)?' + _translate_pattern(pattern)
+            self._rules.append((re.compile(regex + '$', re.IGNORECASE | re.DOTALL), negated, dirs_only))
+            self.has_file_rules |= not dirs_only
+
+    def is_ignored(self, relative_path: str, is_dir: bool) -> bool:
+        """
+        Return whether the given path is ignored. As with gitignore, the last matching rule wins.
+        :param relative_path: the path, relative to the notes directory, using "/" as the separator
+        :param is_dir: whether the path is a directory
+        """
+        ignored = False
+        for regex, negated, dirs_only in self._rules:
+            if dirs_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                ignored = not negated
+        return ignored
+
+
+class NoteWalker:
+    # Walks a notes directory with os.scandir, which provides each entry's type without a stat call per entry. Ignored
+    # directories aren't descended into, and directories deeper than max_depth levels below the notes directory are
+    # skipped.
+    def __init__(self, root: str, extensions: Tuple[str, ...], ignore_rules: IgnoreRules, ignore_dirs: List[str],
+                 max_depth: int):
+        self.root = root
+        self._root_prefix = os.path.join(root, '')
+        self.extensions = extensions
+        self._ignore_rules = ignore_rules
+        # full paths of directories to skip, e.g. backup directories located within the notes directory
+        self._ignore_dirs = {os.path.normpath(d) for d in ignore_dirs}
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_params(cls, root: str, extensions: Tuple[str, ...], ignore_dirs: List[str] | None = None) -> 'NoteWalker':
+        # return a walker configured by params.py
+        return cls.from_config(Config.from_params(), root, extensions, ignore_dirs)
+
+    @classmethod
+    def from_config(cls, config: Config, root: str, extensions: Tuple[str, ...],
+                    ignore_dirs: List[str] | None = None) -> 'NoteWalker':
+        # return a walker configured by the given settings
+        if ignore_dirs is None:
+            ignore_dirs = [config.local_excel_backup_dir]
+        return cls(root, extensions, IgnoreRules(config.note_ignore_patterns), ignore_dirs,
+                   config.max_note_search_depth)
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        # return whether the file or directory at the given full path is ignored
+        if is_dir and os.path.normpath(path) in self._ignore_dirs:
+            return True
+        if not is_dir and not self._ignore_rules.has_file_rules:
+            return False
+        return self._ignore_rules.is_ignored(self._relative_path(path), is_dir)
+
+    def _relative_path(self, path: str) -> str:
+        # paths found by walking start with the root, so avoid the cost of os.path.relpath for them
+        if path.startswith(self._root_prefix):
+            relative_path = path[len(self._root_prefix):]
+        else:
+            relative_path = os.path.relpath(path, self.root)
+        return relative_path.replace(os.sep, '/')
+
+    def is_note(self, entry: os.DirEntry) -> bool:
+        # return whether the given directory entry is a note file which isn't ignored
+        return (entry.name.endswith(self.extensions) and entry.is_file()
+                and not self.is_ignored(entry.path, is_dir=False))
+
+    def list_directory(self, directory: str) -> Tuple[List[os.DirEntry], List[os.DirEntry]]:
+        """
+        List a single directory.
+        :return: the note files in the directory, and its subdirectories which aren't ignored
+        """
+        notes, subdirs = [], []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if not self.is_ignored(entry.path, is_dir=True):
+                        subdirs.append(entry)
+                elif self.is_note(entry):
+                    notes.append(entry)
+        return notes, subdirs
+
+    def walk_directories(self, directory: str | None = None, depth: int = 0) -> Iterator[str]:
+        # yield the notes directory, then every subdirectory within the depth limit which isn't ignored
+        directory = directory or self.root
+        yield directory
+        if depth >= self.max_depth:
+            return
+        for subdir in self.list_directory(directory)[1]:
+            yield from self.walk_directories(subdir.path, depth + 1)
+
+    def walk(self, directory: str | None = None, depth: int = 0) -> Iterator[os.DirEntry]:
+        """
+        Yield a DirEntry for every note file in the notes directory and its subdirectories, in directory order. Note
+        that DirEntry caches its stat result, so callers can retrieve modification times without another system call
+        per file on platforms which provide them while listing.
+        """
+        directory = directory or self.root
+        notes, subdirs = self.list_directory(directory)
+        for entry in notes:
+            yield entry
+        if depth >= self.max_depth:
+            return
+        for subdir in subdirs:
+            yield from self.walk(subdir.path, depth + 1)
@@ -0,0 +1,123 @@
+# watches the notes directory for notes being created, modified or deleted.
+import os
+import time
+from typing import Dict, List, Set, Tuple
+
+from utilities.config import Config
+from utilities.note_walker import NoteWalker
+
+try:
+    # optional. Without it, we fall back to polling file modification times
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+class PollingWatcher:
+    # detects changes by comparing file modification times between scans of the directory tree
+    def __init__(self, directory: str, extensions: Tuple[str, ...], ignore_dirs: List[str], interval: float = 5,
+                 config: Config | None = None):
+        # the walker follows the ignore patterns and search depth of the given settings, or those in params.py
+        self._walker = NoteWalker.from_config(config or Config.from_params(), directory, extensions, ignore_dirs)
+        self._interval = interval
+        self._mtimes: Dict[str, float] = self._scan()
+
+    def _scan(self) -> Dict[str, float]:
+        mtimes = {}
+        for entry in self._walker.walk():
+            try:
+                mtimes[entry.path] = entry.stat().st_mtime
+            except FileNotFoundError:
+                # deleted since it was listed
+                continue
+        return mtimes
+
+    def wait_for_changes(self) -> Set[str]:
+        """
+        Wait for one polling interval, then return the paths of all notes created, modified or deleted since the
+        previous call.
+        """
+        time.sleep(self._interval)
+        mtimes = self._scan()
+        changed = {path for path in mtimes.keys() | self._mtimes.keys() if mtimes.get(path) != self._mtimes.get(path)}
+        self._mtimes = mtimes
+        return changed
+
+
+class InotifyWatcher:
+    # detects changes using Linux inotify events, which avoids rescanning the directory tree
+    _FILE_FLAGS = (flags.CLOSE_WRITE | flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO
+                   if INotify else 0)
+
+    def __init__(self, directory: str, extensions: Tuple[str, ...], ignore_dirs: List[str], interval: float = 5,
+                 config: Config | None = None):
+        self._walker = NoteWalker.from_config(config or Config.from_params(), directory, extensions, ignore_dirs)
+        self._interval = interval
+        self._inotify = INotify()
+        self._dir_by_watch: Dict[int, str] = {}
+        self._add_watches(directory)
+
+    def _add_watches(self, directory: str) -> None:
+        for subdir in self._walker.walk_directories(directory, self._depth_of(directory)):
+            self._dir_by_watch[self._inotify.add_watch(subdir, self._FILE_FLAGS)] = subdir
+
+    def _depth_of(self, directory: str) -> int:
+        # how many levels the given directory is below the notes directory
+        relative_path = os.path.relpath(directory, self._walker.root)
+        return 0 if relative_path == os.curdir else relative_path.count(os.sep) + 1
+
+    def wait_for_changes(self) -> Set[str]:
+        """
+        Wait up to one polling interval for events, then return the paths of all notes created, modified or deleted
+        since the previous call.
+        """
+        changed = set()
+        for event in self._inotify.read(timeout=int(self._interval * 1000)):
+            directory = self._dir_by_watch.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = os.path.join(directory, event.name)
+            if event.mask & flags.ISDIR:
+                if (event.mask & (flags.CREATE | flags.MOVED_TO) and self._depth_of(path) <= self._walker.max_depth
+                        and not self._walker.is_ignored(path, is_dir=True)):
+                    # watch new directories too, and pick up any notes already inside them
+                    self._add_watches(path)
+                    changed.update(entry.path for entry in self._walker.walk(path, self._depth_of(path)))
+                continue
+            if path.endswith(self._walker.extensions) and not self._walker.is_ignored(path, is_dir=False):
+                changed.add(path)
+        return changed
+
+
+class CombinedWatcher:
+    # watches several directories, e.g. every notes source directory, as one. Create each directory's watcher with an
+    # equal share of the interval, so that changes anywhere are returned within one interval
+    def __init__(self, watchers: List):
+        self._watchers = watchers
+
+    def wait_for_changes(self) -> Set[str]:
+        changed = set()
+        for watcher in self._watchers:
+            changed |= watcher.wait_for_changes()
+        return changed
+
+
+def create_watcher(directory: str, extensions: Tuple[str, ...], ignore_dirs: List[str], interval: float = 5,
+                   config: Config | None = None):
+    # return an inotify based watcher if available, else a polling watcher
+    if INotify is not None:
+        try:
+            return InotifyWatcher(directory, extensions, ignore_dirs, interval, config)
+        except OSError as e:
+            # e.g. on filesystems which don't support inotify, or when the watch limit is reached
+            print(f"Failed to start inotify watcher ({e}). Falling back to polling")
+    return PollingWatcher(directory, extensions, ignore_dirs, interval, config)
+
+
+def create_combined_watcher(directories: List[str], extensions: Tuple[str, ...], ignore_dirs: List[str],
+                            interval: float = 5, config: Config | None = None):
+    # return a watcher of all the given directories, which returns their changes within one interval
+    if len(directories) == 1:
+        return create_watcher(directories[0], extensions, ignore_dirs, interval, config)
+    return CombinedWatcher([create_watcher(directory, extensions, ignore_dirs, interval / len(directories), config)
+                            for directory in directories])
@@ -6,8 +6,30 @@
 # These variables are only used if RETRIEVAL_METHOD is set to LOCAL_STR.
 # This specifies the full path of the directory containing the notes to be processed.
 LOCAL_NOTES_SOURCE_DIR = "/PATH/TO/WorkoutNotes"
+# This optionally specifies the full paths of further directories containing notes to be processed, e.g. a
+# phone-synced folder alongside a desktop folder. Notes from all directories are processed together, in a single run.
+ADDITIONAL_NOTES_SOURCE_DIRS = []
+# When workout notes for the same date are found in more than one of the above directories, this specifies which to use.
+# "mtime": use the most recently edited note.
+# "content": only drop notes whose contents exactly match another's. Differing notes are reported as duplicates.
+# The same applies to the bodyweights note.
+DUPLICATE_NOTE_RESOLUTION = "mtime"
+# These specify which files and directories within the above directories are skipped when looking for notes, using
+# gitignore-style patterns, matched case-insensitively. For example, "*backup*/" skips every directory with "backup" in
+# its name, "/Templates/" skips only the top-level Templates directory, and "*.excalidraw.md" skips those files.
+NOTE_IGNORE_PATTERNS = ["*backup*/"]
+# This specifies how many levels of subdirectories below the above directories are searched for notes.
+# integer >= 0
+MAX_NOTE_SEARCH_DEPTH = 5
 # This specifies the full path of the directory to which notes will be moved after being processed.
 LOCAL_NOTES_ARCHIVE_DIR = "/PATH/TO/WorkoutNotesArchive"
+# This specifies whether discarded notes are packed into one compressed bundle per month within the above directory,
+# e.g. "notes-2021-01.zip", rather than kept as individual files. Bundles keep the archive to a few files per year,
+# which keeps directory scans and sync clients fast however long the history grows. Run `NotePruner/main.py list` and
+# `NotePruner/main.py extract` to find and restore archived notes, and `NotePruner/main.py pack` to bundle notes which
+# were archived as individual files.
+# True or False
+ARCHIVE_NOTES_IN_BUNDLES = True
 # This specifies the full path for the directory into which the target Excel file will be backed up
 LOCAL_EXCEL_BACKUP_DIR = "/PATH/TO/ExcelBackupDirectory"
 
@@ -15,6 +37,55 @@ LOCAL_EXCEL_BACKUP_DIR = "/PATH/TO/ExcelBackupDirectory"
 TARGET_PATH = "/PATH/TO/ExcelToWriteTo.xlsx"
 # This specifies the unique sheet name within that spreadsheet to which workout and bodyweight data will be written.
 TARGET_SHEET = "Name Of Your Sheet"
+# To keep each year's data in a separate spreadsheet or sheet, include "{year}" in the path or sheet name above, e.g.
+# "/PATH/TO/Workouts {year}.xlsx" or "Log {year}". Data is then written to the spreadsheet or sheet of its date's year,
+# and only the years being read or written are loaded. Create each year's spreadsheet or sheet before it begins.
+
+# This specifies the full path of the file in which a compact copy of all written bodyweights is kept, alongside the
+# target spreadsheet. It's updated whenever bodyweights are written, and lets bodyweight trends be queried without
+# opening the spreadsheet. It's created from the spreadsheet's existing bodyweights if it doesn't exist yet.
+BODYWEIGHT_SERIES_PATH = "/PATH/TO/bodyweights.series"
+
+# This specifies whether dates written as text in the date column (e.g. "14 March 2021") are cached after being parsed,
+# in a hidden file next to the spreadsheet. The cache is discarded whenever the spreadsheet is changed by anything other
+# than these tools. Cells formatted as dates are unaffected by this.
+CACHE_PARSED_DATES = True
+
+# This specifies how the target spreadsheet is read when nothing is being written to it.
+# "streaming": only the columns needed are read, straight from the spreadsheet file. Much faster for large spreadsheets.
+# "openpyxl": the whole spreadsheet is loaded first, as it is when writing to it.
+SHEET_READER = "streaming"
+
+# Before the target spreadsheet or bodyweights note is modified, a lock is taken on it, so that tools running at the
+# same time (e.g. overlapping cron jobs) take turns writing. This specifies how long to wait for another tool to finish
+# writing, in seconds, before giving up without writing anything.
+FILE_LOCK_TIMEOUT_SECONDS = 600
+
+# This optionally specifies the full path of a directory in which every workout written to the target spreadsheet is
+# also stored as one row per set (date, exercise, load, unit, reps), in one file per month. This allows analysing
+# workouts, e.g. with a spreadsheet or pandas, without parsing the target spreadsheet. Leave empty to disable. To export
+# workouts written before this was enabled, run utilities/workout_export.py.
+WORKOUT_EXPORT_DIR = ""
+# "csv", or "parquet" for smaller, compressed, columnar files (requires the pyarrow package).
+WORKOUT_EXPORT_FORMAT = "csv"
+
+# This specifies the full path of the file in which PlanApply saves its plan of the changes to make, and from which it
+# applies them.
+CHANGE_PLAN_PATH = "/PATH/TO/changes.plan.json"
+
+# This optionally specifies the full path of a file to which every run of these tools adds a line recording what it did
+# (notes scanned, bytes read, workouts parsed, rows written, backups made) and how long each of its stages took. Run
+# RunStats to summarise it, and to find runs that were unusually slow. Leave empty to disable.
+RUN_METRICS_HISTORY_PATH = ""
+# This optionally specifies the full path of a directory to which every tool writes the metrics of its latest run, in
+# the Prometheus text format, e.g. node_exporter's textfile collector directory. Leave empty to disable.
+RUN_METRICS_TEXTFILE_DIR = ""
+# RunStats flags runs which took this many times as long, or read this many times as many bytes, as the median of the
+# same tool's previous RUN_STATS_BASELINE_RUNS runs. It also flags tools whose runs have been taking longer, or reading
+# more, by over RUN_STATS_MAX_MONTHLY_GROWTH_PCT percent a month over their last RUN_STATS_BASELINE_RUNS runs.
+RUN_STATS_OUTLIER_FACTOR = 1.5
+RUN_STATS_BASELINE_RUNS = 20
+RUN_STATS_MAX_MONTHLY_GROWTH_PCT = 10
 
 # These specify which columns the program expects to find dates, bodyweights and workouts in, within the
 # target spreadsheet. Note that the first column (A) maps to 1, not 0.
@@ -22,6 +93,19 @@ DATE_COLUMN = 2
 BODYWEIGHT_COLUMN = 3
 WORKOUT_COLUMN = 5
 
+# This specifies how many file operations (directory listings, reads, etc.) may be in progress at once when reading
+# and archiving notes. Values above 1 speed up slow storage, such as network mounts, where each operation spends most
+# of its time waiting. 1 means that files are processed one at a time.
+# integer > 0
+MAX_CONCURRENT_FILE_OPERATIONS = 1
+# This specifies whether notes are classified before being read. If so, only the end of each note file is read at
+# first, and notes which can't be workout notes or the bodyweights note (e.g. long journal entries) are skipped without
+# reading the rest. This speeds up retrieving notes from large vaults. Workout notes are found only if their time
+# estimate line is their last line, or at least within their last 4 KB: see utilities/note_classifier.py. Workout
+# notes with anything longer after that line would be missed, so this is off unless enabled.
+# True or False
+CLASSIFY_NOTES_BEFORE_READING = False
+
 # The note within which bodyweights are stored should have this title (case-insensitive)
 BODYWEIGHTS_NOTE_TITLE = "Bodyweights note"
 
@@ -34,5 +118,17 @@ HISTORY_LENGTH = 3
 # to the user for comparison. This value is an integer > 0 specifying the number of characters.
 SNIPPET_LENGTH = 31
 
+# NightlyRun discards workout notes older than this many days, if the target file already holds their workout exactly
+# as it would be written. 0 disables this. NotePruner is unaffected.
+# integer >= 0
+NIGHTLY_PRUNE_AFTER_DAYS = 0
+
+# This specifies the full path of the file listing the athletes for whom MultiAthleteRun does what NightlyRun does. See
+# utilities/athlete_profiles.py for its format.
+ATHLETE_PROFILES_PATH = "/PATH/TO/athletes.json"
+# This specifies how many athletes MultiAthleteRun processes at once, each in a process of its own. 0 means one per CPU.
+# integer >= 0
+MAX_PARALLEL_ATHLETES = 0
+
 # ______________________________________________________________________________________________________
 
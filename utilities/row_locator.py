@@ -0,0 +1,165 @@
+# finds the row holding a date in a target sheet's date column without scanning the column. The sheet has one row per
+# calendar day, in ascending order, so a date's row can be predicted from any other dated row by the number of days
+# between them, and checked by reading a single cell. Blank rows, e.g. at year boundaries, push later dates further
+# down the sheet than predicted, which is corrected for by predicting again from the row just read. Sheets which break
+# the arithmetic altogether are still searched correctly, only as slowly as by a scan.
+import bisect
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import utilities.sheet_reader as sr
+
+# the number of predictions made for a date before the rows between the nearest known dates are read one by one
+MAX_PREDICTIONS = 8
+
+
+class DateRowLocator:
+    # Predicts rows from anchors: rows whose dates have been read. The first anchors are the sheet's first and last
+    # dated rows, and every date read while locating another becomes an anchor, so later lookups start closer. Reuse one
+    # locator for many lookups in the same sheet, and don't use it on a sheet which is written to meanwhile.
+    def __init__(self, sheet, date_column: int):
+        """
+        :param sheet: an openpyxl sheet, or a reader of one
+        :param date_column: the column holding the dates, where the first column (A) is 1
+        """
+        self._reader = sr.reader_for(sheet)
+        self._date_column = date_column
+        self._date_cache = self._reader.date_cache
+        # the dates read so far, ascending, and the rows which hold them
+        self._anchor_dates: List[datetime] = []
+        self._anchor_rows: List[int] = []
+        # the first row of every date in the column, once it's had to be scanned
+        self._scanned_rows: Dict[datetime, int] | None = None
+
+        max_row = self._reader.max_row
+        if (first := self._find_dated_row(1, max_row + 1, 1)) is not None:
+            self._learn(*first)
+            # headers are at the top, so there's nothing dated above the first dated row
+            last = self._find_dated_row(max_row, first[0], -1)
+            if last is not None:
+                self._learn(*last)
+
+    def _date_at(self, row: int) -> datetime | None:
+        return self._date_cache.floored_date(row, self._reader.value(row, self._date_column))
+
+    def _find_dated_row(self, start: int, stop: int, step: int) -> Tuple[int, datetime] | None:
+        # return the first row from start towards stop (exclusive) that holds a date, and its date
+        for row in range(start, stop, step):
+            if (date := self._date_at(row)) is not None:
+                return row, date
+        return None
+
+    def _learn(self, row: int, date: datetime) -> None:
+        idx = bisect.bisect_left(self._anchor_dates, date)
+        if idx < len(self._anchor_dates) and self._anchor_dates[idx] == date:
+            # a duplicated date. Keep the first row, as a scan would find
+            self._anchor_rows[idx] = min(self._anchor_rows[idx], row)
+            return
+        self._anchor_dates.insert(idx, date)
+        self._anchor_rows.insert(idx, row)
+
+    def _predict(self, date: datetime) -> int:
+        # return the row holding the given date, found by calendar arithmetic between the nearest anchors, or -1
+        idx = bisect.bisect_left(self._anchor_dates, date)
+        if idx < len(self._anchor_dates) and self._anchor_dates[idx] == date:
+            return self._anchor_rows[idx]
+        if idx == 0 or idx == len(self._anchor_dates):
+            # earlier than the first dated row or later than the last
+            return -1
+        earlier_date, earlier_row = self._anchor_dates[idx - 1], self._anchor_rows[idx - 1]
+        later_date, later_row = self._anchor_dates[idx], self._anchor_rows[idx]
+
+        for _ in range(MAX_PREDICTIONS):
+            if later_row - earlier_row <= 1:
+                # no rows between the two, or the dates aren't in ascending order
+                return -1
+            # blank rows only push the date further down, so start from the row a day per row would put it in
+            predicted = min(earlier_row + (date - earlier_date).days, later_row - 1)
+            found = (self._find_dated_row(predicted, later_row, 1)
+                     or self._find_dated_row(predicted - 1, earlier_row, -1))
+            if found is None:
+                return -1
+            row, found_date = found
+            if found_date == date:
+                self._learn(row, found_date)
+                return row
+            if not earlier_date < found_date < later_date:
+                # the dates aren't in ascending order, so there's nothing to predict from
+                return -1
+            self._learn(row, found_date)
+            if found_date < date:
+                earlier_date, earlier_row = found_date, row
+            else:
+                later_date, later_row = found_date, row
+
+        # many gaps or missing days. Read the rows left between the nearest dates one by one
+        for row in range(earlier_row + 1, later_row):
+            if self._date_at(row) == date:
+                return row
+        return -1
+
+    def _scan(self) -> Dict[datetime, int]:
+        # read the whole column once, keeping the first row of each date, so that later misses don't read it again
+        if self._scanned_rows is None:
+            self._scanned_rows = {}
+            for row, (value,) in self._reader.iter_columns([self._date_column]):
+                if (date := self._date_cache.floored_date(row, value)) is not None:
+                    self._scanned_rows.setdefault(date, row)
+        return self._scanned_rows
+
+    def _is_in_order(self, row: int, date: datetime) -> bool:
+        # whether the nearest dated rows above and below the given row, which holds the given date, hold an earlier and
+        # a later (or the same) date. If not, the date may well be somewhere else in the sheet too
+        above = self._find_dated_row(row - 1, 0, -1)
+        below = self._find_dated_row(row + 1, self._reader.max_row + 1, 1)
+        return (above is None or above[1] < date) and (below is None or below[1] >= date)
+
+    def row_of(self, date: datetime) -> int:
+        """
+        Return the first row holding the given date, or -1 if there's none. On sheets with one row per day this reads
+        a few cells, however long the sheet is. Only if the date isn't found that way, or is found among dates out of
+        order, is the whole column scanned, to be sure it isn't somewhere else. The scan is kept for later lookups.
+        :param date: the date to look for. Any time component is ignored.
+        :return: a row number, or -1
+        """
+        date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self._scanned_rows is not None:
+            return self._scanned_rows.get(date, -1)
+        row = self._predict(date)
+        if row != -1:
+            # if the date is duplicated, it's most likely in the row just above
+            while row > 1 and self._date_at(row - 1) == date:
+                row -= 1
+            if self._is_in_order(row, date):
+                self._learn(row, date)
+                return row
+        return self._scan().get(date, -1)
+
+    def row_range(self, min_date: datetime | None, max_date: datetime | None) -> Tuple[int, int] | None:
+        """
+        Return the first and last rows, inclusive, between which the dates from min_date to max_date are found, so that
+        only those rows need reading. If both dates are found among dates in order, that's from the first row of
+        min_date to the last of max_date, and only a few cells are read. Otherwise the whole column has been scanned,
+        and the range runs from the first row of any date within it to the end of the sheet, so that duplicates further
+        down are still read.
+        :param min_date: the inclusive start of the dates, or None for no start. Any time component is ignored.
+        :param max_date: the inclusive end of the dates, or None for no end. Any time component is ignored.
+        :return: (first row, last row), or None if no date within the range is in the sheet
+        """
+        if min_date is not None:
+            min_date = min_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if max_date is not None:
+            max_date = max_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        max_row = self._reader.max_row
+        first = 1 if min_date is None else self.row_of(min_date)
+        last = max_row if max_date is None else self.row_of(max_date)
+
+        if self._scanned_rows is not None:
+            rows = [row for date, row in self._scanned_rows.items()
+                    if (min_date is None or min_date <= date) and (max_date is None or date <= max_date)]
+            return (min(rows), max_row) if rows else None
+        if max_date is not None:
+            # the rows repeating max_date, if it's duplicated
+            while last < max_row and self._date_at(last + 1) == max_date:
+                last += 1
+        return first, last
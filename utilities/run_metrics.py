@@ -0,0 +1,195 @@
+# records what each run of the tools did and how long each stage of it took, so that scheduled runs can be monitored.
+# Each run appends a line of JSON to RUN_METRICS_HISTORY_PATH, and writes its metrics to RUN_METRICS_TEXTFILE_DIR in the
+# Prometheus text format, for node_exporter's textfile collector. RunStats summarises the history.
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, TypeVar
+
+import utilities.params as p
+
+NOTES_SCANNED = "notes_scanned"
+BYTES_READ = "bytes_read"
+WORKOUTS_PARSED = "workouts_parsed"
+ROWS_WRITTEN = "rows_written"
+BACKUPS_MADE = "backups_made"
+# each counter, and what it counts
+COUNTER_DESCRIPTIONS = {
+    NOTES_SCANNED: "Note files found in the notes directories",
+    BYTES_READ: "Bytes read from note files",
+    WORKOUTS_PARSED: "Workouts parsed from workout notes",
+    ROWS_WRITTEN: "Target sheet rows written to",
+    BACKUPS_MADE: "Backups made of the target file and bodyweights note",
+}
+
+# the prefix of every exported Prometheus metric's name
+METRIC_PREFIX = "workout_notes"
+
+
+@dataclass
+class RunRecord:
+    tool: str
+    started: datetime
+    duration_seconds: float = 0.0
+    # False if the run raised an exception, or exited with an error code
+    succeeded: bool = True
+    counters: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(COUNTER_DESCRIPTIONS, 0))
+    # stage name -> seconds spent in it
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    def metric(self, name: str) -> float:
+        # return "duration_seconds", or one of the counters
+        return self.duration_seconds if name == "duration_seconds" else self.counters.get(name, 0)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(',', ':'), default=datetime.isoformat)
+
+    @classmethod
+    def from_json(cls, line: str) -> 'RunRecord':
+        as_dict = json.loads(line)
+        return cls(**(as_dict | {"started": datetime.fromisoformat(as_dict["started"])}))
+
+
+# the run being recorded in this thread or task, if any, so that runs in different threads are recorded separately.
+# Worker threads which count towards a run, e.g. those reading notes concurrently, share it through in_current_run.
+# Hence the lock
+_current: contextvars.ContextVar[RunRecord | None] = contextvars.ContextVar("current_run", default=None)
+_lock = threading.Lock()
+
+
+T = TypeVar('T')
+
+
+def in_current_run(func: Callable[..., T]) -> Callable[..., T]:
+    # wrap the function so that, when it's called in another thread, e.g. by a ThreadPoolExecutor, its counters and
+    # stages are added to the run being recorded here. asyncio tasks and asyncio.to_thread do this by themselves
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def count(counter: str, amount: int = 1) -> None:
+    # add to one of the current run's counters. Does nothing outside a recorded run, e.g. in tests
+    if (current := _current.get()) is not None:
+        with _lock:
+            current.counters[counter] = current.counters.get(counter, 0) + amount
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    # time the with block as a stage of the current run. Time spent in the same stage more than once is added up
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if (current := _current.get()) is not None:
+            with _lock:
+                current.stage_seconds[name] = current.stage_seconds.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def record_run(tool: str) -> Iterator[RunRecord]:
+    """
+    Record the with block, or the decorated function, as a run of the given tool. Once it's done, even if it raised or
+    called exit(), the run is added to the history and exported, as specified in params.py.
+    :param tool: the tool's name, e.g. "NightlyRun"
+    :return: the run's record
+    """
+    record = RunRecord(tool=tool, started=datetime.now())
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except SystemExit as e:
+        # most tools call exit() when there's nothing to do, which isn't a failure
+        record.succeeded = e.code in (None, 0)
+        raise
+    except BaseException:
+        record.succeeded = False
+        raise
+    finally:
+        record.duration_seconds = time.perf_counter() - start
+        _current.reset(token)
+        _publish(record)
+
+
+def _publish(record: RunRecord) -> None:
+    # a run's results matter more than its metrics, so failing to save them is reported, not raised
+    try:
+        if p.RUN_METRICS_HISTORY_PATH:
+            append_to_history(record, p.RUN_METRICS_HISTORY_PATH)
+        if p.RUN_METRICS_TEXTFILE_DIR:
+            write_textfile(record, p.RUN_METRICS_TEXTFILE_DIR)
+    except OSError as e:
+        print(f"Failed to save this run's metrics. Error: {e}")
+
+
+def append_to_history(record: RunRecord, path: str) -> None:
+    # each record is appended in a single write, so that tools finishing at the same time don't interleave their lines
+    with open(path, 'a') as f:
+        f.write(record.to_json() + "\n")
+
+
+def load_history(path: str) -> List[RunRecord]:
+    """
+    Return the runs recorded in the history file at the given path, oldest first. Lines which can't be read, e.g. one
+    cut short by a crash, are skipped.
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(RunRecord.from_json(line))
+            except (ValueError, TypeError, KeyError):
+                continue
+    return records
+
+
+def textfile_path_of(tool: str, directory: str) -> str:
+    # each tool has its own file, so that the latest run of every tool is exported. e.g. "NightlyRun" -> nightlyrun.prom
+    filename = re.sub(r'\W+', '_', tool).strip('_').lower()
+    return os.path.join(directory, f"{filename}.prom")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_textfile(record: RunRecord) -> str:
+    # return the run's metrics in the Prometheus text exposition format
+    tool = f'tool="{_escape_label(record.tool)}"'
+    lines = []
+
+    def add_gauge(name: str, description: str, samples: Dict[str, float]) -> None:
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {description}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+        lines.extend(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}" for labels, value in samples.items())
+
+    add_gauge("run_timestamp_seconds", "When the last run started, as a Unix timestamp",
+              {tool: record.started.timestamp()})
+    add_gauge("run_duration_seconds", "How long the last run took", {tool: record.duration_seconds})
+    add_gauge("run_succeeded", "1 if the last run succeeded, otherwise 0", {tool: int(record.succeeded)})
+    for counter, description in COUNTER_DESCRIPTIONS.items():
+        add_gauge(counter, f"{description} in the last run", {tool: record.counters.get(counter, 0)})
+    if record.stage_seconds:
+        add_gauge("stage_duration_seconds", "How long each stage of the last run took",
+                  {f'{tool},stage="{_escape_label(name)}"': seconds for name, seconds in record.stage_seconds.items()})
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(record: RunRecord, directory: str) -> None:
+    # the file is replaced rather than rewritten, so that the collector never reads it half-written
+    os.makedirs(directory, exist_ok=True)
+    path = textfile_path_of(record.tool, directory)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(format_textfile(record))
+    os.replace(temp_path, path)
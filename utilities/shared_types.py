@@ -1,32 +1,93 @@
 # shared type hints
+import os
 import re
+import sys
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
 from datetime import datetime
 from typing import List
 
+import utilities.params as p
 import utilities.utility_functions as uf
 
+# "est ", followed by 1-3 digits or "?" characters, followed by " min" (case-insensitive). For example:
+# "Est 52 min", "est 5 mins", "Est ? mins", "est ?? mins"
+EST_XX_MINS_REGEX = re.compile(r'est (\d{1,3})|(\?{1,3}) min', re.IGNORECASE)
 
-@dataclass()
-class Entry:
-    # contains the title and contents of a note, plus relevant metadata
-    text: str
-    title: str
-    edit_timestamp: datetime | None = None
 
-    path: str | None = None  # this is the full path to the file
-    unique_identifier: str | None = None
+class Entry:
+    # contains the title and contents of a note, plus relevant metadata.
+    # Many thousands of these can be alive at once (one per note in the vault), so instances are slotted and kept
+    # compact: the directory part of the path is interned (notes share a handful of directories), the title is only
+    # stored if it differs from the filename, and the floored date is stored as a day ordinal.
+    __slots__ = ('text', '_title', 'edit_timestamp', '_directory', '_filename', 'unique_identifier', '_date_ordinal')
+
+    def __init__(self,
+                 text: str,
+                 title: str,
+                 edit_timestamp: datetime | None = None,
+                 path: str | None = None,  # this is the full path to the file
+                 unique_identifier: str | None = None):
+        self.text = text
+        self.edit_timestamp = edit_timestamp
+        self.unique_identifier = unique_identifier
+        self.path = path
+        self.title = title
 
-    def __post_init__(self):
         # if the note is a workout note, parse the title to get the date, else set it to None.
-        self.floored_datetime: datetime | None = None
+        self._date_ordinal: int | None = None
         if self.is_valid_workout_note(raise_on_invalid_format=False):
             # given a title like "2023-07-20 Deadlift day cycle 13 week 1.md", convert it to a datetime
             date_str = self.title.split()[0]
-            self.floored_datetime = (
-                uf.convert_string_to_datetime(date_str, regress_future_dates=False)
-                .replace(hour=0, minute=0, second=0, microsecond=0))
+            self.floored_datetime = uf.convert_string_to_datetime(date_str, regress_future_dates=False)
+
+    @property
+    def path(self) -> str | None:
+        if self._filename is None:
+            return None
+        return os.path.join(self._directory, self._filename)
+
+    @path.setter
+    def path(self, path: str | None) -> None:
+        # if the title is currently derived from the filename, pin it, so that moving the note doesn't rename it
+        title = self.title if getattr(self, '_title', '') is None else None
+
+        if path is None:
+            self._directory, self._filename = None, None
+        else:
+            directory, self._filename = os.path.split(path)
+            self._directory = sys.intern(directory)
+
+        if title is not None:
+            self.title = title
+
+    @property
+    def title(self) -> str:
+        if self._title is None:
+            return os.path.splitext(self._filename)[0]
+        return self._title
+
+    @title.setter
+    def title(self, title: str) -> None:
+        # titles are usually the filename minus its extension. In that case, don't store a second copy
+        if self._filename is not None and title == os.path.splitext(self._filename)[0]:
+            self._title = None
+        else:
+            self._title = title
+
+    @property
+    def floored_datetime(self) -> datetime | None:
+        if self._date_ordinal is None:
+            return None
+        return datetime.fromordinal(self._date_ordinal)
+
+    @floored_datetime.setter
+    def floored_datetime(self, value: datetime | None) -> None:
+        self._date_ordinal = None if value is None else value.toordinal()
+
+    def is_bodyweights_note(self, bodyweights_note_title: str | None = None) -> bool:
+        # the bodyweights note's title defaults to the one in params.py
+        title = p.BODYWEIGHTS_NOTE_TITLE if bodyweights_note_title is None else bodyweights_note_title
+        return self.title.casefold().strip() == title.casefold().strip()
 
     def is_valid_workout_note(self, raise_on_invalid_format=False, skip_todo_titles=True) -> bool:
         """
@@ -41,10 +102,7 @@ class Entry:
         :return: A boolean indicating whether the note is a valid workout note.
         """
 
-        # "est ", followed by 1-3 digits or "?" characters, followed by " min" (case-insensitive). For example:
-        # "Est 52 min", "est 5 mins", "Est ? mins", "est ?? mins"
-        est_xx_mins_reg = re.compile(r'est (\d{1,3})|(\?{1,3}) min', re.IGNORECASE)
-        if not bool(re.search(est_xx_mins_reg, self.text)):
+        if not bool(re.search(EST_XX_MINS_REGEX, self.text)):
             return False
 
         if "todo" in self.title.lower() and skip_todo_titles:
@@ -67,6 +125,15 @@ class Entry:
             raise ValueError("Invalid workout note format")
         return False
 
+    def __eq__(self, other):
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return ((self.text, self.title, self.edit_timestamp, self.path, self.unique_identifier) ==
+                (other.text, other.title, other.edit_timestamp, other.path, other.unique_identifier))
+
+    # entries are mutable and compare by value, so they're unhashable
+    __hash__ = None
+
     def __repr__(self):
         return (f"Entry(title='{self.title}', text='{self.text[:20]}...', edit_timestamp={self.edit_timestamp}, "
                 f"unique_identifier={self.unique_identifier})")
@@ -93,3 +160,25 @@ class Handler(ABC):
     def discard_notes(self, notes: List[Entry]) -> None:
         # perform some tidy-up of the given notes. This could entail trashing, deletion, or archiving, for example.
         pass
+
+
+class AsyncHandler(ABC):
+    # the asynchronous equivalent of Handler. Implementations can overlap slow I/O, such as on network mounts
+    @abstractmethod
+    async def retrieve_notes(self) -> List[Entry] | None:
+        pass
+
+    @abstractmethod
+    async def return_bodyweights_note(self) -> Entry:
+        # return a *representation* of the note containing bodyweights.
+        pass
+
+    @abstractmethod
+    async def replace_bodyweights_note(self, new_text) -> None:
+        # see Handler.replace_bodyweights_note
+        pass
+
+    @abstractmethod
+    async def discard_notes(self, notes: List[Entry]) -> None:
+        # see Handler.discard_notes
+        pass
@@ -0,0 +1,236 @@
+# reads the values of a few columns of a target sheet. There are two readers: one for sheets loaded by openpyxl, and
+# one which streams the sheet's XML straight out of the xlsx file, without loading the workbook. Most tools only read
+# the date column and one or two others, for which the latter is far faster. See SHEET_READER in params.py.
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+import utilities.basic_functions as bf
+import utilities.date_cache as dc
+import utilities.params as p
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_ROW_TAG, _CELL_TAG = f"{_MAIN_NS}row", f"{_MAIN_NS}c"
+_VALUE_TAG, _FORMULA_TAG, _INLINE_STRING_TAG = f"{_MAIN_NS}v", f"{_MAIN_NS}f", f"{_MAIN_NS}is"
+_TEXT_TAG, _RICH_TEXT_RUN_TAG = f"{_MAIN_NS}t", f"{_MAIN_NS}r"
+
+READERS = ("openpyxl", "streaming")
+
+
+class SheetReader(ABC):
+    # reads cell values from a single sheet. Values are as openpyxl's load_workbook gives them: dates as datetime
+    # objects, numbers as int or float, formulas as their text (e.g. "=B2+1"), and empty cells as None
+    @abstractmethod
+    def iter_columns(self, columns: Iterable[int], min_row: int = 1) -> Iterator[Tuple[int, Tuple]]:
+        """
+        Yield each row from min_row down to the sheet's last row, along with the values of the given columns in it.
+        :param columns: the columns to read, where the first column (A) is 1
+        :param min_row: the first row to yield
+        :return: (row, values) pairs, where values are in the order of the given columns
+        """
+        ...
+
+    @abstractmethod
+    def value(self, row: int, column: int):
+        # return the value of a single cell
+        ...
+
+    @property
+    @abstractmethod
+    def max_row(self) -> int:
+        # the sheet's last row
+        ...
+
+    @property
+    @abstractmethod
+    def date_cache(self) -> dc.SheetDateCache:
+        # the cache of the dates parsed from the sheet's string date cells
+        ...
+
+
+class OpenpyxlSheetReader(SheetReader):
+    def __init__(self, sheet):
+        self._sheet = sheet
+
+    def iter_columns(self, columns: Iterable[int], min_row: int = 1) -> Iterator[Tuple[int, Tuple]]:
+        columns = list(columns)
+        # openpyxl yields the columns between those requested as well, so we index into each row
+        first_col = min(columns)
+        indices = [column - first_col for column in columns]
+        for row, values in enumerate(self._sheet.iter_rows(min_row=min_row, min_col=first_col, max_col=max(columns),
+                                                           values_only=True),
+                                     start=min_row):
+            yield row, tuple(values[idx] for idx in indices)
+
+    def value(self, row: int, column: int):
+        return self._sheet.cell(row=row, column=column).value
+
+    @property
+    def max_row(self) -> int:
+        return self._sheet.max_row
+
+    @property
+    def date_cache(self) -> dc.SheetDateCache:
+        return dc.for_sheet(self._sheet)
+
+
+class StreamingSheetReader(SheetReader):
+    # Reads the requested columns of a sheet by streaming its XML out of the xlsx file, one row at a time, so that the
+    # rest of the workbook is never loaded. The values of columns read are kept, so each column is parsed at most once.
+    # Reflects the file as it was when first read: don't use this for sheets being written to.
+    def __init__(self, workbook_path: str, sheet_name: str, columns: Iterable[int] = (), date_column: int | None = None,
+                 cache_dates: bool | None = None):
+        """
+        :param workbook_path: the path of the xlsx file
+        :param sheet_name: the name of the sheet. Raise ValueError if the workbook has no such sheet
+        :param columns: columns to read up front, in the same pass, if they're expected to be needed
+        :param date_column: the column of dates. Defaults to DATE_COLUMN in params.py
+        :param cache_dates: whether parsed dates are cached. Defaults to CACHE_PARSED_DATES in params.py
+        """
+        self._path = workbook_path
+        self._sheet_name = sheet_name
+        self._date_column = p.DATE_COLUMN if date_column is None else date_column
+        self._cache_dates = p.CACHE_PARSED_DATES if cache_dates is None else cache_dates
+        # the file's version when read, as given by basic_functions.file_version
+        self.version = bf.file_version(workbook_path)
+        with zipfile.ZipFile(workbook_path) as archive:
+            try:
+                self._sheet_part = dc.sheet_part_of(archive, sheet_name)
+            except StopIteration:
+                raise ValueError(f"Target workbook `{workbook_path}` does not contain sheet `{sheet_name}`") from None
+        # column -> row -> value. Empty cells are left out
+        self._values: Dict[int, Dict[int, object]] = {}
+        self._max_row = 0
+        self._date_cache = None
+        self._read_columns(set(columns))
+
+    @staticmethod
+    def _read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+        if "xl/sharedStrings.xml" not in archive.namelist():
+            return []
+        strings = []
+        for item in ET.fromstring(archive.read("xl/sharedStrings.xml")):
+            # an item holds either plain text, or runs of rich text. Phonetic hints are ignored, as openpyxl does
+            runs = [item] if item.find(_TEXT_TAG) is not None else item.findall(_RICH_TEXT_RUN_TAG)
+            strings.append(''.join(run.findtext(_TEXT_TAG, '') for run in runs))
+        return strings
+
+    @staticmethod
+    def _read_date_styles(archive: zipfile.ZipFile) -> Set[int]:
+        # return the indices of the cell styles whose number format is a date format
+        if "xl/styles.xml" not in archive.namelist():
+            return set()
+        styles = ET.fromstring(archive.read("xl/styles.xml"))
+        formats = dict(BUILTIN_FORMATS)
+        for number_format in styles.iter(f"{_MAIN_NS}numFmt"):
+            formats[int(number_format.get("numFmtId"))] = number_format.get("formatCode")
+        cell_styles = styles.find(f"{_MAIN_NS}cellXfs")
+        if cell_styles is None:
+            return set()
+        return {idx for idx, style in enumerate(cell_styles.iter(f"{_MAIN_NS}xf"))
+                if is_date_format(formats.get(int(style.get("numFmtId", 0)), ""))}
+
+    @staticmethod
+    def _read_epoch(archive: zipfile.ZipFile) -> datetime:
+        properties = ET.fromstring(archive.read("xl/workbook.xml")).find(f"{_MAIN_NS}workbookPr")
+        if properties is not None and properties.get("date1904") in ("1", "true"):
+            return CALENDAR_MAC_1904
+        return CALENDAR_WINDOWS_1900
+
+    def _read_columns(self, columns: Set[int]) -> None:
+        # read the given columns in a single pass over the sheet's rows
+        columns -= self._values.keys()
+        if not columns:
+            return
+        for column in columns:
+            self._values[column] = {}
+
+        with zipfile.ZipFile(self._path) as archive:
+            shared_strings = self._read_shared_strings(archive)
+            date_styles = self._read_date_styles(archive)
+            epoch = self._read_epoch(archive)
+
+            row = 0
+            with archive.open(self._sheet_part) as sheet_xml:
+                for _, element in ET.iterparse(sheet_xml, events=("end",)):
+                    if element.tag != _ROW_TAG:
+                        continue
+                    row = int(element.get("r", row + 1))
+                    column = 0
+                    for cell in element.iter(_CELL_TAG):
+                        reference = cell.get("r")
+                        column = column_index_from_string(reference.rstrip("0123456789")) if reference else column + 1
+                        if column in columns:
+                            if (value := self._cell_value(cell, shared_strings, date_styles, epoch)) is not None:
+                                self._values[column][row] = value
+                    # rows are only needed until they're read
+                    element.clear()
+            self._max_row = max(self._max_row, row)
+
+    @staticmethod
+    def _cell_value(cell: ET.Element, shared_strings: List[str], date_styles: Set[int], epoch: datetime):
+        # return a cell's value, as openpyxl would
+        data_type = cell.get("t", "n")
+        if (formula := cell.find(_FORMULA_TAG)) is not None:
+            return f"={formula.text or ''}"
+        if data_type == "inlineStr":
+            inline_string = cell.find(_INLINE_STRING_TAG)
+            return None if inline_string is None else ''.join(t.text or '' for t in inline_string.iter(_TEXT_TAG))
+
+        value = cell.find(_VALUE_TAG)
+        if value is None or value.text is None:
+            return None
+        text = value.text
+        match data_type:
+            case "s":
+                return shared_strings[int(text)]
+            case "str" | "e":
+                return text
+            case "b":
+                return text == "1"
+            case "d":
+                return datetime.fromisoformat(text)
+
+        number = float(text) if any(char in text for char in ".eE") else int(text)
+        if int(cell.get("s", 0)) in date_styles:
+            return from_excel(number, epoch)
+        return number
+
+    def iter_columns(self, columns: Iterable[int], min_row: int = 1) -> Iterator[Tuple[int, Tuple]]:
+        columns = list(columns)
+        self._read_columns(set(columns))
+        values_by_column = [self._values[column] for column in columns]
+        for row in range(min_row, self._max_row + 1):
+            yield row, tuple(values.get(row) for values in values_by_column)
+
+    def value(self, row: int, column: int):
+        self._read_columns({column})
+        return self._values[column].get(row)
+
+    @property
+    def max_row(self) -> int:
+        # the last row is only known once a column has been read. The date column is nearly always needed anyway
+        if not self._values:
+            self._read_columns({self._date_column})
+        return self._max_row
+
+    @property
+    def date_cache(self) -> dc.SheetDateCache:
+        if self._date_cache is None:
+            self._date_cache = (dc.SheetDateCache.for_workbook(self._path, self._sheet_name, self._date_column)
+                                if self._cache_dates else dc.SheetDateCache())
+        return self._date_cache
+
+
+def reader_for(sheet_or_reader) -> SheetReader:
+    # return a reader of the given openpyxl sheet. Readers are returned as they are
+    if isinstance(sheet_or_reader, SheetReader):
+        return sheet_or_reader
+    return OpenpyxlSheetReader(sheet_or_reader)
@@ -0,0 +1,295 @@
+# routes dates to the target workbook and sheet which hold them, when the target is partitioned by year.
+import glob
+import os
+import re
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Set, Tuple, TypeVar
+
+import openpyxl
+
+import utilities.basic_functions as bf
+import utilities.date_cache as dc
+import utilities.run_metrics as rm
+import utilities.sheet_reader as sr
+from utilities.config import Config
+from utilities.file_lock import FileLock
+
+# TARGET_PATH and TARGET_SHEET may contain this placeholder, which is replaced by the year of the date being written
+YEAR_PLACEHOLDER = "{year}"
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class Partition:
+    # a sheet holding one year of the target, or the whole target if it isn't partitioned (in which case year is None)
+    path: str
+    sheet_name: str
+    year: int | None = None
+
+
+@dataclass(frozen=True)
+class CellUpdate:
+    # a value written to a cell of a target sheet, along with what the cell held before, as loaded
+    sheet_name: str
+    row: int
+    column: int
+    value: Any
+    previous: Any = None
+
+
+def is_partitioned(config: Config | None = None) -> bool:
+    # config defaults to the settings in params.py, here and throughout
+    config = config or Config.from_params()
+    return YEAR_PLACEHOLDER in config.target_path or YEAR_PLACEHOLDER in config.target_sheet
+
+
+def partition_of(date: datetime, config: Config | None = None) -> Partition:
+    """
+    Return the partition which holds the given date. If the target isn't partitioned, that's the whole target.
+    :param date: the date to route
+    :param config: the settings specifying the target
+    :return: a partition, which may not exist yet
+    """
+    config = config or Config.from_params()
+    if not is_partitioned(config):
+        return Partition(path=config.target_path, sheet_name=config.target_sheet)
+    return _partition_of_year(date.year, config)
+
+
+def _partition_of_year(year: int, config: Config) -> Partition:
+    return Partition(path=config.target_path.replace(YEAR_PLACEHOLDER, str(year)),
+                     sheet_name=config.target_sheet.replace(YEAR_PLACEHOLDER, str(year)),
+                     year=year)
+
+
+def _years_in(names: List[str], pattern: str) -> Set[int]:
+    # return the years of the names which match the given pattern, where the pattern's year placeholder may be any year
+    regex = re.compile(re.escape(pattern).replace(re.escape(YEAR_PLACEHOLDER), r'(\d{4})') + '$')
+    return {int(match.group(1)) for name in names if (match := regex.match(name))}
+
+
+class TargetWorkbooks:
+    # Loads target workbooks on demand, one per partition path, and saves only those which were modified. A workbook
+    # which was changed on disk by something else since it was loaded is reloaded on next access, unless it has unsaved
+    # modifications, in which case the copy in memory is kept until it's saved.
+    # Cells written through write_cell are also queued, per workbook. If another tool saves a workbook after it was
+    # loaded here, e.g. when two tools run at once, the queued cells are written to a fresh copy of it on save, so that
+    # the other tool's changes are kept. If that isn't possible, because the other tool wrote to the same cells or the
+    # workbook was modified other than through write_cell (see mark_modified), then saving raises and nothing is saved.
+    # Likewise, a cell is only written if it still holds what it held when its partition was read here, whether loaded
+    # or streamed, since that's what the write was planned from. Otherwise write_cell raises.
+    def __init__(self, config: Config | None = None):
+        # the settings specifying the target, and how it's read and written. Defaults to those in params.py
+        self.config = config or Config.from_params()
+        # path -> (workbook, file version when loaded or saved, as given by basic_functions.file_version)
+        self._workbooks: Dict[str, Tuple[openpyxl.Workbook, Tuple[int, int]]] = {}
+        self._modified: Set[Partition] = set()
+        # path -> the cells written since the workbook was loaded or saved
+        self._queued_updates: Dict[str, List[CellUpdate]] = {}
+        # the paths of workbooks modified other than through write_cell, whose changes can't be replayed
+        self._unqueued_paths: Set[str] = set()
+        self._streaming_readers: Dict[Partition, sr.StreamingSheetReader] = {}
+
+    def _workbook(self, path: str) -> openpyxl.Workbook:
+        version = bf.file_version(path)
+        loaded = self._workbooks.get(path)
+        if loaded is None or (loaded[1] != version and not any(part.path == path for part in self._modified)):
+            print(f"Loading `{path}`")
+            loaded = self._workbooks[path] = (openpyxl.load_workbook(path), version)
+        return loaded[0]
+
+    def loaded_paths(self) -> List[str]:
+        # return the paths of the workbooks loaded so far
+        return sorted(self._workbooks)
+
+    def sheet_names(self, path: str) -> List[str]:
+        return self._workbook(path).sheetnames
+
+    def sheet(self, partition: Partition):
+        """
+        Return the sheet of the given partition, loading its workbook if needed. Raise if the partition doesn't exist.
+        :param partition: the partition
+        :return: the sheet
+        """
+        wb = self._workbook(partition.path)
+        if partition.sheet_name not in wb.sheetnames:
+            raise ValueError(f"Target workbook `{partition.path}` does not contain sheet `{partition.sheet_name}`")
+        dc.attach_to_sheet(wb, partition.path, partition.sheet_name, self.config.date_column,
+                           self.config.cache_parsed_dates)
+        return wb[partition.sheet_name]
+
+    def reader(self, partition: Partition) -> 'sr.SheetReader':
+        """
+        Return a reader of the date, bodyweight and workout columns of the given partition's sheet. Unless SHEET_READER
+        in params.py says otherwise, a partition whose workbook isn't loaded is streamed from its file instead of
+        loaded. Raise if the partition doesn't exist.
+        :param partition: the partition
+        :return: the reader
+        """
+        if self.config.sheet_reader == "openpyxl" or partition.path in self._workbooks:
+            return sr.OpenpyxlSheetReader(self.sheet(partition))
+
+        reader = self._streaming_readers.get(partition)
+        if reader is None or reader.version != bf.file_version(partition.path):
+            reader = self._streaming_readers[partition] = sr.StreamingSheetReader(
+                partition.path, partition.sheet_name,
+                columns=(self.config.date_column, self.config.bodyweight_column, self.config.workout_column),
+                date_column=self.config.date_column, cache_dates=self.config.cache_parsed_dates)
+        return reader
+
+    def exists(self, partition: Partition) -> bool:
+        if not os.path.exists(partition.path):
+            return False
+        if partition.year is None or YEAR_PLACEHOLDER in self.config.target_path:
+            # checking for the sheet would mean loading the workbook, just to find the partition's range. sheet() raises
+            # if it's missing
+            return True
+        return partition.sheet_name in self._workbook(partition.path).sheetnames
+
+    def existing_partitions(self) -> List[Partition]:
+        # return every partition of the target which exists, in date order
+        config = self.config
+        if not is_partitioned(config):
+            partition = self.partition_of(datetime.now())
+            return [partition] if self.exists(partition) else []
+
+        if YEAR_PLACEHOLDER in config.target_path:
+            paths = glob.glob(config.target_path.replace(YEAR_PLACEHOLDER, '[0-9][0-9][0-9][0-9]'))
+            years = _years_in(paths, config.target_path)
+        else:
+            years = _years_in(self._workbook(config.target_path).sheetnames, config.target_sheet)
+        return [partition for partition in (_partition_of_year(year, config) for year in sorted(years))
+                if self.exists(partition)]
+
+    def partitions_between(self, start_date: datetime | None, end_date: datetime) -> List[Partition]:
+        """
+        Return the existing partitions which may hold dates within the given range, in date order.
+        :param start_date: the inclusive start of the range, or None for no start
+        :param end_date: the inclusive end of the range
+        """
+        return [partition for partition in self.existing_partitions()
+                if partition.year is None
+                or ((start_date is None or start_date.year <= partition.year) and partition.year <= end_date.year)]
+
+    def previous_partition(self, partition: Partition) -> Partition | None:
+        # return the partition of the year before the given partition's, if the target is partitioned and it exists
+        if partition.year is None:
+            return None
+        previous = _partition_of_year(partition.year - 1, self.config)
+        return previous if self.exists(previous) else None
+
+    def partition_of(self, date: datetime) -> Partition:
+        # return the partition of this target which holds the given date
+        return partition_of(date, self.config)
+
+    def group_by_partition(self, items: List[T], date_of: Callable[[T], datetime]) -> Dict[Partition, List[T]]:
+        # group the given items by the partition which holds each item's date, in date order
+        grouped: Dict[Partition, List[T]] = {}
+        for item in sorted(items, key=date_of):
+            grouped.setdefault(self.partition_of(date_of(item)), []).append(item)
+        return grouped
+
+    def _value_as_read(self, partition: Partition, row: int, column: int) -> Tuple[Tuple[int, int], Any] | None:
+        # return the file version at which the partition's sheet was last read here, and the given cell's value then,
+        # or None if it hasn't been read
+        loaded = self._workbooks.get(partition.path)
+        if loaded is not None and partition.sheet_name in loaded[0].sheetnames:
+            return loaded[1], loaded[0][partition.sheet_name].cell(row=row, column=column).value
+        if (reader := self._streaming_readers.get(partition)) is not None:
+            return reader.version, reader.value(row, column)
+        return None
+
+    def write_cell(self, partition: Partition, row: int, column: int, value) -> None:
+        """
+        Write the value to the given cell of the partition's sheet, and queue the write, so that it can be replayed if
+        the workbook is changed elsewhere before it's saved. Raise without writing if the workbook was changed elsewhere
+        since the partition was read, and the cell no longer holds what it held then.
+        """
+        as_read = self._value_as_read(partition, row, column)
+        cell = self.sheet(partition).cell(row=row, column=column)
+        previous = cell.value
+        if as_read is not None:
+            version, previous = as_read
+            if version != self._workbooks[partition.path][1] and cell.value not in (previous, value):
+                raise RuntimeError(f"Another program wrote to {partition.sheet_name}!R{row}C{column} of "
+                                   f"`{partition.path}` since it was read. `{value}` was not written to it")
+        self._queued_updates.setdefault(partition.path, []).append(
+            CellUpdate(sheet_name=partition.sheet_name, row=row, column=column, value=value, previous=previous))
+        cell.value = value
+        self._modified.add(partition)
+
+    def mark_modified(self, partition: Partition) -> None:
+        # mark a partition whose sheet was modified directly, rather than through write_cell
+        self._modified.add(partition)
+        self._unqueued_paths.add(partition.path)
+
+    def _replay_queued_updates(self, path: str) -> openpyxl.Workbook:
+        """
+        Load the workbook at the given path afresh, and write the cells queued for it to that. Raise without writing
+        anything if a queued cell was changed elsewhere to something other than the value queued for it, or if the
+        workbook was modified other than through write_cell.
+        :param path: the workbook's path
+        :return: the fresh workbook
+        """
+        if path in self._unqueued_paths:
+            raise RuntimeError(f"`{path}` was changed by another program since it was loaded. Nothing was saved")
+
+        print(f"`{path}` was changed by another program since it was loaded. Reloading it")
+        wb = openpyxl.load_workbook(path)
+        updates = self._queued_updates.get(path, [])
+        clashes = [update for update in updates
+                   if wb[update.sheet_name].cell(row=update.row, column=update.column).value
+                   not in (update.previous, update.value)]
+        if clashes:
+            raise RuntimeError(f"Another program wrote to the same cells of `{path}` since it was loaded. Nothing was "
+                               f"saved. These are the cells, with the values which weren't written:\n"
+                               + "\n".join(f"{u.sheet_name}!R{u.row}C{u.column}: {u.value}" for u in clashes))
+        for update in updates:
+            wb[update.sheet_name].cell(row=update.row, column=update.column).value = update.value
+        return wb
+
+    def save(self, backup=True) -> None:
+        """
+        Save every workbook with modified partitions, backing each up first if requested. Workbooks without
+        modifications are left alone. Each workbook is locked while it's saved. If another program saved it since it was
+        loaded, then the cells written to it here are written to a fresh copy instead, and nothing is saved unless
+        that's possible for every workbook.
+        :param backup: whether to back up each workbook before saving it
+        """
+        paths = sorted({partition.path for partition in self._modified})
+        # locks are always taken in the same order, so that two tools saving the same workbooks can't deadlock
+        with ExitStack() as locks:
+            for path in paths:
+                locks.enter_context(FileLock(path, self.config.file_lock_timeout_seconds))
+
+            to_save = {}
+            for path in paths:
+                wb, version = self._workbooks[path]
+                to_save[path] = wb if bf.file_version(path) == version else self._replay_queued_updates(path)
+
+            for path, wb in to_save.items():
+                if backup:
+                    bf.backup_file_to_dir(source_file_path=path, backup_directory=self.config.local_excel_backup_dir)
+                    rm.count(rm.BACKUPS_MADE)
+                wb.save(path)
+                rm.count(rm.ROWS_WRITTEN, len({(u.sheet_name, u.row) for u in self._queued_updates.get(path, [])}))
+                self._workbooks[path] = (wb, bf.file_version(path))
+                # only workout and bodyweight cells are ever written, so the dates parsed from every sheet remain valid
+                for sheet in wb.worksheets:
+                    dc.save_for_sheet(sheet, workbook_saved=True)
+        self._modified = set()
+        self._queued_updates = {}
+        self._unqueued_paths = set()
+
+    def save_date_caches(self) -> None:
+        # save the parsed dates of every loaded sheet, e.g. when there's nothing to write
+        for wb, _ in self._workbooks.values():
+            for sheet in wb.worksheets:
+                dc.save_for_sheet(sheet)
+        for partition, reader in self._streaming_readers.items():
+            # the caches of sheets which have been saved since they were read would be keyed by an outdated hash
+            if os.path.exists(partition.path) and reader.version == bf.file_version(partition.path):
+                reader.date_cache.save()
@@ -0,0 +1,240 @@
+# breaks written workouts down into one row per set, and keeps them in an on-disk store, partitioned by month, so that
+# they can be analysed without loading the target workbook.
+import csv
+import os
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    # optional. Only needed for the compressed columnar "parquet" format
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+from utilities.config import Config
+from utilities.target_router import TargetWorkbooks
+from utilities.workout_grammar import parse_workout_data
+
+FORMATS = ("csv", "parquet")
+
+
+@dataclass
+class ExportedSet:
+    # one set of one exercise. Exercises logged without sets (e.g. "Dead hang") have a single row without set_number
+    date: datetime
+    exercise: str
+    set_number: int | None = None
+    load: float | None = None
+    # "kg", "lb" or "ea" (kg per dumbbell), or "" if no unit was given
+    unit: str = ""
+    reps: int | None = None
+    # anything logged for the set which isn't a number of reps, e.g. "?" or "45 mins"
+    detail: str = ""
+
+
+COLUMNS = [f.name for f in fields(ExportedSet)]
+
+
+def decompose_workout(date: datetime, data: str) -> List[ExportedSet]:
+    """
+    Break a workout, as written to the target file, into one row per set. The estimated duration is left out.
+    For example, "Squat 90kg: 8,8, 100kg: 5; Dead hang. Est 50 mins" gives three Squat sets, and one Dead hang row.
+    :param date: the date of the workout
+    :param data: the workout, as formatted by parse_workout_notes
+    :return: the rows, in the order they were logged
+    """
+    rows = []
+    for exercise in parse_workout_data(data).exercises:
+        if not exercise.groups:
+            rows.append(ExportedSet(date=date, exercise=exercise.name.rstrip('.')))
+            continue
+        set_number = 0
+        for group, exercise_set in exercise.sets():
+            load = group.load
+            detail = exercise_set.text if exercise_set.reps is None else ""
+            # a circuit such as "3x25" is one row per set, like any other sets
+            for _ in range(exercise_set.count):
+                set_number += 1
+                rows.append(ExportedSet(date=date, exercise=exercise.name, set_number=set_number,
+                                        load=load.value if load else None, unit=load.unit if load else "",
+                                        reps=exercise_set.reps,
+                                        detail=' '.join(filter(None, [group.qualifier, detail]))))
+    return rows
+
+
+def _partition_path(export_dir: str, month: str, export_format: str) -> str:
+    # e.g. <export_dir>/month=2021-01/sets.csv
+    return os.path.join(export_dir, f"month={month}", f"sets.{export_format}")
+
+
+def _to_record(row: ExportedSet) -> Tuple:
+    date, *rest = astuple(row)
+    return (date.strftime('%Y-%m-%d'), *rest)
+
+
+def _from_record(record: Dict[str, str]) -> ExportedSet:
+    # records read from CSV hold strings. Empty strings are missing values
+    def optional(value, convert):
+        return None if value in ("", None) else convert(value)
+
+    return ExportedSet(date=datetime.strptime(str(record["date"]), '%Y-%m-%d'),
+                       exercise=record["exercise"],
+                       set_number=optional(record["set_number"], int),
+                       load=optional(record["load"], float),
+                       unit=record["unit"] or "",
+                       reps=optional(record["reps"], int),
+                       detail=record["detail"] or "")
+
+
+def _read_partition(path: str, export_format: str) -> List[ExportedSet]:
+    if not os.path.exists(path):
+        return []
+    if export_format == "parquet":
+        return [_from_record(record) for record in pq.read_table(path).to_pylist()]
+    with open(path, 'r', newline='') as f:
+        return [_from_record(record) for record in csv.DictReader(f)]
+
+
+def _write_partition(path: str, rows: List[ExportedSet], export_format: str, append: bool) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if export_format == "parquet":
+        # parquet files can't be appended to, so a month is always rewritten whole. Months are small
+        table = pyarrow.Table.from_pylist([dict(zip(COLUMNS, _to_record(row))) for row in rows])
+        tmp_path = path + '.tmp'
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+        return
+
+    write_header = not append or not os.path.exists(path)
+    tmp_path = path if append else path + '.tmp'
+    with open(tmp_path, 'a' if append else 'w', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(COLUMNS)
+        writer.writerows(_to_record(row) for row in rows)
+    if not append:
+        os.replace(tmp_path, path)
+
+
+def validate_export_format(export_format: str) -> None:
+    # raise if the given format is unknown, or can't be written here
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format `{export_format}`. Expected one of {FORMATS}")
+    if export_format == "parquet" and pyarrow is None:
+        raise ImportError("The parquet export format requires the pyarrow package. Install it, or use csv")
+
+
+def _partition_has_dates(path: str, dates: set) -> bool:
+    # return whether the CSV partition holds any of the given dates, reading only its date column
+    if not os.path.exists(path):
+        return False
+    date_strs = {date.strftime('%Y-%m-%d') for date in dates}
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return any(record and record[0] in date_strs for record in reader)
+
+
+def export_workouts(workouts: Dict[datetime, str], export_dir: str, export_format: str = "csv") -> int:
+    """
+    Add the given workouts to the store, one month partition at a time. Workouts for dates already in the store replace
+    the stored ones, so exporting the same workouts twice changes nothing. CSV months without such dates are appended
+    to, after reading only their date column.
+    :param workouts: each workout's data string, as written to the target file, keyed by date
+    :param export_dir: the root directory of the store
+    :param export_format: "csv", or "parquet" for compressed columnar files
+    :return: the number of rows exported
+    """
+    validate_export_format(export_format)
+    rows_by_month: Dict[str, List[ExportedSet]] = {}
+    for date, data in sorted(workouts.items()):
+        rows_by_month.setdefault(date.strftime('%Y-%m'), []).extend(decompose_workout(date, data))
+
+    for month, rows in rows_by_month.items():
+        path = _partition_path(export_dir, month, export_format)
+        exported_dates = {row.date for row in rows}
+        if export_format == "csv" and not _partition_has_dates(path, exported_dates):
+            _write_partition(path, rows, export_format, append=True)
+            continue
+        kept = [row for row in _read_partition(path, export_format) if row.date not in exported_dates]
+        _write_partition(path, sorted(kept + rows, key=lambda row: row.date), export_format, append=False)
+    return sum(len(rows) for rows in rows_by_month.values())
+
+
+def read_exported_sets(export_dir: str, start_date: datetime | None = None, end_date: datetime | None = None,
+                       exercise: str | None = None, export_format: str = "csv") -> Iterator[ExportedSet]:
+    """
+    Yield the stored sets within the given date range, in date order. Only the month partitions overlapping the range
+    are read.
+    :param export_dir: the root directory of the store
+    :param start_date: the inclusive start of the range, or None for no start
+    :param end_date: the inclusive end of the range, or None for no end
+    :param exercise: if given, only yield sets of this exercise (case-insensitive)
+    :param export_format: the format the store was written in
+    """
+    validate_export_format(export_format)
+    if not os.path.isdir(export_dir):
+        return
+    months = sorted(name[len("month="):] for name in os.listdir(export_dir) if name.startswith("month="))
+    for month in months:
+        if (start_date is not None and month < start_date.strftime('%Y-%m')) or \
+                (end_date is not None and month > end_date.strftime('%Y-%m')):
+            continue
+        for row in _read_partition(_partition_path(export_dir, month, export_format), export_format):
+            if start_date is not None and row.date < start_date.replace(hour=0, minute=0, second=0, microsecond=0):
+                continue
+            if end_date is not None and row.date > end_date:
+                continue
+            if exercise is not None and row.exercise.lower() != exercise.lower():
+                continue
+            yield row
+
+
+def export_written_workouts(workouts: Dict[datetime, str], config: Config | None = None) -> None:
+    # export workouts which were just written to the target file, if enabled in the given settings, or params.py. The
+    # target file is already saved by then, so a failure is reported rather than raised. Exporting the same workouts
+    # again, e.g. through this module's main, catches up
+    config = config or Config.from_params()
+    if not config.workout_export_dir:
+        return
+    try:
+        count = export_workouts(workouts, config.workout_export_dir, config.workout_export_format)
+    except Exception as e:
+        print(f"Failed to export workouts to `{config.workout_export_dir}`. Error: {e}. "
+              f"Run utilities/workout_export.py to export every written workout again")
+        return
+    print(f"Exported {count} sets to `{config.workout_export_dir}`")
+
+
+def read_written_workouts(workbooks: TargetWorkbooks) -> Dict[datetime, str]:
+    # return every workout already written to the target, keyed by date. Only the date and workout columns are read
+    config = workbooks.config
+    workouts: Dict[datetime, str] = {}
+    for partition in workbooks.existing_partitions():
+        reader = workbooks.reader(partition)
+        for row, (date_value, workout) in reader.iter_columns([config.date_column, config.workout_column]):
+            date = reader.date_cache.floored_date(row, date_value)
+            if date is not None and isinstance(workout, str) and workout.strip():
+                workouts[date] = workout
+    workbooks.save_date_caches()
+    return workouts
+
+
+def main(config: Config | None = None):
+    # export every workout already in the target file, e.g. after enabling the export in params.py, or in the given
+    # settings
+    config = config or Config.from_params()
+    if not config.workout_export_dir:
+        print("WORKOUT_EXPORT_DIR is not set in params.py. Nothing to export")
+        return
+    validate_export_format(config.workout_export_format)
+
+    workouts = read_written_workouts(TargetWorkbooks(config))
+    count = export_workouts(workouts, config.workout_export_dir, config.workout_export_format)
+    print(f"Exported {count} sets from {len(workouts)} workouts to `{config.workout_export_dir}`")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+# a grammar for the exercise lines of workout notes, e.g. "Assisted pull up -9kg: 7,5, -18kg: 7,5". Each line is split
+# into tokens in a single pass, and the tokens into the exercise's name, loads and sets. No text is dropped along the
+# way, so joining the tokens gives back the line exactly, and the workout string can be rendered from the structure.
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+
+# the alternatives are tried in order, at each position. Parentheses are handled separately, see _tokenize
+_TOKEN = re.compile(r'(?P<load>-?\d+(?:\.\d+)?(?:kg|lbs|lb|ea)\b)'  # e.g. "75kg", "-9kg", "97.5kg", "40lb", "24ea"
+                    r'|(?P<circuit>\d+x\d+\b)'  # sets x reps, e.g. "3x25"
+                    r'|(?P<number>-?\d+(?:\.\d+)?)'
+                    r'|(?P<unknown>\?+)'  # an unknown number, e.g. "?" reps
+                    r'|(?P<colon>:)'
+                    r'|(?P<comma>,)'
+                    r'|(?P<space>\s+)'
+                    r'|(?P<word>[^\s:,()\d?]+|.)',
+                    re.IGNORECASE)
+_LOAD = re.compile(r'(-?\d+(?:\.\d+)?)([a-z]*)', re.IGNORECASE)
+_CIRCUIT = re.compile(r'(\d+)x(\d+)', re.IGNORECASE)
+# "Est 65 mins", "est 5 min", "Est ?? mins"
+_ESTIMATED_DURATION = re.compile(r'est\s+(\d{1,3}|\?{1,3})\s*min', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Token:
+    # kind is one of: load, circuit, number, unknown, colon, comma, space, word, paren
+    kind: str
+    text: str
+
+
+@dataclass(frozen=True)
+class Load:
+    value: float
+    # "kg", "lb", "lbs" or "ea" (kg per dumbbell), as written, or "" if no unit was given, e.g. "Squat 100: 5"
+    unit: str = ""
+
+    @classmethod
+    def from_token(cls, token: Token) -> 'Load':
+        value, unit = _LOAD.fullmatch(token.text).groups()
+        return cls(value=float(value), unit=unit.lower())
+
+
+@dataclass(frozen=True)
+class ExerciseSet:
+    # reps is None if the set isn't a plain number of reps, e.g. "?" or "45 mins". text is the set as written
+    reps: int | None
+    text: str
+    # how many sets were logged as this one, e.g. 3 for "3x25"
+    count: int = 1
+
+
+@dataclass
+class SetGroup:
+    # consecutive sets done with the same load. qualifier holds any words written with the load, e.g. "without reset"
+    load: Load | None
+    sets: List[ExerciseSet] = field(default_factory=list)
+    qualifier: str = ""
+
+
+@dataclass
+class Exercise:
+    tokens: Tuple[Token, ...]
+    # the exercise's name, without the load, e.g. "Rack pull (with hold 2:5)" for "Rack pull 110kg (with hold 2:5): 5,5"
+    name: str
+    groups: List[SetGroup] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        # the line exactly as written
+        return ''.join(token.text for token in self.tokens)
+
+    @property
+    def loads(self) -> List[Load]:
+        return [group.load for group in self.groups if group.load is not None]
+
+    def sets(self) -> Iterator[Tuple[SetGroup, ExerciseSet]]:
+        # yield each set in the order it was logged, along with its group. A circuit such as "3x25" is yielded once,
+        # with its count
+        for group in self.groups:
+            for exercise_set in group.sets:
+                yield group, exercise_set
+
+    def __str__(self):
+        return self.text
+
+
+@dataclass
+class EstimatedDuration:
+    # minutes is None if the duration is unknown, e.g. "Est ?? mins"
+    text: str
+    minutes: int | None = None
+
+
+@dataclass
+class StructuredWorkout:
+    exercises: List[Exercise]
+    estimated_duration: EstimatedDuration
+
+    def render(self) -> str:
+        """
+        Return the workout as written to the target file: the exercises separated by semicolons, followed by a full
+        stop and the estimated duration. For example "Squat 90kg: 8,8; Dead hang. Est 50 mins".
+        """
+        return '; '.join(exercise.text for exercise in self.exercises) + ". " + self.estimated_duration.text
+
+
+def _matching_parentheses(text: str) -> dict:
+    # map the index of each balanced opening parenthesis to that of its closing one, in a single pass. Unbalanced
+    # parentheses are left out, so that they're read as plain characters
+    matches, stack = {}, []
+    for idx, char in enumerate(text):
+        if char == '(':
+            stack.append(idx)
+        elif char == ')' and stack:
+            start = stack.pop()
+            if not stack:
+                matches[start] = idx
+    return matches
+
+
+def _tokenize(text: str) -> List[Token]:
+    # anything within parentheses is a single token, so that e.g. the colon in "(with hold 2:5)" isn't read as a
+    # separator, nor the number in "(3s top, 5s bottom)" as a load
+    parentheses = _matching_parentheses(text)
+    tokens, pos = [], 0
+    while pos < len(text):
+        if pos in parentheses:
+            end = parentheses[pos] + 1
+            tokens.append(Token('paren', text[pos:end]))
+            pos = end
+            continue
+        match = _TOKEN.match(text, pos)
+        tokens.append(Token(match.lastgroup, match.group()))
+        pos = match.end()
+    return tokens
+
+
+def _join(tokens: List[Token]) -> str:
+    # join tokens into readable text, collapsing whitespace and dropping dangling commas
+    return ' '.join(''.join(token.text for token in tokens).split()).strip(' ,')
+
+
+def _split_off_load(tokens: List[Token]) -> Tuple[List[Token], Load | None, List[Token]]:
+    # split the tokens around the last load, e.g. "Machine crunch 36kg with reset". If there's none, a trailing number
+    # is a load without unit, e.g. "Squat 100"
+    for idx in range(len(tokens) - 1, -1, -1):
+        if tokens[idx].kind == 'load':
+            return tokens[:idx], Load.from_token(tokens[idx]), tokens[idx + 1:]
+
+    meaningful = [idx for idx, token in enumerate(tokens) if token.kind != 'space']
+    if meaningful and tokens[meaningful[-1]].kind == 'number':
+        idx = meaningful[-1]
+        return tokens[:idx], Load(value=float(tokens[idx].text)), tokens[idx + 1:]
+    return tokens, None, []
+
+
+def _to_sets(tokens: List[Token]) -> List[ExerciseSet]:
+    # e.g. "8" is one set of 8 reps, "3x10" three sets of 10, and "45 mins" a set without a number of reps
+    meaningful = [token for token in tokens if token.kind != 'space']
+    if not meaningful:
+        return []
+    if len(meaningful) == 1 and meaningful[0].kind == 'number' and meaningful[0].text.isdigit():
+        return [ExerciseSet(reps=int(meaningful[0].text), text=meaningful[0].text)]
+    if len(meaningful) == 1 and meaningful[0].kind == 'circuit':
+        set_count, reps = map(int, _CIRCUIT.fullmatch(meaningful[0].text).groups())
+        return [ExerciseSet(reps=reps, text=meaningful[0].text, count=set_count)]
+    return [ExerciseSet(reps=None, text=_join(tokens))]
+
+
+def parse_exercise(line: str) -> Exercise:
+    """
+    Parse one cleaned-up exercise line, e.g. "Assisted pull up -9kg: 7,5, -18kg: 7,5". Everything before the first colon
+    is the exercise's name and initial load. After it come sets separated by commas, where an item followed by another
+    colon holds the load of the sets after it. Lines without a colon, e.g. "Dead hang" or "3x25 jabs", are exercises
+    without logged loads. This runs in time linear in the line's length.
+    :param line: the exercise line
+    :return: an Exercise, whose text is the line exactly as given
+    """
+    tokens = _tokenize(line)
+    colons = [idx for idx, token in enumerate(tokens) if token.kind == 'colon']
+    if not colons:
+        meaningful = [token for token in tokens if token.kind != 'space']
+        if meaningful and meaningful[0].kind == 'circuit':
+            # e.g. "3x25 jabs"
+            return Exercise(tokens=tuple(tokens), name=_join(tokens[tokens.index(meaningful[0]) + 1:]),
+                            groups=[SetGroup(load=None, sets=_to_sets([meaningful[0]]))])
+        return Exercise(tokens=tuple(tokens), name=_join(tokens))
+
+    before, load, after = _split_off_load(tokens[:colons[0]])
+    exercise = Exercise(tokens=tuple(tokens), name=_join(before + after))
+    group = SetGroup(load=load)
+    exercise.groups.append(group)
+
+    item: List[Token] = []
+    for token in tokens[colons[0] + 1:] + [Token('comma', '')]:
+        if token.kind == 'comma':
+            group.sets.extend(_to_sets(item))
+            item = []
+        elif token.kind == 'colon':
+            # the item before this colon holds the next load, possibly preceded by the last set of the previous load
+            # when a comma was left out, e.g. "15,15 43kg: 14"
+            before, load, after = _split_off_load(item)
+            if before and all(t.kind in ('number', 'space') for t in before):
+                group.sets.extend(_to_sets(before))
+                before = []
+            group = SetGroup(load=load, qualifier=_join(before + after))
+            exercise.groups.append(group)
+            item = []
+        else:
+            item.append(token)
+    return exercise
+
+
+def parse_estimated_duration(line: str) -> EstimatedDuration:
+    match = _ESTIMATED_DURATION.search(line)
+    minutes = int(match.group(1)) if match and match.group(1).isdigit() else None
+    return EstimatedDuration(text=line, minutes=minutes)
+
+
+def parse_workout_lines(lines: List[str]) -> StructuredWorkout:
+    """
+    Parse the cleaned-up lines of a workout note, where the last line is the estimated duration.
+    :param lines: the lines, in order
+    :return: the structured workout
+    """
+    if len(lines) < 2:
+        raise ValueError("A workout needs at least one exercise line, followed by an estimated duration line")
+    return StructuredWorkout(exercises=[parse_exercise(line) for line in lines[:-1]],
+                             estimated_duration=parse_estimated_duration(lines[-1]))
+
+
+def parse_workout_data(data: str) -> StructuredWorkout:
+    """
+    Parse a workout as written to the target file, e.g. "Squat 90kg: 8,8; Dead hang. Est 50 mins". This is the inverse
+    of StructuredWorkout.render.
+    :param data: the workout string
+    :return: the structured workout
+    """
+    exercises_str, duration = data.rsplit('. ', 1) if '. ' in data else (data, "")
+    return StructuredWorkout(exercises=[parse_exercise(line) for line in exercises_str.split('; ')],
+                             estimated_duration=parse_estimated_duration(duration))